@@ -0,0 +1,168 @@
+# queries.py 의 집계를 pandas로 계산하는 버전
+# DB 대신 로컬 데이터(스냅샷 파티션 등)에서 집계할 때 사용하며, 함수 이름과 결과 모양은 queries.py 와 같다
+# 모든 함수는 load(start, end, columns) 형태의 로드 함수를 받아 필요한 구간/컬럼만 읽는다
+import numpy as np
+import pandas as pd
+
+import instrument
+from queries import MAP_COLUMNS, LOCATION_COLUMNS, TRIP_COLUMNS
+
+COORD_COLUMNS = ["출발지_X좌표_수정", "출발지_Y좌표_수정"]
+
+
+# 일시 -> 'YYYY-MM' 문자열 (행마다 strftime 하지 않고 고유한 월만 문자열로 바꾼다, 결측은 NaN)
+def year_month(timestamps):
+    codes, months = pd.factorize(timestamps.to_numpy().astype("datetime64[M]"), sort=True)
+    labels = np.append(np.datetime_as_string(months, unit="M").astype(object), np.nan)
+    return pd.Series(labels[codes], index=timestamps.index, name=timestamps.name)
+
+
+# 한 번 계산해 두면 집계할 때마다 다시 변환하지 않아도 되는 파생 컬럼
+DERIVED_COLUMNS = {
+    "date": lambda df: df["승차일시"].dt.normalize(),
+    "year_month": lambda df: year_month(df["승차일시"]),
+    "예약_시": lambda df: df["예약시간"].dt.hour,
+}
+
+
+@instrument.timed("derived_columns")
+def add_derived_columns(df):
+    for name, derive in DERIVED_COLUMNS.items():
+        df[name] = derive(df)
+    return df
+
+
+# 파생 컬럼이 이미 있으면 그대로 쓰고, 없으면 계산
+def _derived(df, name):
+    return df[name] if name in df.columns else DERIVED_COLUMNS[name](df)
+
+
+# 메모리에 올라와 있는 DataFrame을 load(start, end, columns) 형태로 감싼다
+# 미리 계산된 파생 컬럼이 있으면 함께 넘긴다
+def frame_loader(df):
+    def load(start=None, end=None, columns=None):
+        if columns is None:
+            return df
+        return df[[c for c in df.columns if c in columns or c in DERIVED_COLUMNS]]
+    return load
+
+
+# 필요한 컬럼만 읽고 승차일시 [start, end) 구간으로 필터링
+def _load(load, start, end, columns, require_coords=False):
+    columns = list(dict.fromkeys(["승차일시"] + list(columns) + (COORD_COLUMNS if require_coords else [])))
+    df = load(start, end, columns=columns)
+    for column in ("승차일시", "예약시간"):
+        if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+            with instrument.stage("to_datetime"):
+                df[column] = pd.to_datetime(df[column], errors="coerce")
+    df = df.dropna(subset=["승차일시"] + (COORD_COLUMNS if require_coords else []))
+    if start is not None:
+        df = df[df["승차일시"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["승차일시"] < pd.Timestamp(end)]
+    return df
+
+
+def _summary(grouped):
+    return pd.DataFrame({
+        "rides": grouped.size(),
+        "usage": grouped["회원ID"].count(),
+        "users": grouped["회원ID"].nunique(),
+        "drivers": grouped["기사ID"].nunique(),
+    })
+
+
+def daily_summary(load, start=None, end=None, require_coords=False):
+    df = _load(load, start, end, ["회원ID", "기사ID"], require_coords)
+    summary = _summary(df.groupby(_derived(df, "date")))
+    summary.index = pd.DatetimeIndex(summary.index).date
+    summary.index.name = "date"
+    return summary.reset_index()
+
+
+def monthly_summary(load, start=None, end=None, require_coords=False):
+    df = _load(load, start, end, ["회원ID", "기사ID"], require_coords)
+    summary = _summary(df.groupby(_derived(df, "year_month"), observed=True))
+    summary.index = summary.index.astype(str)
+    summary.index.name = "year_month"
+    return summary.reset_index()
+
+
+# 구간 전체의 고유 이용자 수(users)와 기사 수(drivers)
+def distinct_counts(load, start=None, end=None, require_coords=False):
+    df = _load(load, start, end, ["회원ID", "기사ID"], require_coords)
+    return {"users": int(df["회원ID"].nunique()), "drivers": int(df["기사ID"].nunique())}
+
+
+def hourly_counts(load, start=None, end=None, require_coords=False):
+    df = _load(load, start, end, ["예약시간", "회원ID", "기사ID"], require_coords)
+    df = df.dropna(subset=["예약시간"])
+    grouped = df.groupby(_derived(df, "예약_시"))
+    counts = pd.DataFrame({
+        "기사ID": grouped["기사ID"].nunique(),
+        "회원ID": grouped["회원ID"].nunique(),
+    })
+    counts.index.name = "예약_시"
+    return counts.reset_index().astype(int)
+
+
+# 셀(0 ~ size-1)별 고유 값 개수
+# ID 를 정수 코드로 바꾼 뒤(범주형이면 있는 코드를 그대로 쓴다) (셀, 코드) 쌍을 정렬해서 앞 값과 다른 쌍만 남기고 셀 번호를 bincount 로 센다
+# (np.unique 보다 정렬 + 비교가 빠르다)
+def _distinct_per_cell(cells, values, size):
+    codes, uniques = pd.factorize(values)
+    valid = codes >= 0
+    width = max(len(uniques), 1)
+    pairs = np.sort(cells[valid] * width + codes[valid])
+    first = np.ones(len(pairs), dtype=bool)
+    first[1:] = pairs[1:] != pairs[:-1]
+    return np.bincount(pairs[first] // width, minlength=size)
+
+
+# 일자 × 예약 시간대(예약_시)별 고유 기사 수와 고유 회원 수 (hourly_counts 를 모든 날짜에 대해 한 번에)
+# groupby 없이 (일자, 시간대) 를 셀 번호 하나로 바꿔 한 번에 센다, 행이 없는 셀은 결과에 없다
+def date_hour_counts(load, start=None, end=None):
+    df = _load(load, start, end, ["예약시간", "회원ID", "기사ID"])
+    df = df.dropna(subset=["예약시간"])
+    date_codes, dates = pd.factorize(_derived(df, "date"), sort=True)
+    cells = date_codes.astype(np.int64) * 24 + _derived(df, "예약_시").to_numpy(dtype=np.int64)
+    size = len(dates) * 24
+    counts = pd.DataFrame({
+        "date": np.repeat(pd.DatetimeIndex(dates).date, 24),
+        "예약_시": np.tile(np.arange(24), len(dates)),
+        "기사ID": _distinct_per_cell(cells, df["기사ID"], size),
+        "회원ID": _distinct_per_cell(cells, df["회원ID"], size),
+    })
+    counts = counts[(counts["기사ID"] > 0) | (counts["회원ID"] > 0)]
+    return counts.reset_index(drop=True).astype({"예약_시": int, "기사ID": int, "회원ID": int})
+
+
+def top_locations(load, column, start=None, end=None, limit=10, require_coords=False):
+    if column not in LOCATION_COLUMNS:
+        raise ValueError(f"지원하지 않는 컬럼입니다: {column}")
+    df = _load(load, start, end, [column], require_coords)
+    counts = df[column].value_counts()
+    # 범주형 컬럼은 구간에 없는 범주도 0건으로 세므로 뺀다
+    counts = counts[counts > 0].nlargest(limit).rename("count")
+    counts.index.name = column
+    return counts.astype(int)
+
+
+def map_points(load, start=None, end=None):
+    df = _load(load, start, end, MAP_COLUMNS, require_coords=True)
+    return df[list(MAP_COLUMNS)].reset_index(drop=True)
+
+
+def trip_times(load, start=None, end=None):
+    df = _load(load, start, end, TRIP_COLUMNS).dropna(subset=["기사ID"])
+    return df[list(TRIP_COLUMNS)].reset_index(drop=True)
+
+
+def watermark(load, start=None, end=None):
+    latest = _load(load, start, end, [])["승차일시"].max()
+    return None if pd.isna(latest) else latest.isoformat()
+
+
+def month_list(load, start=None, end=None):
+    df = _load(load, start, end, [])
+    return sorted(_derived(df, "year_month").unique().tolist())
@@ -0,0 +1,197 @@
+# 일별/월별 파이프라인 벤치마크
+# CSV 한 파일에 대해 단계별(읽기, 날짜 변환, 일별 집계, 월별 집계, 지도, 그래프) 소요 시간과 메모리를 잰다
+# 결과는 bench/results.jsonl 에 한 줄씩 추가하고, 같은 조건(행 수, 읽기 모드)의 직전 결과와 비교해서 보여준다
+#
+# 사용법: python benchmark.py --rows 100000 1000000 10000000   # 합성 데이터(synthetic.py)를 만들어 크기별로 측정
+#         python benchmark.py --csv 파일 --ingest chunked        # 기존 CSV 로 측정
+# 크기마다 별도 프로세스에서 실행해서 최대 RSS 가 이전 크기의 영향을 받지 않게 한다
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+import aggregations
+import config
+import ingest
+import instrument
+import mapviz
+import queries
+import synthetic
+
+BENCH_DIR = "bench"
+RESULTS_FILE = os.path.join(BENCH_DIR, "results.jsonl")
+
+STAGES = ["load", "parse", "daily", "monthly", "map", "figure"]
+
+
+def _mb(value):
+    return round(value / 1024 ** 2, 1) if value is not None else None
+
+
+class Recorder:
+    def __init__(self):
+        self.stages = {}
+
+    # with 블록의 소요 시간, RSS 증감, 끝난 뒤 최대 RSS 기록
+    @contextmanager
+    def stage(self, name):
+        before = instrument.current_rss()
+        started = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - started
+        after = instrument.current_rss()
+        self.stages[name] = {
+            "seconds": round(seconds, 4),
+            "rss_delta_mb": _mb(after - before) if before is not None and after is not None else None,
+            "peak_rss_mb": _mb(ingest.peak_rss()),
+        }
+
+
+# CSV 하나로 대시보드의 각 단계를 한 번씩 실행
+def run(path, settings):
+    # 화면 코드는 streamlit 을 불러오므로 측정 전에 import 해 둔다
+    import views
+
+    recorder = Recorder()
+    encoding = settings["ingest"].get("encoding")
+    datetime_format = settings["ingest"].get("datetime_format") or None
+
+    with recorder.stage("load"):
+        if settings["ingest"].get("mode") == "chunked":
+            # 청크 모드는 읽으면서 날짜까지 변환하므로 parse 단계는 파생 컬럼 계산만 남는다
+            df = ingest.load_export(path, settings["ingest"])
+        else:
+            df = pd.read_csv(path, encoding=encoding)
+
+    with recorder.stage("parse"):
+        for column in ingest.DATETIME_COLUMNS:
+            if column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = pd.to_datetime(df[column], format=datetime_format, errors="coerce")
+        df = aggregations.add_derived_columns(df)
+    load = aggregations.frame_loader(df)
+
+    # 일별 분석: 마지막 날짜의 전일~당일 요약과 시간대별 집계
+    last_day = df["승차일시"].max().date()
+    with recorder.stage("daily"):
+        aggregations.daily_summary(load, *queries.day_range(last_day - pd.Timedelta(days=1), last_day))
+        hourly_day = aggregations.hourly_counts(load, *queries.day_range(last_day))
+
+    # 월별 분석: 마지막 월의 전월~당월 일별 요약, 고유 이용자 수, 상위 출발지, 시간대별 집계
+    month = last_day.strftime("%Y-%m")
+    start, end = queries.month_range(month)
+    previous_start, _ = queries.month_range((pd.Timestamp(start) - pd.DateOffset(months=1)).strftime("%Y-%m"))
+    with recorder.stage("monthly"):
+        aggregations.daily_summary(load, previous_start, end, require_coords=True)
+        aggregations.distinct_counts(load, start, end, require_coords=True)
+        top_si_gun_gu = aggregations.top_locations(load, "출발지_시군구", start, end, 10, require_coords=True)
+        aggregations.top_locations(load, "출발지_읍면동", start, end, 10, require_coords=True)
+        hourly_month = aggregations.hourly_counts(load, start, end, require_coords=True)
+
+    with recorder.stage("map"):
+        points = aggregations.map_points(load, start, end)
+        map_html = mapviz.build_configured_map(points, settings["map"]).get_root().render()
+
+    with recorder.stage("figure"):
+        views.hourly_figure(hourly_day, last_day).to_json()
+        views.hourly_figure(hourly_month, month).to_json()
+        views.location_figure(top_si_gun_gu, "출발지_시군구", "Top 10 출발지 시군구").to_json()
+
+    return {
+        "file": os.path.basename(path),
+        "rows": len(df),
+        "ingest": settings["ingest"].get("mode"),
+        "map_mode": settings["map"].get("mode"),
+        "map_html_kb": round(len(map_html.encode("utf-8")) / 1024, 1),
+        "stages": recorder.stages,
+    }
+
+
+def _commit():
+    try:
+        output = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return output.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _previous(result):
+    if not os.path.exists(RESULTS_FILE):
+        return None
+    previous = None
+    with open(RESULTS_FILE, "r", encoding="utf-8") as file:
+        for line in file:
+            record = json.loads(line)
+            if (record["rows"], record["ingest"], record["map_mode"]) == (result["rows"], result["ingest"], result["map_mode"]):
+                previous = record
+    return previous
+
+
+# 결과 출력 (직전 결과가 있으면 단계별 시간 변화율도 표시)
+def report(result, previous=None):
+    print(f"{result['file']} ({result['rows']:,}행, ingest={result['ingest']}, map={result['map_mode']}, commit={result['commit']})")
+    for name in STAGES:
+        stage = result["stages"][name]
+        line = f"  {name:<8}{stage['seconds']:>9.3f}초  RSS {stage['rss_delta_mb'] or 0:+8.1f}MB  프로세스 최대 {stage['peak_rss_mb'] or 0:8.1f}MB"
+        if previous is not None and previous["stages"].get(name, {}).get("seconds"):
+            change = stage["seconds"] / previous["stages"][name]["seconds"] - 1
+            line += f"  (직전 {previous['commit']} 대비 {change:+.0%})"
+        print(line)
+
+
+def record(result):
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    with open(RESULTS_FILE, "a", encoding="utf-8") as file:
+        file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="일별/월별 파이프라인 단계별 시간·메모리 측정")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="측정할 CSV 파일")
+    source.add_argument("--rows", type=int, nargs="+", help="합성 데이터 행 수 (없으면 bench/ 에 생성)")
+    parser.add_argument("--ingest", choices=["full", "chunked"], help="CSV 읽기 모드 (기본값: [ingest] mode)")
+    parser.add_argument("--map", choices=["dong", "grid", "cluster"], help="지도 모드 (기본값: [map] mode)")
+    args = parser.parse_args()
+
+    if args.rows:
+        # 크기마다 새 프로세스에서 --csv 로 다시 실행
+        for rows in args.rows:
+            path = os.path.join(BENCH_DIR, f"rides_{rows}.csv")
+            if not os.path.exists(path):
+                print(f"{path} 생성 중...")
+                synthetic.write_csv(path, rows)
+            command = [sys.executable, os.path.abspath(__file__), "--csv", path]
+            for option in ("ingest", "map"):
+                if getattr(args, option):
+                    command += [f"--{option}", getattr(args, option)]
+            subprocess.run(command, check=True)
+        return
+
+    settings = config.load_config()
+    if args.ingest:
+        settings["ingest"]["mode"] = args.ingest
+    if args.map:
+        settings["map"]["mode"] = args.map
+
+    result = run(args.csv, settings)
+    result.update(
+        time=datetime.now().isoformat(timespec="seconds"),
+        commit=_commit(),
+        python=platform.python_version(),
+        pandas=pd.__version__,
+    )
+    previous = _previous(result)
+    record(result)
+    report(result, previous)
+
+
+if __name__ == "__main__":
+    main()
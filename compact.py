@@ -0,0 +1,96 @@
+# 읽어 들인 운행 데이터의 메모리 줄이기
+# 회사 컴퓨터 메모리가 부족하므로 CSV 를 읽은 뒤(DJTC_dash.py), 스냅샷 파티션을 쓸 때(djtc.py) 한 번 정리한다
+#   회원ID/기사ID      : 사전 인코딩 (범주형 = 정수 코드 + 고유 값 목록, 원래 값은 .cat.categories 로 찾는다)
+#   시군구/읍면동, year_month : 범주형 (같은 문자열을 한 번만 저장)
+#   출발지 좌표, 예약_시 : float32 (좌표 오차 약 1m)
+#   화면에서 읽지 않는 컬럼은 버린다 (스냅샷은 원본 테이블 사본이므로 컬럼은 두고, 읽을 때 필요한 컬럼만 읽는다)
+# 범주형은 결측값과 원래 값을 그대로 유지하므로 nunique/count, 스케치 해시 결과는 바뀌지 않는다
+#
+# 사용법: python compact.py --csv 파일   # 컬럼별 정리 전/후 메모리 출력
+import argparse
+
+import pandas as pd
+
+import aggregations
+import instrument
+from ingest import USE_COLUMNS
+
+ID_COLUMNS = ["회원ID", "기사ID"]
+CATEGORY_COLUMNS = ["출발지_시군구", "출발지_읍면동", "year_month"]
+FLOAT32_COLUMNS = ["출발지_X좌표_수정", "출발지_Y좌표_수정", "예약_시"]
+
+# 남기는 컬럼 (원본 컬럼 + 파생 컬럼)
+KEEP_COLUMNS = USE_COLUMNS + list(aggregations.DERIVED_COLUMNS)
+
+
+def _mb(value):
+    return float(value) / 1024 ** 2
+
+
+# 컬럼별 메모리(MB)
+def memory_by_column(df):
+    return {column: _mb(size) for column, size in df.memory_usage(deep=True, index=False).items()}
+
+
+# 사전 인코딩: 고유 값 목록(categories)과 정수 코드(codes)
+# 코드 자료형은 고유 값 수에 따라 int8/int16/int32 중 가장 작은 것이 된다
+def encode(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.remove_unused_categories()
+    return series.astype("category")
+
+
+# df 를 정리한 새 DataFrame 과 리포트 (정리 전/후 MB, 버린 컬럼, 컬럼별 (자료형, 전 MB, 후 MB))
+# columns 가 None 이면 컬럼은 버리지 않고 자료형만 줄인다
+@instrument.timed("compact")
+def compact(df, columns=KEEP_COLUMNS):
+    before = memory_by_column(df)
+    before_types = df.dtypes.astype(str).to_dict()
+    dropped = [c for c in df.columns if c not in columns] if columns is not None else []
+    df = df.drop(columns=dropped)
+    for column in df.columns:
+        if column in ID_COLUMNS or column in CATEGORY_COLUMNS:
+            df[column] = encode(df[column])
+        elif column in FLOAT32_COLUMNS:
+            df[column] = pd.to_numeric(df[column], errors="coerce").astype("float32")
+    after = memory_by_column(df)
+
+    report = {
+        "rows": len(df),
+        "before_mb": sum(before.values()),
+        "after_mb": sum(after.values()),
+        "dropped": dropped,
+        "columns": {
+            column: (before_types[column], str(df[column].dtype) if column in df.columns else None,
+                     size, after.get(column, 0.0))
+            for column, size in before.items()
+        },
+    }
+    return df, report
+
+
+def print_report(report):
+    print(f"{report['rows']:,}행: {report['before_mb']:.1f}MB -> {report['after_mb']:.1f}MB")
+    for column, (before_type, after_type, before_mb, after_mb) in report["columns"].items():
+        if after_type is None:
+            print(f"  {column:<14}{before_type:>16} {before_mb:8.1f}MB -> 버림")
+        else:
+            print(f"  {column:<14}{before_type:>16} {before_mb:8.1f}MB -> {after_type:>10} {after_mb:8.1f}MB")
+
+
+def main():
+    import config
+    import ingest
+
+    parser = argparse.ArgumentParser(description="운행 데이터 메모리 정리 전/후 비교")
+    parser.add_argument("--csv", required=True, help="CSV 내보내기 파일")
+    args = parser.parse_args()
+
+    settings = config.load_config()
+    df = aggregations.add_derived_columns(ingest.load_export(args.csv, settings["ingest"]))
+    _, report = compact(df)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# 대시보드 설정
+# djtc.ini 파일을 읽고 (없으면 기본값 사용) DJTC_<섹션>_<키> 환경변수로 덮어쓴다
+# 예) DJTC_DATABASE_PASSWORD=... streamlit run djtc.py
+import configparser
+import os
+
+
+CONFIG_PATH = os.environ.get(
+    "DJTC_CONFIG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "djtc.ini"),
+)
+
+DEFAULTS = {
+    "database": {
+        "host": "localhost",
+        "port": "3306",
+        "user": "",
+        "password": "",
+        "database": "djtcdb",
+        # 커넥션 풀 크기와 타임아웃(초)
+        "pool_size": "5",
+        "pool_timeout": "10",
+        "connect_timeout": "5",
+        # 마지막 사용 후 이 시간(초)이 지난 연결은 꺼내기 전에 ping으로 확인한다
+        "health_check_interval": "30",
+        # 큰 결과를 읽을 때 fetchmany 한 번에 가져올 행 수
+        "fetch_batch_size": "50000",
+    },
+    "data": {
+        # mysql: DB에서 바로 집계 / snapshot: 로컬 스냅샷 파티션에서 집계
+        "source": "mysql",
+    },
+    "snapshot": {
+        "path": "snapshot",
+        # 중복 제거에 쓸 기본키 컬럼 (비워두면 모든 컬럼이 같은 행을 중복으로 본다)
+        "key_column": "",
+    },
+    "rollup": {
+        # true 이면 요약 표/지표/시간대별 그래프/상위 출발지를 롤업(python rollup.py)에서 읽는다
+        "enabled": "false",
+        "path": "rollup",
+        # 고유 이용자/기사 수 스케치의 정밀도 (레지스터 2^precision 개, 12 이면 오차 약 1.6%)
+        "sketch_precision": "12",
+        # 구간 고유 이용자 수 계산 방법 (sketch: 롤업 스케치 추정 / exact: 원본에서 정확히 계산, 검증용)
+        "distinct": "sketch",
+    },
+    "cache": {
+        # 파싱된 데이터셋 캐시의 메모리 상한(MB)과 유효 시간(초)
+        "max_mb": "1024",
+        "ttl": "3600",
+    },
+    "ingest": {
+        # full: CSV 전체를 한 번에 읽음 / chunked: 청크 단위로 필요한 컬럼만 읽고 자료형을 줄임
+        "mode": "full",
+        "encoding": "CP949",
+        "chunksize": "200000",
+        "datetime_format": "%Y-%m-%d %H:%M:%S",
+        # 청크 모드로 읽는 동안 늘어난 RSS 가 이 값(MB)을 넘으면 경고 (0 이면 확인하지 않음)
+        "memory_budget_mb": "0",
+        # 읽은 뒤 ID 사전 인코딩, 지역 범주형, 좌표 float32, 쓰지 않는 컬럼 버리기 (compact.py)
+        "compact": "true",
+    },
+    "map": {
+        # dong: 읍면동별 마커 / grid: cell_size(도) 격자별 마커 / cluster: 브라우저 클러스터링
+        # index: 격자 인덱스의 격자 건수로 히트맵
+        "mode": "dong",
+        "cell_size": "0.005",
+        # 그룹 마커 최대 개수, cluster 모드에서 넘기는 최대 좌표 수
+        "max_markers": "300",
+        "max_points": "20000",
+        # index 모드에서 읽을 줌 레벨과 화면 범위 (서,남,동,북)
+        "zoom": "11",
+        "bbox": "127.20,36.18,127.56,36.50",
+        # 월별 지도 HTML 저장 위치 (비우면 저장하지 않음)와 보관할 파일 수
+        "cache_path": "map_cache",
+        "cache_max_files": "48",
+        # 지도 HTML 형식 (folium: folium 지도 / compact: 마커 배열 하나로 그리는 경량 지도, dong/grid 모드만)
+        # compact 지도에 넣을 Leaflet 파일 위치(python offline_map.py --download 로 받음, 없으면 CDN)와 배경 지도 타일 주소
+        "export": "folium",
+        "assets_path": "map_assets",
+        "tiles": "https://tile.openstreetmap.org/{z}/{x}/{y}.png",
+    },
+    "grid": {
+        # 격자 인덱스 위치 (python spatial_index.py 로 갱신)
+        "path": "grid",
+    },
+    "utilization": {
+        # 운행 한 건이 차량을 묶어 두는 구간: 승차 전 이동(분) ~ 승차 후 운행(분), 예약시간보다 앞서지는 않는다
+        "approach_minutes": "15",
+        "service_minutes": "40",
+    },
+    "od": {
+        # 출발지-도착지 이동 행렬 위치 (python od.py 로 갱신)
+        "path": "od",
+        # 구역 단위: dong (시군구+읍면동) / grid (cell_size 도 격자)
+        "zone": "dong",
+        "cell_size": "0.01",
+        # 출발지/도착지의 (시군구, 읍면동) 컬럼과 (X, Y) 좌표 컬럼, 원본 테이블의 도착지 컬럼 이름에 맞춘다
+        "origin_columns": "출발지_시군구,출발지_읍면동",
+        "destination_columns": "도착지_시군구,도착지_읍면동",
+        "origin_coords": "출발지_X좌표_수정,출발지_Y좌표_수정",
+        "destination_coords": "도착지_X좌표_수정,도착지_Y좌표_수정",
+    },
+    "engine": {
+        # 분석 엔진이 보관하는 집계 결과 수와 MySQL 소스의 결과 유지 시간(초)
+        # CSV/스냅샷/롤업은 파일이 바뀌면 바로 다시 계산한다
+        "max_entries": "256",
+        "result_ttl": "300",
+        # 당일/전일 등 화면에 필요한 집계를 동시에 계산하는 스레드 수와
+        # 다음/이전 날짜·월을 미리 계산하는 백그라운드 스레드 수 (0 이면 끔)
+        "workers": "4",
+        "prefetch_workers": "2",
+        # 로컬 소스(CSV, 스냅샷)의 집계 계산 방식: pandas / duckdb (duckdb 패키지 필요, MySQL 은 항상 서버에서 집계)
+        # threads: duckdb 가 쓰는 스레드 수 (0 이면 코어 수)
+        "backend": "pandas",
+        "threads": "0",
+    },
+    "depot": {
+        # 기본 차고지 수와 계산 방법 (pmedian: 수요 지점 위 p-median 근사 / kmeans: 가중 평균 위치)
+        "k": "6",
+        "method": "pmedian",
+        # 좌표 반올림 자릿수 (4자리 ≈ 10m), 반복 횟수 상한
+        "precision": "4",
+        "max_iter": "50",
+        # 거리 행렬을 나눠 계산할 때 한 번에 만드는 원소 수 (4,000,000개 ≈ 32MB)
+        "block_size": "4000000",
+        # (월, k) 별 계산 결과 저장 위치
+        "path": "depot",
+    },
+    "debug": {
+        # 사이드바 "성능 측정" 의 기본값과 측정 결과를 한 줄씩 추가할 JSONL 파일 (비우면 저장하지 않음)
+        "instrument": "false",
+        "export_path": "",
+    },
+}
+
+
+def load_config(path=CONFIG_PATH):
+    # 날짜 형식(%Y-%m-%d ...) 을 그대로 쓸 수 있도록 보간은 끈다
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read_dict(DEFAULTS)
+    parser.read(path, encoding="utf-8")
+
+    # 환경변수 덮어쓰기
+    for section in parser.sections():
+        for key in parser[section]:
+            env_name = f"DJTC_{section}_{key}".upper()
+            if env_name in os.environ:
+                parser[section][key] = os.environ[env_name]
+    return parser
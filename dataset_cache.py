@@ -0,0 +1,99 @@
+# 파싱이 끝난 데이터셋(DataFrame) 캐시
+# 키는 (파일 경로, 수정 시각, 크기) 이므로 파일이 바뀌면 자동으로 새로 읽는다
+# TTL 이 지난 항목은 다시 읽고, 메모리 상한을 넘으면 가장 오래 안 쓴 항목부터 버린다 (LRU)
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class DatasetCache:
+    def __init__(self, max_bytes=1024 ** 3, ttl=3600):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (frame, nbytes, loaded_at)
+        self._lock = threading.Lock()
+        # 같은 파일을 여러 세션이 동시에 읽지 않도록 로드는 한 번에 하나씩
+        self._load_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @staticmethod
+    def file_key(path):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            frame, _, loaded_at = entry
+            if self.ttl and time.monotonic() - loaded_at > self.ttl:
+                del self._entries[key]
+                self._stats["expirations"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return frame
+
+    # path 의 현재 파일에 해당하는 캐시된 데이터셋 (없거나 만료됐으면 None)
+    # 읽지 않고 들여다보기만 하므로 적중 횟수와 LRU 순서를 바꾸지 않는다 (화면에 리포트를 그릴 때 사용)
+    def peek(self, path):
+        try:
+            key = self.file_key(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        frame, _, loaded_at = entry
+        if self.ttl and time.monotonic() - loaded_at > self.ttl:
+            return None
+        return frame
+
+    # path 의 데이터셋을 돌려준다. 캐시에 없으면 loader(path) 로 읽어서 저장
+    # 캐시된 DataFrame은 여러 세션이 공유하므로 호출한 쪽에서 수정하면 안 된다
+    def get(self, path, loader):
+        key = self.file_key(path)
+        frame = self._lookup(key)
+        if frame is not None:
+            return frame
+
+        with self._load_lock:
+            # 기다리는 동안 다른 세션이 이미 읽었을 수 있다
+            frame = self._lookup(key)
+            if frame is not None:
+                return frame
+            frame = loader(path)
+            nbytes = int(frame.memory_usage(deep=True).sum())
+
+        with self._lock:
+            self._stats["misses"] += 1
+            # 같은 파일의 예전 버전은 더 이상 쓸 일이 없다
+            for old_key in [k for k in self._entries if k[0] == key[0]]:
+                del self._entries[old_key]
+            self._entries[key] = (frame, nbytes, time.monotonic())
+            self._evict()
+        return frame
+
+    def _evict(self):
+        total = sum(nbytes for _, nbytes, _ in self._entries.values())
+        # 방금 넣은 항목 하나는 상한을 넘더라도 남겨둔다
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, (_, nbytes, _) = self._entries.popitem(last=False)
+            total -= nbytes
+            self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = sum(nbytes for _, nbytes, _ in self._entries.values())
+        requests = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / requests if requests else 0.0
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,246 @@
+# MySQL 커넥션 풀
+# 위젯을 조작할 때마다 connect/close 하던 것을 크기가 제한된 풀에서 연결을 빌려 쓰는 방식으로 변경
+# Streamlit 앱에서는 st.cache_resource 로 풀 하나를 모든 세션이 공유한다
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import mysql.connector
+import numpy as np
+import pandas as pd
+from mysql.connector import Error, FieldType
+from mysql.connector.errors import PoolError
+
+import instrument
+
+INTEGER_TYPES = {FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.LONGLONG, FieldType.INT24, FieldType.YEAR}
+FLOAT_TYPES = {FieldType.FLOAT, FieldType.DOUBLE, FieldType.DECIMAL, FieldType.NEWDECIMAL}
+DATETIME_TYPES = {FieldType.DATETIME, FieldType.TIMESTAMP, FieldType.DATE, FieldType.NEWDATE}
+
+
+class ConnectionPool:
+    # connect: 연결 생성 함수 (기본 mysql.connector.connect, 테스트 시 호환 서버/대체 함수 사용 가능)
+    def __init__(self, size=5, timeout=10, health_check_interval=30, connect=None, **connect_args):
+        if size < 1:
+            raise ValueError("pool size는 1 이상이어야 합니다")
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._connect = connect or mysql.connector.connect
+        self._connect_args = connect_args
+        # (연결, 마지막 반납 시각) 을 보관, 최근에 쓴 연결부터 꺼내도록 LIFO
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "created": 0,
+            "reconnects": 0,
+            "discarded": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+        }
+
+    def _new_connection(self):
+        connection = self._connect(**self._connect_args)
+        with self._lock:
+            self._stats["created"] += 1
+        return connection
+
+    # 오래 쉬고 있던 연결은 ping으로 확인하고, 끊겼으면 새로 연결한다
+    def _ensure_alive(self, connection, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return connection
+        try:
+            connection.ping(reconnect=False)
+            return connection
+        except Error:
+            self._close_quietly(connection)
+            with self._lock:
+                self._stats["reconnects"] += 1
+            return self._new_connection()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Error:
+            pass
+
+    def acquire(self):
+        if self._closed:
+            raise PoolError("커넥션 풀이 이미 닫혔습니다")
+        started = time.perf_counter()
+        waited = False
+        try:
+            connection, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    connection, last_used = self._new_connection(), time.monotonic()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                # 풀이 가득 찼으면 다른 세션이 반납할 때까지 대기
+                waited = True
+                try:
+                    connection, last_used = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats["timeouts"] += 1
+                    raise PoolError(f"{self.timeout}초 안에 DB 연결을 얻지 못했습니다 (pool size={self.size})")
+
+        try:
+            connection = self._ensure_alive(connection, last_used)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+        wait_time = time.perf_counter() - started
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["waits"] += int(waited)
+            self._stats["wait_time_total"] += wait_time
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], wait_time)
+        return connection
+
+    # discard=True 이면 (쿼리 중 연결 오류 등) 풀에 돌려놓지 않고 닫는다
+    def release(self, connection, discard=False):
+        if discard or self._closed:
+            self._close_quietly(connection)
+            with self._lock:
+                self._created -= 1
+                self._stats["discarded"] += int(discard)
+            return
+        self._idle.put((connection, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except Error:
+            discard = not connection.is_connected()
+            raise
+        finally:
+            self.release(connection, discard=discard)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._created
+        stats["idle"] = self._idle.qsize()
+        stats["in_use"] = stats["open"] - stats["idle"]
+        stats["wait_time_avg"] = stats["wait_time_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+        return stats
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close_quietly(connection)
+            with self._lock:
+                self._created -= 1
+
+
+# config.load_config()["database"] 섹션으로 풀 생성
+def create_pool(settings, connect=None):
+    return ConnectionPool(
+        size=settings.getint("pool_size"),
+        timeout=settings.getfloat("pool_timeout"),
+        health_check_interval=settings.getfloat("health_check_interval"),
+        connect=connect,
+        host=settings.get("host"),
+        port=settings.getint("port"),
+        user=settings.get("user"),
+        password=settings.get("password"),
+        database=settings.get("database"),
+        connection_timeout=settings.getint("connect_timeout"),
+        # 풀에서 재사용하는 연결이 예전 트랜잭션 스냅샷을 보지 않도록 autocommit
+        autocommit=True,
+    )
+
+
+# 풀에서 연결을 빌려 쿼리를 실행하고 결과를 dict 리스트로 반환
+def get_data(pool, query, params=None):
+    with pool.connection() as connection:
+        cursor = connection.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+# fetchmany 로 받은 튜플 묶음을 컬럼 배열로 바꿔 DataFrame 생성 (행마다 dict 를 만들지 않는다)
+# 컬럼 자료형은 cursor.description 의 MySQL 타입으로 정한다
+def _batch_to_frame(rows, description):
+    columns = {}
+    for (name, type_code, *_), values in zip(description, zip(*rows)):
+        if type_code in INTEGER_TYPES:
+            # NULL 이 섞여 있으면 float64 (NaN) 로 둔다
+            dtype = np.int64 if None not in values else np.float64
+            columns[name] = np.array(values, dtype=dtype)
+        elif type_code in FLOAT_TYPES:
+            columns[name] = np.array(values, dtype=np.float64)
+        elif type_code in DATETIME_TYPES:
+            columns[name] = np.array(values, dtype="datetime64[us]")
+        else:
+            columns[name] = np.array(values, dtype=object)
+    return pd.DataFrame(columns, copy=False)
+
+
+# 버퍼 없는(서버 측) 커서로 batch_size 행씩 읽어 DataFrame 묶음을 하나씩 돌려준다
+# 결과 전체를 메모리에 올리지 않고 묶음 단위로 처리할 수 있다
+def iter_batches(pool, query, params=None, batch_size=50_000):
+    connection = pool.acquire()
+    # 끝까지 읽지 않고 멈추면 읽지 않은 결과가 남으므로 연결을 풀에 돌려놓지 않는다
+    # 조회가 Error 로 실패하면 ConnectionPool.connection 과 같이 연결이 끊겼을 때만 버린다
+    discard = True
+    try:
+        cursor = connection.cursor(buffered=False)
+        try:
+            cursor.execute(query, params)
+            description = cursor.description
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield _batch_to_frame(rows, description)
+            discard = False
+        except Error:
+            discard = not connection.is_connected()
+            raise
+        finally:
+            if not discard:
+                cursor.close()
+    finally:
+        pool.release(connection, discard=discard)
+
+
+# iter_batches 결과를 하나의 DataFrame 으로 합쳐서 반환
+def fetch_frame(pool, query, params=None, batch_size=50_000):
+    with instrument.stage("db.fetch") as record:
+        batches = list(iter_batches(pool, query, params, batch_size))
+        record["rows"] = sum(len(batch) for batch in batches)
+    if not batches:
+        return pd.DataFrame()
+    if len(batches) == 1:
+        return batches[0]
+    return pd.concat(batches, ignore_index=True)
@@ -0,0 +1,292 @@
+# 최적 차고지 계산 (출발지 수요 가중 p-median)
+# 출발지 좌표를 precision 자리로 반올림해서 같은 위치는 한 지점으로 묶고 운행 건수를 가중치로 쓴다
+# 가중 k-means 로 초기 위치를 잡은 뒤, 군집마다 가중 거리 합이 가장 작은 수요 지점으로 차고지를 옮기는 과정을 반복한다
+# 목적함수는 모든 운행의 가장 가까운 차고지까지 거리(km) 합이다
+#
+# 거리는 평균 위도 기준 평면 근사(km)이고, 지점 x 차고지 거리 행렬은 block_size 개 원소씩 나눠 계산해서 메모리를 제한한다
+# 결과는 [depot] path 아래 (월, k) 별 JSON 으로 저장하고, 수요 데이터가 바뀌었으면 다시 계산한다
+#
+# 사용법: python depot.py --month 2024-01 -k 6
+#         python depot.py --csv 파일 --html 최적차고지.html   # 최근 월로 계산하고 지도 HTML 저장
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrument
+
+X_COLUMN = "출발지_X좌표_수정"
+Y_COLUMN = "출발지_Y좌표_수정"
+
+KM_PER_DEGREE = 111.32
+
+
+# 출발지 좌표를 반올림해서 같은 위치를 묶은 수요 지점 (x, y, weight, label)
+def demand_points(points, precision=4):
+    points = points.dropna(subset=[X_COLUMN, Y_COLUMN])
+    frame = pd.DataFrame({
+        "x": points[X_COLUMN].to_numpy(dtype=np.float64).round(precision),
+        "y": points[Y_COLUMN].to_numpy(dtype=np.float64).round(precision),
+        "label": points["출발지_시군구"].astype(str).to_numpy() + " " + points["출발지_읍면동"].astype(str).to_numpy(),
+    })
+    return frame.groupby(["x", "y"], sort=True).agg(
+        weight=("label", "size"), label=("label", "first")
+    ).reset_index()
+
+
+# 수요 지점이 같으면 같은 값 (캐시된 결과가 현재 데이터로 계산한 것인지 확인하는 데 쓴다)
+def signature(demand):
+    digest = hashlib.sha1()
+    for column in ("x", "y", "weight"):
+        digest.update(np.ascontiguousarray(demand[column].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()[:16]
+
+
+# 경도/위도를 km 평면 좌표로 변환
+def _project(x, y, lat0):
+    return np.column_stack([x * KM_PER_DEGREE * np.cos(np.radians(lat0)), y * KM_PER_DEGREE])
+
+
+# (len(a), len(b)) 제곱 거리 행렬 (x, y 축을 따로 계산해서 (len(a), len(b), 2) 중간 배열을 만들지 않는다)
+def _squared_distances(a, b):
+    return (a[:, None, 0] - b[None, :, 0]) ** 2 + (a[:, None, 1] - b[None, :, 1]) ** 2
+
+
+# 지점마다 가장 가까운 중심의 번호와 거리 (지점을 나눠서 block_size 개 원소씩 계산)
+def nearest(points, centers, block_size=4_000_000):
+    rows = max(1, block_size // max(len(centers), 1))
+    index = np.empty(len(points), dtype=np.int64)
+    distance = np.empty(len(points), dtype=np.float64)
+    for first in range(0, len(points), rows):
+        block = points[first:first + rows]
+        # 제곱 거리로 비교하고 선택된 거리만 제곱근을 구한다
+        squared = _squared_distances(block, centers)
+        index[first:first + rows] = squared.argmin(axis=1)
+        distance[first:first + rows] = np.sqrt(squared[np.arange(len(block)), index[first:first + rows]])
+    return index, distance
+
+
+# 가중 k-means++ 초기 중심
+def _initial_centers(points, weights, k, rng):
+    centers = [points[rng.choice(len(points), p=weights / weights.sum())]]
+    distance = np.sqrt(((points - centers[0]) ** 2).sum(axis=1))
+    for _ in range(1, k):
+        probability = weights * distance ** 2
+        if probability.sum() == 0:
+            break
+        centers.append(points[rng.choice(len(points), p=probability / probability.sum())])
+        distance = np.minimum(distance, np.sqrt(((points - centers[-1]) ** 2).sum(axis=1)))
+    return np.array(centers)
+
+
+# 배정된 수요가 없는 군집을 옮길 지점: 현재 가장 가까운 차고지까지의 가중 거리가 큰 순으로 count 개
+# (exclude 의 지점은 이미 차고지이므로 뺀다)
+def _farthest(distance, weights, count, exclude=()):
+    order = np.argsort(-(distance * weights), kind="stable")
+    order = order[~np.isin(order, np.asarray(exclude, dtype=np.int64))]
+    return order[:count]
+
+
+# 군집 안에서 가중 거리 합이 가장 작은 지점 (현재 중심에 가까운 max_candidates 개만 후보로 본다)
+def _medoid(points, weights, center, max_candidates, block_size):
+    candidates = np.argsort(((points - center) ** 2).sum(axis=1))[:max_candidates]
+    rows = max(1, block_size // len(points))
+    costs = np.empty(len(candidates), dtype=np.float64)
+    for first in range(0, len(candidates), rows):
+        block = points[candidates[first:first + rows]]
+        costs[first:first + rows] = np.sqrt(_squared_distances(block, points)) @ weights
+    return candidates[np.argmin(costs)]
+
+
+# demand 에 k 개 차고지 배치
+# method: kmeans(가중 평균 위치) / pmedian(k-means 결과에서 시작해 차고지를 수요 지점 위에 두고 거리 합을 줄임)
+def solve(demand, k, method="pmedian", max_iter=50, block_size=4_000_000, max_candidates=200,
+          tolerance_km=0.01, seed=0):
+    started = time.perf_counter()
+    weights = demand["weight"].to_numpy(dtype=np.float64)
+    lat0 = np.average(demand["y"], weights=weights)
+    points = _project(demand["x"].to_numpy(), demand["y"].to_numpy(), lat0)
+    k = min(k, len(points))
+    rng = np.random.default_rng(seed)
+
+    centers = _initial_centers(points, weights, k, rng)
+    k = len(centers)
+    assignment = None
+    iterations = 0
+    # 가중 k-means (Lloyd)
+    for iterations in range(1, max_iter + 1):
+        new_assignment, distance = nearest(points, centers, block_size)
+        if assignment is not None and np.array_equal(new_assignment, assignment):
+            break
+        assignment = new_assignment
+        total = np.bincount(assignment, weights=weights, minlength=k)
+        filled = total > 0
+        previous = centers.copy()
+        for axis in range(2):
+            sums = np.bincount(assignment, weights=weights * points[:, axis], minlength=k)
+            centers[filled, axis] = sums[filled] / total[filled]
+        # 빈 군집의 중심은 그대로 두면 계속 비어 있으므로 멀리 떨어진 수요 지점으로 옮긴다
+        if not filled.all():
+            reseeded = _farthest(distance, weights, int((~filled).sum()))
+            centers[np.flatnonzero(~filled)[:len(reseeded)]] = points[reseeded]
+        # 중심이 모두 tolerance_km 미만으로 움직이면 수렴으로 본다
+        if np.sqrt(((centers - previous) ** 2).sum(axis=1)).max() < tolerance_km:
+            break
+
+    sites = None
+    if method == "pmedian":
+        # 군집별 medoid 로 옮기고 다시 배정하는 과정을 차고지가 바뀌지 않을 때까지 반복
+        assignment, distance = nearest(points, centers, block_size)
+        sites = np.zeros(k, dtype=np.int64)
+        for _ in range(max_iter):
+            empty = []
+            for cluster in range(k):
+                members = np.flatnonzero(assignment == cluster)
+                if len(members):
+                    sites[cluster] = members[_medoid(
+                        points[members], weights[members], centers[cluster], max_candidates, block_size
+                    )]
+                else:
+                    empty.append(cluster)
+            # 배정된 수요가 없는 차고지는 이전 위치(또는 0번 지점)에 남지 않도록 멀리 떨어진 수요 지점으로 옮긴다
+            if empty:
+                filled = np.setdiff1d(np.arange(k), empty)
+                reseeded = _farthest(distance, weights, len(empty), exclude=sites[filled])
+                sites[empty[:len(reseeded)]] = reseeded
+            iterations += 1
+            if np.array_equal(points[sites], centers):
+                break
+            centers = points[sites]
+            assignment, distance = nearest(points, centers, block_size)
+
+    assignment, distance = nearest(points, centers, block_size)
+    objective = float(distance @ weights)
+    served = np.bincount(assignment, weights=weights, minlength=k)
+    served_distance = np.bincount(assignment, weights=weights * distance, minlength=k)
+
+    if sites is None:
+        # k-means 중심은 수요 지점이 아니므로 가장 가까운 수요 지점의 읍면동을 이름으로 쓴다
+        sites, _ = nearest(centers, points, block_size)
+    depots = pd.DataFrame({
+        "lon": centers[:, 0] / (KM_PER_DEGREE * np.cos(np.radians(lat0))),
+        "lat": centers[:, 1] / KM_PER_DEGREE,
+        "label": demand["label"].to_numpy()[sites],
+        "demand": served.astype(np.int64),
+        "mean_km": np.divide(served_distance, served, out=np.zeros(k), where=served > 0),
+    }).sort_values("demand", ascending=False, kind="stable").reset_index(drop=True)
+
+    return {
+        "method": method,
+        "k": k,
+        "points": len(points),
+        "rides": int(weights.sum()),
+        "objective_km": objective,
+        "mean_km": objective / weights.sum(),
+        "iterations": iterations,
+        "seconds": time.perf_counter() - started,
+        "depots": depots.round({"lon": 6, "lat": 6, "mean_km": 3}).to_dict(orient="records"),
+    }
+
+
+# (월, k, method) 별 계산 결과를 JSON 으로 저장
+class DepotCache:
+    def __init__(self, path):
+        self.path = path
+
+    def _result_path(self, month, k, method):
+        return os.path.join(self.path, f"month={month}_k={k}_{method}.json")
+
+    def load(self, month, k, method):
+        path = self._result_path(month, k, method)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def save(self, result):
+        os.makedirs(self.path, exist_ok=True)
+        path = self._result_path(result["month"], result["k_requested"], result["method"])
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(result, file, ensure_ascii=False, indent=2)
+        os.replace(path + ".tmp", path)
+
+
+# 한 달 치 출발지 좌표로 차고지 계산 (같은 수요로 계산한 결과가 캐시에 있으면 그대로 쓴다)
+@instrument.timed("depot.optimize")
+def optimize(points, month, k, cache=None, method="pmedian", precision=4, **solve_args):
+    demand = demand_points(points, precision)
+    if demand.empty:
+        return None
+    version = signature(demand)
+    if cache is not None:
+        cached = cache.load(month, k, method)
+        if cached is not None and cached["signature"] == version:
+            cached["cached"] = True
+            return cached
+
+    result = solve(demand, k, method=method, **solve_args)
+    result.update(month=month, k_requested=k, signature=version)
+    if cache is not None:
+        cache.save(result)
+    result["cached"] = False
+    return result
+
+
+# config 의 [depot] 섹션으로 계산
+def optimize_configured(points, month, k, settings):
+    return optimize(
+        points,
+        month,
+        k,
+        cache=DepotCache(settings.get("path")),
+        method=settings.get("method"),
+        precision=settings.getint("precision"),
+        max_iter=settings.getint("max_iter"),
+        block_size=settings.getint("block_size"),
+    )
+
+
+def main():
+    import aggregations
+    import config
+    import offline_map
+    import queries
+    import sources
+
+    parser = argparse.ArgumentParser(description="출발지 수요 기반 최적 차고지 계산")
+    sources.add_source_arguments(parser)
+    parser.add_argument("--month", help="계산할 월 (YYYY-MM, 기본값: 최근 월)")
+    parser.add_argument("-k", type=int, help="차고지 수 (기본값: [depot] k)")
+    parser.add_argument("--html", help="차고지 지도를 저장할 HTML 파일")
+    args = parser.parse_args()
+
+    settings = config.load_config()
+    k = args.k or settings["depot"].getint("k")
+    with sources.open_loader(settings, args.csv, args.refresh) as (load, months):
+        month = args.month or (months[-1] if months else None)
+        if month is None:
+            print("데이터가 없습니다.")
+            return
+        points = aggregations.map_points(load, *queries.month_range(month))
+    result = optimize_configured(points, month, k, settings["depot"])
+    if result is None:
+        print(f"{month}: 좌표가 있는 운행이 없습니다.")
+        return
+
+    print(f"{month} 차고지 {result['k']}곳 ({result['method']}, 수요 지점 {result['points']:,}개, 운행 {result['rides']:,}건)")
+    print(f"목적함수 {result['objective_km']:,.1f}km, 평균 이동 거리 {result['mean_km']:.2f}km, "
+          f"{result['seconds']:.2f}초{' (캐시)' if result['cached'] else ''}")
+    for rank, depot in enumerate(result["depots"], start=1):
+        print(f"{rank:2d}. {depot['label']}  {depot['demand']:,}건  평균 {depot['mean_km']:.2f}km  ({depot['lat']}, {depot['lon']})")
+    if args.html:
+        with open(args.html, "w", encoding="utf-8") as file:
+            file.write(offline_map.depot_html(pd.DataFrame(result["depots"]), settings["map"]))
+        print(f"지도 저장: {args.html}")
+
+
+if __name__ == "__main__":
+    main()
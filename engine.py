@@ -0,0 +1,320 @@
+# 대시보드 분석 엔진
+# djtc.py(MySQL/스냅샷)와 DJTC_dash.py(CSV)가 같은 집계를 같은 코드로 쓰도록 데이터 소스를 하나로 감싼다
+#
+# aggregate/source : 원본 행 집계 모듈(queries, aggregations)과 그 소스 (지도 좌표, 차고지 계산에 사용)
+# summary/summary_source : 요약 집계 모듈과 소스 (롤업을 쓰지 않으면 aggregate/source 와 같다)
+# version() : 데이터 버전. 버전이 같으면 같은 인자의 집계 결과를 다시 계산하지 않고 돌려준다
+# summary_ready() : 요약 소스를 쓸 수 있는지 (롤업을 아직 만들지 않았으면 aggregate/source 로 대신 집계)
+# watermark(start, end) : 구간의 원본 데이터 기준 (지도 캐시 파일처럼 세션/프로세스가 바뀌어도 유지되는 결과의 키)
+#
+# 캐시된 결과는 여러 세션이 공유하므로 호출한 쪽에서 수정하면 안 된다
+#
+# gather(*calls) : 당일/전일처럼 화면 하나에 필요한 집계를 스레드 풀에서 동시에 계산
+# prefetch(*calls) : 다음/이전 날짜나 월의 집계를 백그라운드 스레드에서 미리 계산해 캐시에 넣음
+# 같은 집계가 이미 계산 중이면 다시 계산하지 않고 그 결과를 기다린다
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+
+import aggregations
+import instrument
+import olap
+import queries
+import rollup
+import snapshot
+
+
+# 파일들의 (수정 시각, 크기), 파일이 바뀌면 값이 바뀐다
+def file_version(*paths):
+    version = []
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        else:
+            version.append(None)
+    return tuple(version)
+
+
+# ttl 초 단위로 바뀌는 버전 (변경 여부를 싸게 알 수 없는 DB용)
+def time_version(ttl):
+    return lambda: int(time.time() // ttl) if ttl else time.monotonic_ns()
+
+
+# 미리 계산하려는 집계를 이미 누군가 계산 중이라 미리 계산을 그만둘 때 (_prefetch 가 조용히 버린다)
+class _AlreadyPending(Exception):
+    pass
+
+
+class Engine:
+    # exact_distinct: 구간 고유 개수를 요약 소스(롤업 스케치) 대신 원본에서 정확히 계산
+    # workers: gather() 동시 계산 스레드 수, prefetch_workers: 미리 계산 스레드 수 (0 이면 둘 다 호출한 스레드에서 계산/생략)
+    # summary_ready: 요약 소스가 준비됐는지 돌려주는 함수 (없으면 항상 준비된 것으로 본다)
+    def __init__(self, aggregate, source, summary=None, summary_source=None, version=None, max_entries=256,
+                 exact_distinct=False, workers=4, prefetch_workers=2, max_pending=32, summary_ready=None):
+        self.aggregate = aggregate
+        self.source = source
+        self.summary = summary or aggregate
+        self.summary_source = source if summary is None else summary_source
+        self.summary_ready = summary_ready
+        self.exact_distinct = exact_distinct
+        self.version = version or (lambda: None)
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+        self._results = OrderedDict()
+        # 계산 중인 집계 (key -> Future)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "waits": 0, "prefetched": 0}
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="engine") if workers else None
+        self._prefetch_pool = ThreadPoolExecutor(prefetch_workers, thread_name_prefix="prefetch") if prefetch_workers else None
+
+    def _memo(self, name, compute, *args):
+        key = (name, self.version(), args)
+        # 미리 계산 스레드인지 (통계용), 미리 계산의 첫 조회인지 (계산 중이면 미리 계산을 그만둔다)
+        prefetched = getattr(self._local, "prefetched", False)
+        skip_pending = getattr(self._local, "prefetching", False)
+        # 첫 조회 안에서 하는 조회(월별 합계 안의 일별 요약, 지도 안의 좌표 등)는 다른 계산을 끝까지 기다린다
+        self._local.prefetching = False
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                if not prefetched:
+                    self._stats["hits"] += 1
+                return self._results[key]
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = Future()
+                pending.prefetched = prefetched
+                owner = True
+            else:
+                owner = False
+                if skip_pending:
+                    # 이미 누군가 계산 중이면 미리 계산할 필요가 없다
+                    raise _AlreadyPending(name)
+                if not prefetched:
+                    self._stats["waits"] += 1
+        if not owner:
+            # 다른 스레드(미리 계산 포함)가 계산 중인 결과를 기다린다
+            try:
+                with instrument.stage(f"wait.{name}"):
+                    return pending.result()
+            except Exception:
+                if not pending.prefetched:
+                    raise
+            # 미리 계산이 실패했으면 그 오류를 넘겨받지 않고 직접 다시 계산한다
+            return self._memo(name, compute, *args)
+        try:
+            with instrument.stage(f"aggregate.{name}") as record:
+                result = compute(*args)
+                if isinstance(result, (pd.DataFrame, pd.Series)):
+                    record["rows"] = len(result)
+        except BaseException as error:
+            # 실패한 결과는 캐시에 넣지 않는다 (기다리던 호출에는 같은 오류를 넘기고, 다음 호출에서 다시 계산)
+            with self._lock:
+                del self._pending[key]
+            pending.set_exception(error)
+            raise
+        with self._lock:
+            self._stats["prefetched" if prefetched else "misses"] += 1
+            self._results[key] = result
+            del self._pending[key]
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+        pending.set_result(result)
+        return result
+
+    # [start, end) 구간의 원본 데이터 기준 (구간의 MAX(승차일시), 데이터 버전마다 한 번 계산)
+    # 월마다 따로 구하므로 새 행이 들어온 월의 결과만 바뀐다
+    def watermark(self, start=None, end=None):
+        return self._memo("watermark", lambda *args: self.aggregate.watermark(self.source, *args), start, end)
+
+    # 집계 결과로 만드는 값(그래프, 지도 HTML, 차고지 결과)도 같은 캐시에 넣는다
+    # 데이터 버전과 인자가 같으면 다시 만들지 않는다
+    def cached(self, name, compute, *args):
+        return self._memo(name, compute, *args)
+
+    def _run_in_worker(self, call, context):
+        self._local.worker = True
+        try:
+            return context.run(call)
+        finally:
+            self._local.worker = False
+
+    # 인자 없는 함수들(예: lambda: engine.daily_summary(...))을 동시에 실행하고 결과를 순서대로 돌려준다
+    # 풀 안에서 다시 부르면(month_totals 등) 풀이 서로를 기다리지 않도록 그 자리에서 차례로 실행한다
+    def gather(self, *calls):
+        if self._pool is None or len(calls) < 2 or getattr(self._local, "worker", False):
+            return [call() for call in calls]
+        # 측정 중인 실행의 기록이 작업 스레드에도 이어지도록 컨텍스트를 복사해서 넘긴다
+        futures = [self._pool.submit(self._run_in_worker, call, contextvars.copy_context()) for call in calls]
+        return [future.result() for future in futures]
+
+    def _prefetch(self, call):
+        self._local.prefetched = True
+        self._local.prefetching = True
+        self._local.worker = True
+        try:
+            call()
+        except Exception:
+            # 미리 계산은 실패해도 화면에 영향이 없다 (실제로 필요할 때 다시 계산하면서 오류가 드러난다)
+            pass
+        finally:
+            self._local.prefetched = False
+            self._local.prefetching = False
+            self._local.worker = False
+
+    # 결과를 기다리지 않고 백그라운드에서 계산해 캐시에 넣는다 (계산 중인 작업이 max_pending 개 이상이면 건너뜀)
+    # 측정 기록은 현재 실행에 남기지 않도록 빈 컨텍스트에서 실행한다
+    def prefetch(self, *calls):
+        if self._prefetch_pool is None:
+            return
+        for call in calls:
+            with self._lock:
+                if len(self._pending) >= self.max_pending:
+                    return
+            self._prefetch_pool.submit(self._prefetch, call)
+
+    # 요약 소스를 아직 만들지 않았는지 (화면에 안내를 띄우는 데 쓴다)
+    def summary_missing(self):
+        return self.summary_ready is not None and not self.summary_ready()
+
+    # 요약 집계 모듈과 소스 (요약 소스가 없으면 원본 집계로 대신한다)
+    def _summary(self):
+        if self.summary_missing():
+            return self.aggregate, self.source
+        return self.summary, self.summary_source
+
+    def _summary_call(self, name, *args):
+        module, source = self._summary()
+        return getattr(module, name)(source, *args)
+
+    def daily_summary(self, start=None, end=None, require_coords=False):
+        return self._memo("daily_summary", lambda *args: self._summary_call("daily_summary", *args),
+                          start, end, require_coords)
+
+    def hourly_counts(self, start=None, end=None, require_coords=False):
+        return self._memo("hourly_counts", lambda *args: self._summary_call("hourly_counts", *args),
+                          start, end, require_coords)
+
+    # 일자 × 예약 시간대별 고유 기사/회원 수 (인자가 없으면 전체 기간)
+    def date_hour_counts(self, start=None, end=None):
+        return self._memo("date_hour_counts", lambda *args: self._summary_call("date_hour_counts", *args),
+                          start, end)
+
+    def top_locations(self, column, start=None, end=None, limit=10, require_coords=False):
+        return self._memo("top_locations", lambda *args: self._summary_call("top_locations", *args),
+                          column, start, end, limit, require_coords)
+
+    def month_list(self):
+        return self._memo("month_list", lambda: self._summary_call("month_list"))
+
+    # 구간 전체의 고유 이용자 수(users)와 기사 수(drivers)
+    def distinct_counts(self, start=None, end=None, require_coords=False):
+        if self.exact_distinct:
+            module, source = self.aggregate, self.source
+        else:
+            module, source = self._summary()
+        return self._memo("distinct_counts", lambda *args: module.distinct_counts(source, *args),
+                          start, end, require_coords)
+
+    def map_points(self, start=None, end=None):
+        return self._memo("map_points", lambda *args: self.aggregate.map_points(self.source, *args), start, end)
+
+    # 기사별 승차/예약 시각 (차량 가동률 계산용, 원본에서 읽는다)
+    def trip_times(self, start=None, end=None):
+        return self._memo("trip_times", lambda *args: self.aggregate.trip_times(self.source, *args), start, end)
+
+    # 월별 총 이용자 수/이용 건수와 전월 값
+    # 이용 건수는 전월~당월 일별 집계 한 번을 월별로 나눠 더하고,
+    # 이용자 수는 일별 고유 수의 합이 아니라 월 전체의 고유 회원 수를 쓴다
+    def month_totals(self, month, require_coords=False):
+        def compute(month, require_coords):
+            previous_month = (pd.Timestamp(month + "-01") - pd.DateOffset(months=1)).strftime("%Y-%m")
+            previous_start, previous_end = queries.month_range(previous_month)
+            start, end = queries.month_range(month)
+            daily, users, previous_users = self.gather(
+                lambda: self.daily_summary(previous_start, end, require_coords),
+                lambda: self.distinct_counts(start, end, require_coords),
+                lambda: self.distinct_counts(previous_start, previous_end, require_coords),
+            )
+            months = pd.to_datetime(daily["date"]).dt.strftime("%Y-%m")
+            rides = daily.groupby(months)["rides"].sum().reindex([previous_month, month], fill_value=0)
+            return {
+                "users": users["users"],
+                "rides": int(rides[month]),
+                "previous_users": previous_users["users"],
+                "previous_rides": int(rides[previous_month]),
+            }
+        return self._memo("month_totals", compute, month, require_coords)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._results)
+            stats["pending"] = len(self._pending)
+        requests = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / requests if requests else 0.0
+        return stats
+
+
+def _engine_options(settings):
+    return {
+        "max_entries": settings["engine"].getint("max_entries"),
+        "workers": settings["engine"].getint("workers"),
+        "prefetch_workers": settings["engine"].getint("prefetch_workers"),
+    }
+
+
+# 롤업을 쓰면 요약 집계는 롤업에서 읽고, 지도에 필요한 원본 좌표만 aggregate/source 에서 읽는다
+# 롤업 상태는 원본 데이터 기준(watermark)과 관계없다 (롤업을 다시 만들어도 지도는 그대로)
+# 롤업을 켰지만 아직 python rollup.py 를 실행하지 않았으면 원본에서 집계한다 (만들고 나면 버전이 바뀌어 롤업을 읽는다)
+def _with_summary(settings, aggregate, source, version):
+    if not settings["rollup"].getboolean("enabled"):
+        return Engine(aggregate, source, version=version, **_engine_options(settings))
+    store = rollup.open_store(settings["rollup"])
+    rollup_state = os.path.join(store.path, rollup.STATE_FILE)
+    return Engine(
+        aggregate, source, rollup, store,
+        version=lambda: (version(), file_version(rollup_state)),
+        exact_distinct=settings["rollup"].get("distinct") == "exact",
+        summary_ready=store.exists,
+        **_engine_options(settings),
+    )
+
+
+# 로컬 소스를 DuckDB 로 집계할지 ([engine] backend)
+def _duckdb(settings):
+    return settings["engine"].get("backend") == "duckdb"
+
+
+# CSV 내보내기 파일 (load_frame(path) 는 파생 컬럼까지 계산된 DataFrame을 캐시해서 돌려준다)
+def open_csv_engine(settings, file_path, load_frame):
+    if _duckdb(settings):
+        source = olap.frame_source(lambda: load_frame(file_path), settings["engine"].getint("threads"))
+        return _with_summary(settings, olap, source, lambda: file_version(file_path))
+
+    def source(start=None, end=None, columns=None):
+        return aggregations.frame_loader(load_frame(file_path))(start, end, columns)
+    return _with_summary(settings, aggregations, source, lambda: file_version(file_path))
+
+
+# MySQL 또는 로컬 스냅샷 ([data] source)
+def open_db_engine(settings, fetch, local_snapshot=None):
+    if local_snapshot is not None:
+        state_path = os.path.join(local_snapshot.path, snapshot.STATE_FILE)
+        if _duckdb(settings):
+            source = olap.snapshot_source(local_snapshot, settings["engine"].getint("threads"))
+            return _with_summary(settings, olap, source, lambda: file_version(state_path))
+        return _with_summary(settings, aggregations, local_snapshot.load, lambda: file_version(state_path))
+    return _with_summary(settings, queries, fetch, time_version(settings["engine"].getfloat("result_ttl")))
@@ -0,0 +1,147 @@
+# CSV 내보내기 파일(CP949) 읽기
+# 회사 컴퓨터 메모리가 부족하므로 청크 단위로 읽으면서 대시보드에서 쓰는 컬럼만 남기고 자료형을 줄이는 모드를 제공한다
+import os
+import sys
+import time
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import instrument
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DATETIME_COLUMNS = ["승차일시", "예약시간"]
+
+# 대시보드에서 쓰는 컬럼
+USE_COLUMNS = [
+    "승차일시", "예약시간", "회원ID", "기사ID",
+    "출발지_시군구", "출발지_읍면동", "출발지_X좌표_수정", "출발지_Y좌표_수정",
+]
+# 회원ID/기사ID 는 전체 모드와 같은 자료형(정수, 결측이 있으면 실수)으로 읽고 사전 인코딩은 compact.py 에서 한다
+CATEGORY_COLUMNS = ["출발지_시군구", "출발지_읍면동"]
+FLOAT_COLUMNS = ["출발지_X좌표_수정", "출발지_Y좌표_수정"]
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+# CSV 전체를 읽고 날짜 컬럼을 datetime으로 변환
+def read_export(file_path, encoding="CP949"):
+    with instrument.stage("read_csv") as record:
+        df = pd.read_csv(file_path, encoding=encoding)
+        record["rows"] = len(df)
+    with instrument.stage("to_datetime"):
+        for column in DATETIME_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], errors="coerce")
+    return df
+
+
+# 현재 프로세스가 시작된 뒤의 최대 RSS(바이트), 측정할 수 없으면 None
+# 이전 작업의 최대값도 포함하므로 읽기 하나의 메모리를 재려면 read_export_chunked 의 rss_growth_mb 를 쓴다
+def peak_rss():
+    try:
+        import resource
+    except ImportError:
+        # Windows 는 resource 모듈이 없으므로 psutil 의 peak_wset 을 쓴다
+        if psutil is None:
+            return None
+        memory = psutil.Process().memory_info()
+        return getattr(memory, "peak_wset", memory.rss)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 는 KB, macOS 는 바이트 단위
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# 지정한 형식으로 파싱하고, 형식이 맞지 않아 전부 실패하면 형식 추론으로 다시 파싱
+def _parse_datetime(series, datetime_format):
+    parsed = pd.to_datetime(series, format=datetime_format, errors="coerce")
+    if datetime_format and parsed.isna().all() and series.notna().any():
+        return pd.to_datetime(series, errors="coerce"), None
+    return parsed, datetime_format
+
+
+# 청크 단위로 읽으면서 필요한 컬럼만 남기고 자료형을 줄인다
+# 반환: (DataFrame, 리포트 dict) - 리포트에는 행 수, 청크 수, 소요 시간, 읽는 동안 늘어난 RSS 가 들어 있다
+# RSS 증가량은 읽기 전 RSS 와 청크마다, 합친 직후(청크와 합친 결과가 함께 있는 시점) 잰 RSS 중 최대값의 차이다
+def read_export_chunked(file_path, encoding="CP949", chunksize=200_000, columns=USE_COLUMNS,
+                        datetime_format=DATETIME_FORMAT, memory_budget_mb=None):
+    started = time.perf_counter()
+    wanted = set(columns)
+    # 문자열 컬럼은 청크마다 범주형으로 바꿔서 같은 값이 한 번만 저장되게 한다
+    dtypes = {column: "category" for column in CATEGORY_COLUMNS}
+    chunks = []
+    chunk_count = 0
+    baseline = instrument.current_rss()
+    peak = baseline
+    reader = pd.read_csv(
+        file_path,
+        encoding=encoding,
+        usecols=lambda column: column in wanted,
+        dtype=dtypes,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        for column in DATETIME_COLUMNS:
+            if column in chunk.columns:
+                chunk[column], datetime_format = _parse_datetime(chunk[column], datetime_format)
+        for column in FLOAT_COLUMNS:
+            if column in chunk.columns:
+                chunk[column] = pd.to_numeric(chunk[column], errors="coerce", downcast="float")
+        chunks.append(chunk)
+        chunk_count += 1
+        if baseline is not None:
+            peak = max(peak, instrument.current_rss())
+
+    df = concat_frames(chunks, columns)
+    if baseline is not None:
+        peak = max(peak, instrument.current_rss())
+    del chunks
+
+    report = {
+        "file": os.path.basename(file_path),
+        "rows": len(df),
+        "chunks": chunk_count,
+        "seconds": time.perf_counter() - started,
+        "frame_mb": float(df.memory_usage(deep=True).sum()) / 1024 ** 2,
+        "rss_growth_mb": (peak - baseline) / 1024 ** 2 if baseline is not None else None,
+    }
+    report["over_budget"] = bool(memory_budget_mb and report["rss_growth_mb"] and report["rss_growth_mb"] > memory_budget_mb)
+    return df, report
+
+
+# 청크(또는 스냅샷 파티션) 합치기
+# 범주형 컬럼은 청크마다 범주가 다르므로 union_categoricals 로 합친다 (그냥 concat 하면 object 로 돌아간다)
+def concat_frames(chunks, columns=None):
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    merged = {}
+    for column in chunks[0].columns:
+        parts = [chunk[column] for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            merged[column] = pd.Series(union_categoricals(parts), name=column)
+        else:
+            merged[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(merged)
+
+
+# config 의 [ingest] 섹션에 따라 전체/청크 모드로 읽는다
+# columns: 청크 모드에서 남길 컬럼 (OD 행렬처럼 대시보드 밖에서 다른 컬럼이 필요할 때 바꾼다)
+@instrument.timed("load_export")
+def load_export(file_path, settings, columns=USE_COLUMNS):
+    if settings.get("mode") == "chunked":
+        budget = settings.getfloat("memory_budget_mb") or None
+        df, report = read_export_chunked(
+            file_path,
+            encoding=settings.get("encoding"),
+            chunksize=settings.getint("chunksize"),
+            columns=columns,
+            datetime_format=settings.get("datetime_format") or None,
+            memory_budget_mb=budget,
+        )
+        df.attrs["ingest_report"] = report
+        return df
+    return read_export(file_path, encoding=settings.get("encoding"))
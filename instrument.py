@@ -0,0 +1,116 @@
+# 단계별 시간/메모리 측정
+# 대시보드 한 번 실행(rerun) 동안 stage() 블록마다 소요 시간, 행 수, RSS 증감을 기록한다
+# 측정은 세션(스크립트 실행)마다 begin_run(enabled=True) 로 켜야 하고, 꺼져 있으면 stage() 는 아무것도 하지 않는다
+#
+#   with instrument.stage("get_data") as record:
+#       df = ...
+#       record["rows"] = len(df)
+#
+#   @instrument.timed("depot.solve")
+#   def solve(...): ...
+import contextvars
+import functools
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 현재 실행의 기록 (꺼져 있으면 None)
+# 깊이는 컨텍스트마다 따로 두어서 copy_context() 로 넘긴 스레드의 단계도 호출한 단계 아래에 기록된다
+_current = contextvars.ContextVar("instrument_run", default=None)
+_depth = contextvars.ContextVar("instrument_depth", default=0)
+
+# 꺼져 있을 때 돌려주는 컨텍스트 (기록용 dict 에 값을 넣어도 버려진다)
+_DISABLED = nullcontext({})
+
+
+# 현재 프로세스의 RSS(바이트), 측정할 수 없으면 None
+def current_rss():
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+# 새 실행 시작 (enabled 가 False 면 이번 실행은 측정하지 않는다)
+def begin_run(enabled, label=None):
+    if not enabled:
+        _current.set(None)
+        return None
+    run = {"label": label, "started": time.perf_counter(), "time": datetime.now().isoformat(timespec="seconds"),
+           "stages": []}
+    _current.set(run)
+    _depth.set(0)
+    return run
+
+
+def enabled():
+    return _current.get() is not None
+
+
+def stage(name):
+    run = _current.get()
+    if run is None:
+        return _DISABLED
+    return _stage(run, name)
+
+
+@contextmanager
+def _stage(run, name):
+    depth = _depth.get()
+    record = {"stage": name, "depth": depth, "offset": time.perf_counter() - run["started"]}
+    run["stages"].append(record)
+    before = current_rss()
+    started = time.perf_counter()
+    token = _depth.set(depth + 1)
+    try:
+        yield record
+    finally:
+        _depth.reset(token)
+        record["seconds"] = time.perf_counter() - started
+        after = current_rss()
+        record["rss_delta_mb"] = (after - before) / 1024 ** 2 if before is not None and after is not None else None
+
+
+# 함수 호출 전체를 한 단계로 기록하는 데코레이터
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return function(*args, **kwargs)
+            with stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# 현재 실행의 기록 (측정 중이 아니면 빈 리스트)
+def records():
+    run = _current.get()
+    return list(run["stages"]) if run is not None else []
+
+
+# 현재 실행의 기록을 JSON 한 줄로 파일에 추가
+def export(path):
+    run = _current.get()
+    if run is None or not path:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    line = {
+        "time": run["time"],
+        "label": run["label"],
+        "total_seconds": time.perf_counter() - run["started"],
+        "stages": run["stages"],
+    }
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(line, ensure_ascii=False) + "\n")
@@ -0,0 +1,178 @@
+# 월별 지도 HTML 디스크 캐시
+# 월별 지도는 선택한 월과 데이터, 지도 설정에만 달려 있으므로 한 번 만든 HTML 을 파일로 저장해 두고 모든 세션이 그대로 쓴다
+# 파일 이름: month=YYYY-MM_<버전>.html (버전 = 그 월의 데이터 워터마크와 지도 설정의 해시)
+#
+# 새 데이터가 들어와 버전이 바뀌면 그 월의 이전 지도를 먼저 보여주고 새 지도는 백그라운드 스레드에서 만든다
+# 월마다 최신 버전 파일 하나만 남기고, 전체 파일 수가 max_files 를 넘으면 오래 쓰지 않은 월부터 지운다
+import glob
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+# 데이터 워터마크와 지도 설정으로 버전 문자열 계산 (값이 하나라도 바뀌면 다른 버전)
+def version_key(watermark, map_settings):
+    payload = json.dumps([repr(watermark), sorted(map_settings.items())], ensure_ascii=False)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class MapCache:
+    # max_files: 보관할 지도 파일 수 (월 수)
+    def __init__(self, path, max_files=48):
+        self.path = path
+        self.max_files = max_files
+        self._lock = threading.Lock()
+        # 만들고 있는 지도 (파일 경로 -> Future), 같은 지도를 여러 세션이 동시에 만들지 않는다
+        self._pending = {}
+        # 백그라운드 작업으로 넣어 두고 아직 시작하지 않은 지도
+        self._scheduled = set()
+        self._background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="map-cache")
+        self._stats = {"hits": 0, "stale": 0, "builds": 0, "background": 0, "evictions": 0}
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0.0
+
+    def _file(self, month, version):
+        return os.path.join(self.path, f"month={month}_{version}.html")
+
+    def _month_files(self, month):
+        return glob.glob(os.path.join(glob.escape(self.path), f"month={month}_*.html"))
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                html = file.read()
+        except OSError:
+            return None
+        # 읽은 시각을 수정 시각으로 남겨서 오래 쓰지 않은 파일부터 지운다
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return html
+
+    # 선택한 월의 지도 HTML 과 최신 여부 (build(month) 는 HTML 문자열을 만드는 함수)
+    # 최신 파일이 없고 이전 버전이 있으면 이전 지도를 돌려주고 새 지도는 백그라운드에서 만든다
+    def get(self, month, version, build):
+        path = self._file(month, version)
+        html = self._read(path)
+        if html is not None:
+            self._count("hits")
+            return html, True
+        stale = [p for p in self._month_files(month) if p != path]
+        if stale:
+            html = self._read(max(stale, key=self._mtime))
+            if html is not None:
+                self._count("stale")
+                self._build_later(month, version, build)
+                return html, False
+        return self._build(month, version, build), True
+
+    # 캐시 파일이 있는 월 중 버전이 바뀐 월의 지도를 백그라운드에서 다시 만든다 (version(month) 는 월의 현재 버전)
+    def refresh(self, months, version, build):
+        scheduled = []
+        for month in months:
+            files = self._month_files(month)
+            if not files:
+                continue
+            month_version = version(month)
+            if self._file(month, month_version) not in files:
+                if self._build_later(month, month_version, build):
+                    scheduled.append(month)
+        return scheduled
+
+    def _build(self, month, version, build):
+        path = self._file(month, version)
+        with self._lock:
+            future = self._pending.get(path)
+            owner = future is None
+            if owner:
+                future = self._pending[path] = Future()
+        if not owner:
+            return future.result()
+        try:
+            html = build(month)
+            self._write(month, path, html)
+            self._count("builds")
+            future.set_result(html)
+            return html
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(path, None)
+
+    def _build_later(self, month, version, build):
+        path = self._file(month, version)
+        with self._lock:
+            if path in self._pending or path in self._scheduled:
+                return False
+            self._scheduled.add(path)
+        self._count("background")
+        self._background.submit(self._build_quietly, month, version, build)
+        return True
+
+    def _build_quietly(self, month, version, build):
+        path = self._file(month, version)
+        try:
+            # 기다리는 동안 다른 세션이 이미 만들었으면 건너뛴다
+            if not os.path.exists(path):
+                self._build(month, version, build)
+        except Exception:
+            # 백그라운드에서 실패하면 다음에 그 월을 열 때 다시 만들면서 오류가 드러난다
+            pass
+        finally:
+            with self._lock:
+                self._scheduled.discard(path)
+
+    def _write(self, month, path, html):
+        os.makedirs(self.path, exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as file:
+            file.write(html)
+        os.replace(path + ".tmp", path)
+        # 같은 월의 이전 버전과, 보관 개수를 넘는 오래된 파일 삭제
+        old = [p for p in self._month_files(month) if p != path]
+        files = sorted(glob.glob(os.path.join(glob.escape(self.path), "month=*.html")), key=self._mtime)
+        excess = len(files) - len(old) - self.max_files
+        if excess > 0:
+            old += [p for p in files if p not in old and p != path][:excess]
+        for old_path in old:
+            try:
+                os.remove(old_path)
+                self._count("evictions")
+            except OSError:
+                # 다른 세션이 읽는 중이면(Windows) 다음 정리 때 지운다
+                pass
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["building"] = len(self._pending)
+        stats["files"] = 0
+        stats["bytes"] = 0
+        for path in glob.glob(os.path.join(glob.escape(self.path), "month=*.html")):
+            try:
+                stats["bytes"] += os.path.getsize(path)
+                stats["files"] += 1
+            except OSError:
+                pass
+        return stats
+
+
+# config 의 [map] 섹션으로 캐시 생성 (cache_path 가 비어 있으면 None = 디스크 캐시를 쓰지 않음)
+def open_cache(settings):
+    if not settings.get("cache_path"):
+        return None
+    return MapCache(settings.get("cache_path"), settings.getint("cache_max_files"))
@@ -0,0 +1,164 @@
+# 월별 출발지 지도
+# 운행 한 건마다 CircleMarker 를 만들던 iterrows 반복 대신 한 번의 groupby 로 묶어서 그룹마다 마커 하나만 만든다
+# 마커 수를 max_markers 로 제한하므로 운행 건수와 관계없이 HTML 크기가 일정하다
+#
+# 지도 모드 ([map] mode)
+#   dong    : 출발지 시군구/읍면동별로 묶어서 평균 좌표에 마커 하나
+#   grid    : 좌표를 cell_size(도) 격자로 묶어서 격자마다 마커 하나
+#   cluster : 좌표 배열만 넘기고 브라우저에서 클러스터링 (FastMarkerCluster, 최대 max_points 개)
+#   index   : 원본 대신 격자 인덱스(spatial_index.py)의 격자 건수로 히트맵
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import FastMarkerCluster, HeatMap
+
+import instrument
+
+X_COLUMN = "출발지_X좌표_수정"
+Y_COLUMN = "출발지_Y좌표_수정"
+
+CENTER = [36.3504, 127.3845]
+
+# 건수 구간별 색 (10건 미만, 20건 미만, 50건 미만, 그 이상)
+COLOR_BINS = [10, 20, 50]
+COLORS = np.array(["lightblue", "blue", "darkblue", "purple"])
+
+
+# 건수 배열을 색 배열로 변환
+def bin_colors(counts):
+    return COLORS[np.digitize(np.asarray(counts), COLOR_BINS)]
+
+
+# 좌표가 있는 행을 한 번에 묶어서 그룹별 건수와 평균 좌표 계산 (건수가 많은 순)
+def group_points(points, mode="dong", cell_size=0.005):
+    points = points.dropna(subset=[X_COLUMN, Y_COLUMN])
+    x = points[X_COLUMN].to_numpy(dtype=np.float64)
+    y = points[Y_COLUMN].to_numpy(dtype=np.float64)
+    if mode == "grid":
+        keys = [np.floor(x / cell_size).astype(np.int64), np.floor(y / cell_size).astype(np.int64)]
+    else:
+        keys = [points["출발지_시군구"].astype(str).to_numpy(), points["출발지_읍면동"].astype(str).to_numpy()]
+
+    frame = pd.DataFrame({"key0": keys[0], "key1": keys[1], "x": x, "y": y})
+    groups = frame.groupby(["key0", "key1"], sort=False).agg(
+        count=("x", "size"), x=("x", "mean"), y=("y", "mean")
+    ).reset_index()
+    if mode == "grid":
+        groups["label"] = ""
+    else:
+        groups["label"] = groups["key0"] + " " + groups["key1"]
+    return groups.sort_values("count", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def _radius(counts, min_radius=5, max_radius=25):
+    counts = np.asarray(counts, dtype=np.float64)
+    if counts.size == 0 or counts.max() == 0:
+        return counts
+    return min_radius + (max_radius - min_radius) * np.sqrt(counts / counts.max())
+
+
+# points: 출발지_시군구, 출발지_읍면동, 출발지_X좌표_수정, 출발지_Y좌표_수정 컬럼을 가진 DataFrame
+@instrument.timed("map.build")
+def build_map(points, mode="dong", cell_size=0.005, max_markers=300, max_points=20000):
+    m = folium.Map(location=CENTER, zoom_start=11)
+
+    if mode == "cluster":
+        coords = points.dropna(subset=[X_COLUMN, Y_COLUMN])[[Y_COLUMN, X_COLUMN]].to_numpy(dtype=np.float64)
+        if len(coords) > max_points:
+            # 균등 표본으로 줄여서 넘기는 좌표 수를 제한
+            index = np.random.default_rng(0).choice(len(coords), max_points, replace=False)
+            coords = coords[np.sort(index)]
+        FastMarkerCluster(np.round(coords, 5).tolist()).add_to(m)
+        return m
+
+    _add_markers(m, marker_groups(points, mode, cell_size, max_markers))
+    return m
+
+
+# 그룹 마커 표 (lat, lon, radius, color, fill_color, fill_opacity, weight, label, value)
+# folium 지도와 경량 지도(offline_map.py)가 같은 표로 마커를 그린다
+def marker_groups(points, mode="dong", cell_size=0.005, max_markers=300):
+    groups = group_points(points, mode, cell_size).head(max_markers)
+    colors = bin_colors(groups["count"])
+    return pd.DataFrame({
+        "lat": groups["y"].round(5),
+        "lon": groups["x"].round(5),
+        "radius": _radius(groups["count"]),
+        "color": colors,
+        "fill_color": colors,
+        "fill_opacity": 0.7,
+        "weight": 3,
+        "label": groups["label"],
+        "value": groups["count"],
+    })
+
+
+# 최적 차고지 마커 표 (depots: lon, lat, label, demand 컬럼)
+def depot_markers(depots):
+    return pd.DataFrame({
+        "lat": depots["lat"],
+        "lon": depots["lon"],
+        "radius": 10,
+        "color": "black",
+        "fill_color": "red",
+        "fill_opacity": 0.8,
+        "weight": 2,
+        "label": depots["label"],
+        "value": depots["demand"],
+    })
+
+
+def _popup(label, value):
+    return f"{label}: {value:,}건" if label else f"{value:,}건"
+
+
+def _add_markers(m, markers):
+    for row in markers.itertuples(index=False):
+        folium.CircleMarker(
+            location=[row.lat, row.lon],
+            radius=float(row.radius),
+            color=row.color,
+            weight=row.weight,
+            fill=True,
+            fill_color=row.fill_color,
+            fill_opacity=row.fill_opacity,
+            popup=_popup(row.label, int(row.value)),
+        ).add_to(m)
+
+
+# 격자 인덱스에서 읽은 격자(lon, lat, size, count)로 히트맵 생성 (격자 수만큼만 좌표를 넘긴다)
+def build_cell_map(cells, zoom=11):
+    m = folium.Map(location=CENTER, zoom_start=zoom)
+    if len(cells):
+        weights = cells["count"].to_numpy(dtype=np.float64)
+        data = np.column_stack([cells["lat"], cells["lon"], weights / weights.max()])
+        HeatMap(np.round(data, 5).tolist(), radius=15, blur=10).add_to(m)
+    return m
+
+
+# 최적 차고지 지도 (depots: lon, lat, label, demand 컬럼)
+def build_depot_map(depots):
+    m = folium.Map(location=CENTER, zoom_start=11)
+    _add_markers(m, depot_markers(depots))
+    return m
+
+
+# 지도를 HTML 문자열로 (streamlit 에서는 components.html 로 표시, 캐시해 두면 다시 만들지 않아도 된다)
+def render_html(m):
+    return folium.Figure().add_child(m).render()
+
+
+# config 의 [map] 섹션으로 지도 생성
+def build_configured_map(points, settings):
+    return build_map(
+        points,
+        mode=settings.get("mode"),
+        cell_size=settings.getfloat("cell_size"),
+        max_markers=settings.getint("max_markers"),
+        max_points=settings.getint("max_points"),
+    )
+
+
+# [map] bbox 설정('서,남,동,북')을 튜플로 변환
+def configured_bbox(settings):
+    return tuple(float(value) for value in settings.get("bbox").split(","))
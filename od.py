@@ -0,0 +1,244 @@
+# 출발지-도착지(OD) 이동 행렬
+# 월별로 (승차 시각의 시, 출발 구역, 도착 구역) 별 운행 건수를 희소 행렬로 미리 계산해 둔다
+# 희소 행렬은 0 이 아닌 칸만 (hour, origin, destination, count) 행으로 저장하는 COO 형식이다
+# 화면은 원본 운행 대신 이 행렬에서 상위 N개 이동과 구역별 유입/유출을 계산한다
+#
+# 구역 ([od] zone)
+#   dong : 시군구+읍면동 (origin_columns / destination_columns)
+#   grid : 좌표를 cell_size(도) 격자로 (origin_coords / destination_coords)
+# 구역 이름은 _state.json 의 zones 목록에 저장되고 목록 순서가 정수 코드다 (새 구역은 뒤에 붙으므로 기존 코드는 바뀌지 않는다)
+# 도착지 컬럼 이름은 원본 운행 테이블에 맞춰 [od] 섹션에서 바꾼다
+#
+# 저장 형식: [od] path 아래 월별 Parquet (month=YYYY-MM.parquet)
+#   hour(int8), origin(int32), destination(int32), count(int32)
+#
+# 사용법: python od.py              # 새 월만 추가/갱신
+#         python od.py --csv 파일   # CSV 내보내기 파일로 생성
+#         python od.py --full       # 처음부터 다시 생성 (구역 설정을 바꾸면 자동으로 다시 생성)
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import instrument
+import queries
+
+STATE_FILE = "_state.json"
+
+
+def _pair(value):
+    return [column.strip() for column in value.split(",")]
+
+
+class ODMatrix:
+    def __init__(self, path, zone="dong", cell_size=0.01,
+                 origin_columns=("출발지_시군구", "출발지_읍면동"), destination_columns=("도착지_시군구", "도착지_읍면동"),
+                 origin_coords=("출발지_X좌표_수정", "출발지_Y좌표_수정"),
+                 destination_coords=("도착지_X좌표_수정", "도착지_Y좌표_수정")):
+        self.path = path
+        self.zone = zone
+        self.cell_size = cell_size
+        if zone == "grid":
+            self.origin, self.destination = list(origin_coords), list(destination_coords)
+        else:
+            self.origin, self.destination = list(origin_columns), list(destination_columns)
+
+    # 필요한 원본 컬럼
+    @property
+    def columns(self):
+        return ["승차일시"] + self.origin + self.destination
+
+    # 구역 설정 (바뀌면 저장된 코드가 맞지 않으므로 처음부터 다시 만든다)
+    def _spec(self):
+        spec = {"zone": self.zone, "origin": self.origin, "destination": self.destination}
+        if self.zone == "grid":
+            spec["cell_size"] = self.cell_size
+        return spec
+
+    def _month_path(self, month):
+        return os.path.join(self.path, f"month={month}.parquet")
+
+    def state(self):
+        state_path = os.path.join(self.path, STATE_FILE)
+        if not os.path.exists(state_path):
+            return {"watermark": None, "months": [], "spec": self._spec(), "zones": []}
+        with open(state_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _write_state(self, state):
+        state_path = os.path.join(self.path, STATE_FILE)
+        with open(state_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False, indent=2)
+        os.replace(state_path + ".tmp", state_path)
+
+    def months(self):
+        return self.state()["months"]
+
+    def zones(self):
+        return self.state()["zones"]
+
+    # 출발/도착 구역을 같은 정수 코드 공간으로 (구역 이름 목록, 출발 코드, 도착 코드)
+    # 출발과 도착을 이어 붙여 한 번에 factorize 하므로 같은 구역은 같은 코드가 된다
+    def _zone_codes(self, df):
+        if self.zone == "grid":
+            size = self.cell_size
+            x = np.concatenate([df[self.origin[0]].to_numpy(np.float64), df[self.destination[0]].to_numpy(np.float64)])
+            y = np.concatenate([df[self.origin[1]].to_numpy(np.float64), df[self.destination[1]].to_numpy(np.float64)])
+            cells = np.floor(x / size).astype(np.int64) * (1 << 32) + np.floor(y / size).astype(np.int64)
+            codes, uniques = pd.factorize(cells)
+            # 격자 이름은 중심 좌표 (위도,경도)
+            ix, iy = np.divmod(uniques, 1 << 32)
+            names = [f"{(j + 0.5) * size:.4f},{(i + 0.5) * size:.4f}" for i, j in zip(ix, iy)]
+        else:
+            levels = [
+                pd.concat([df[o].astype(str), df[d].astype(str)], ignore_index=True)
+                for o, d in zip(self.origin, self.destination)
+            ]
+            codes, uniques = pd.MultiIndex.from_arrays(levels).factorize()
+            names = [" ".join(values) for values in uniques]
+        return names, codes[:len(df)], codes[len(df):]
+
+    # 한 달 치 운행을 (hour, origin, destination) 별 건수로 집계
+    # zones 는 지금까지의 구역 이름 목록이며 새 구역이 뒤에 추가된다
+    def build_month(self, df, zones):
+        missing = [column for column in self.columns if column not in df.columns]
+        if missing:
+            raise ValueError(f"OD 행렬에 필요한 컬럼이 없습니다: {', '.join(missing)} ([od] 섹션의 컬럼 이름을 확인하세요)")
+        df = df.dropna(subset=self.columns)
+        names, origin, destination = self._zone_codes(df)
+
+        # 이번 달의 구역 코드를 전체 구역 코드로 바꾼다
+        index = {name: code for code, name in enumerate(zones)}
+        for name in names:
+            if name not in index:
+                index[name] = len(zones)
+                zones.append(name)
+        to_global = np.array([index[name] for name in names], dtype=np.int64)
+        origin, destination = to_global[origin], to_global[destination]
+        hour = df["승차일시"].dt.hour.to_numpy(dtype=np.int64)
+
+        # (hour, origin, destination) 를 정수 하나로 묶어서 np.unique 로 한 번에 센다
+        size = max(len(zones), 1)
+        keys = (hour * size + origin) * size + destination
+        unique, counts = np.unique(keys, return_counts=True)
+        return pd.DataFrame({
+            "hour": (unique // (size * size)).astype(np.int8),
+            "origin": (unique // size % size).astype(np.int32),
+            "destination": (unique % size).astype(np.int32),
+            "count": counts.astype(np.int32),
+        })
+
+    # 워터마크가 속한 월부터 다시 집계 (새 월이 들어오면 그 월만 추가된다)
+    def update(self, load, months, full=False):
+        os.makedirs(self.path, exist_ok=True)
+        state = self.state()
+        if full or state.get("spec") != self._spec():
+            state = {"watermark": None, "months": [], "spec": self._spec(), "zones": []}
+        watermark = state["watermark"]
+        first_month = pd.Timestamp(watermark).strftime("%Y-%m") if watermark else None
+
+        updated = []
+        for month in months:
+            if first_month is not None and month < first_month:
+                continue
+            start, end = queries.month_range(month)
+            df = load(start, end, columns=self.columns)
+            df = df[(df["승차일시"] >= start) & (df["승차일시"] < end)]
+            if df.empty:
+                continue
+            table = self.build_month(df, state["zones"])
+            path = self._month_path(month)
+            table.to_parquet(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+
+            latest = df["승차일시"].max()
+            if state["watermark"] is None or latest > pd.Timestamp(state["watermark"]):
+                state["watermark"] = latest.isoformat()
+            state["months"] = sorted(set(state["months"]) | {month})
+            self._write_state(state)
+            updated.append(month)
+        return updated
+
+    # 월(들)과 시간대의 (origin, destination, count) 희소 행렬
+    @instrument.timed("od.matrix")
+    def matrix(self, months, hours=None):
+        filters = [("hour", "in", list(hours))] if hours is not None else None
+        frames = [
+            pd.read_parquet(self._month_path(month), columns=["origin", "destination", "count"], filters=filters)
+            for month in months if os.path.exists(self._month_path(month))
+        ]
+        if not frames:
+            return pd.DataFrame({"origin": [], "destination": [], "count": []}, dtype=np.int64)
+        cells = pd.concat(frames, ignore_index=True)
+        return cells.groupby(["origin", "destination"], as_index=False, sort=False)["count"].sum().astype(np.int64)
+
+    # 건수가 많은 이동 상위 n개 (internal 이 False 면 같은 구역 안의 이동은 뺀다)
+    def top_flows(self, months, n=10, hours=None, internal=False):
+        cells = self.matrix(months, hours)
+        if not internal:
+            cells = cells[cells["origin"] != cells["destination"]]
+        top = cells.nlargest(n, "count", keep="first")
+        zones = np.array(self.zones(), dtype=object)
+        return pd.DataFrame({
+            "출발": zones[top["origin"].to_numpy()] if len(top) else [],
+            "도착": zones[top["destination"].to_numpy()] if len(top) else [],
+            "건수": top["count"].to_numpy(),
+        })
+
+    # 구역별 유출(출발 건수), 유입(도착 건수), 순유입(유입-유출), 구역 안 이동 (순유입이 큰 순)
+    def balances(self, months, hours=None):
+        cells = self.matrix(months, hours)
+        zones = self.zones()
+        origin = cells["origin"].to_numpy()
+        destination = cells["destination"].to_numpy()
+        count = cells["count"].to_numpy()
+        outflow = np.bincount(origin, weights=count, minlength=len(zones)).astype(np.int64)
+        inflow = np.bincount(destination, weights=count, minlength=len(zones)).astype(np.int64)
+        within = np.bincount(origin[origin == destination], weights=count[origin == destination],
+                             minlength=len(zones)).astype(np.int64)
+        table = pd.DataFrame({"구역": zones, "유출": outflow, "유입": inflow, "순유입": inflow - outflow, "구역 안": within})
+        table = table[(table["유출"] > 0) | (table["유입"] > 0)]
+        return table.sort_values("순유입", ascending=False, kind="stable").reset_index(drop=True)
+
+
+# config 의 [od] 섹션으로 행렬 생성
+def open_matrix(settings):
+    return ODMatrix(
+        settings.get("path"),
+        zone=settings.get("zone"),
+        cell_size=settings.getfloat("cell_size"),
+        origin_columns=_pair(settings.get("origin_columns")),
+        destination_columns=_pair(settings.get("destination_columns")),
+        origin_coords=_pair(settings.get("origin_coords")),
+        destination_coords=_pair(settings.get("destination_coords")),
+    )
+
+
+def main():
+    import config
+    import sources
+
+    parser = argparse.ArgumentParser(description="출발지-도착지 이동 행렬 증분 갱신")
+    sources.add_source_arguments(parser)
+    parser.add_argument("--full", action="store_true", help="처음부터 다시 생성")
+    parser.add_argument("--top", type=int, default=10, help="마지막 월의 상위 이동 출력 개수")
+    args = parser.parse_args()
+
+    settings = config.load_config()
+    matrix = open_matrix(settings["od"])
+    with sources.open_loader(settings, args.csv, args.refresh, columns=matrix.columns) as (load, months):
+        updated = matrix.update(load, months, full=args.full)
+    print(f"갱신한 월: {', '.join(updated) if updated else '없음'}")
+    print(f"워터마크: {matrix.state()['watermark']}, 구역 {len(matrix.zones())}개")
+
+    months = matrix.months()
+    if months:
+        print(f"{months[-1]} 상위 이동")
+        for row in matrix.top_flows([months[-1]], args.top).itertuples(index=False):
+            print(f"  {row.출발} -> {row.도착}: {row.건수:,}건")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+# 경량/오프라인 지도 HTML 내보내기
+# folium 지도는 Leaflet, jQuery, Bootstrap, Font Awesome 등 CSS/JS 10개를 CDN 에서 받고 마커마다 L.circleMarker/L.popup 문장을 만든다
+# 여기서는 마커를 정수 배열 하나(1e-5도 단위 좌표 차분, 반지름, 스타일 번호, 값)로 넣고 짧은 반복문으로 그린다
+# 필요한 자산은 Leaflet js/css 뿐이며 [map] assets_path 에 있으면 HTML 안에 넣고(폐쇄망), 없으면 CDN 주소만 건다
+# 폐쇄망에서 배경 지도까지 보려면 [map] tiles 를 내부 타일 서버 주소로 바꾼다
+#
+# 사용법: python offline_map.py --download                        # (인터넷이 되는 PC 에서) Leaflet 을 map_assets/ 에 받기
+#         python offline_map.py 최적차고지.html -o 최적차고지_경량.html  # folium 으로 만든 지도 HTML 변환
+import argparse
+import html
+import json
+import os
+import re
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+import mapviz
+
+LEAFLET_VERSION = "1.9.3"
+LEAFLET_CDN = f"https://cdn.jsdelivr.net/npm/leaflet@{LEAFLET_VERSION}/dist/"
+ASSET_FILES = ["leaflet.js", "leaflet.css"]
+
+TILES = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+ATTRIBUTION = '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a>'
+
+# 좌표 양자화 단위 (1e-5도 = 약 1m)
+SCALE = 100_000
+
+# 마커 배열 한 건의 값: 위도 차분, 경도 차분, 반지름, 스타일 번호, 값(없으면 -1)
+STRIDE = 5
+
+STYLE_COLUMNS = ["color", "fill_color", "fill_opacity", "weight"]
+
+CSS = (
+    "html,body,#m{width:100%;height:100%;margin:0}"
+    "#g{position:fixed;top:10px;right:10px;z-index:999;background:#fff;border:2px solid grey;padding:8px;font:14px sans-serif}"
+    "#g i{display:inline-block;width:11px;height:11px;border-radius:50%;margin-right:5px}"
+)
+
+# D: 마커 배열, N: 이름, S: 스타일, U: 값 단위
+SCRIPT = (
+    "var m=L.map('m',{{center:{center},zoom:{zoom},preferCanvas:true}});"
+    "L.tileLayer({tiles},{{maxZoom:19,attribution:{attribution}}}).addTo(m);"
+    "var D={data},N={labels},S={styles},U={unit},y=0,x=0;"
+    "for(var i=0;i<D.length;i+={stride}){{y+=D[i];x+=D[i+1];var s=S[D[i+3]],v=D[i+4],l=N[i/{stride}];"
+    "L.circleMarker([y/{scale},x/{scale}],{{radius:D[i+2],color:s[0],fillColor:s[1],fillOpacity:s[2],weight:s[3]}})"
+    ".bindPopup(v<0?l:(l?l+': ':'')+v.toLocaleString()+U).addTo(m)}}"
+)
+
+
+# 좌표를 정수로 양자화하고 앞 마커와의 차이로 바꾼다 (첫 값은 그대로, 가까운 마커끼리는 숫자가 짧아진다)
+def quantize(values, scale=SCALE):
+    ints = np.rint(np.asarray(values, dtype=np.float64) * scale).astype(np.int64)
+    return np.diff(ints, prepend=0)
+
+
+# 마커 표(mapviz.marker_groups / depot_markers 형식)를 (정수 배열, 이름 목록, 스타일 목록) 으로
+def encode_markers(markers):
+    markers = markers.dropna(subset=["lat", "lon"])
+    codes, styles = pd.MultiIndex.from_frame(markers[STYLE_COLUMNS]).factorize()
+    values = pd.to_numeric(markers["value"], errors="coerce").fillna(-1).round().astype(np.int64)
+    data = np.column_stack([
+        quantize(markers["lat"]),
+        quantize(markers["lon"]),
+        np.rint(pd.to_numeric(markers["radius"]).to_numpy(dtype=np.float64)).astype(np.int64),
+        codes,
+        values.to_numpy(),
+    ]).ravel()
+    labels = [html.escape(str(label)) if isinstance(label, str) else "" for label in markers["label"]]
+    styles = [[value.item() if isinstance(value, np.generic) else value for value in style] for style in styles]
+    return data.tolist(), labels, styles
+
+
+def _js(value):
+    # HTML 안의 <script> 가 문자열 때문에 끝나지 않도록 </ 를 바꾼다
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).replace("</", "<\\/")
+
+
+# 주석과 불필요한 공백 제거
+def minify_css(text):
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    return re.sub(r"\s*([{};:,>])\s*", r"\1", text).replace(";}", "}").strip()
+
+
+# Leaflet js/css: assets_path 에 받아 둔 파일이 있으면 HTML 에 넣고, 없으면 CDN 주소
+def asset_tags(assets_path=None):
+    paths = [os.path.join(assets_path, name) for name in ASSET_FILES] if assets_path else []
+    if paths and all(os.path.exists(path) for path in paths):
+        with open(paths[0], "r", encoding="utf-8") as file:
+            script = file.read().replace("</script", "<\\/script")
+        with open(paths[1], "r", encoding="utf-8") as file:
+            style = minify_css(file.read())
+        return f"<style>{style}</style><script>{script}</script>"
+    return f'<link rel="stylesheet" href="{LEAFLET_CDN}leaflet.css"><script src="{LEAFLET_CDN}leaflet.js"></script>'
+
+
+# 범례 [(색, 이름), ...]
+def _legend(items):
+    if not items:
+        return ""
+    rows = "<br>".join(f'<i style="background:{html.escape(color)}"></i>{html.escape(text)}' for color, text in items)
+    return f'<div id="g">{rows}</div>'
+
+
+# 마커 표로 경량 지도 HTML 생성
+def render(markers, center=mapviz.CENTER, zoom=11, legend=None, tiles=TILES, attribution=ATTRIBUTION,
+           assets_path=None, unit="건"):
+    data, labels, styles = encode_markers(markers)
+    script = SCRIPT.format(
+        center=_js([round(float(c), 6) for c in center]), zoom=int(zoom),
+        tiles=_js(tiles), attribution=_js(attribution),
+        data=_js(data), labels=_js(labels), styles=_js(styles), unit=_js(unit),
+        stride=STRIDE, scale=SCALE,
+    )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        '<meta name="viewport" content="width=device-width,initial-scale=1">'
+        f"{asset_tags(assets_path)}<style>{CSS}</style></head>"
+        f'<body><div id="m"></div>{_legend(legend)}<script>{script}</script></body></html>'
+    )
+
+
+# config 의 [map] 섹션으로 경량 지도 생성
+def render_configured(markers, settings, zoom=11, legend=None):
+    return render(markers, zoom=zoom, legend=legend, tiles=settings.get("tiles") or TILES,
+                  assets_path=settings.get("assets_path") or None)
+
+
+# [map] export = compact 이고 마커로 그리는 모드(dong/grid)이면 경량 지도를 쓴다
+def use_compact(settings):
+    return settings.get("export") == "compact" and settings.get("mode") in ("dong", "grid")
+
+
+# 최적 차고지 지도 HTML ([map] export = compact 이면 경량 지도, 아니면 folium)
+def depot_html(depots, settings):
+    if settings.get("export") == "compact":
+        return render_configured(mapviz.depot_markers(depots), settings, legend=[("red", "최적 차고지")])
+    return mapviz.build_depot_map(depots).get_root().render()
+
+
+# ---- folium 지도 HTML 변환 ----
+
+_FOLIUM_MARKER = re.compile(
+    r"var (circle_marker_\w+) = L\.circleMarker\(\s*\[([-\d.]+),\s*([-\d.]+)\],\s*(\{.*?\})\s*\)", re.S)
+_FOLIUM_POPUP = re.compile(
+    r"var (popup_\w+) = L\.popup.*?setContent\((html_\w+)\).*?(circle_marker_\w+)\.bindPopup\(\1\)", re.S)
+_FOLIUM_HTML = re.compile(r'<div id="(html_\w+)"[^>]*>(.*?)</div>', re.S)
+_FOLIUM_VIEW = re.compile(r"center:\s*\[([-\d.]+),\s*([-\d.]+)\].*?zoom:\s*(\d+)", re.S)
+_FOLIUM_LEGEND = re.compile(r'<i class="fa fa-circle" style="color:\s*([^";]+);?"></i>(?:&nbsp;|\s)*([^<]+)')
+_VALUE_POPUP = re.compile(r"^(.*?):?\s*([\d,]+)건$")
+
+
+# folium 지도 HTML 에서 원형 마커, 팝업, 화면 중심/줌, 범례를 읽는다
+def parse_folium(text):
+    contents = {name: html.unescape(content.strip()) for name, content in _FOLIUM_HTML.findall(text)}
+    popups = {marker: contents.get(content, "") for _, content, marker in _FOLIUM_POPUP.findall(text)}
+    rows = []
+    for name, lat, lon, options in _FOLIUM_MARKER.findall(text):
+        options = json.loads(options)
+        popup = popups.get(name, "")
+        # "이름: 1,234건" 형식 팝업은 이름과 값으로 나눠서 값은 정수 배열에 넣는다
+        match = _VALUE_POPUP.match(popup)
+        label, value = (match.group(1), int(match.group(2).replace(",", ""))) if match else (popup, -1)
+        rows.append({
+            "lat": float(lat), "lon": float(lon), "radius": options.get("radius", 10),
+            "color": options.get("color", "#3388ff"), "fill_color": options.get("fillColor", options.get("color", "#3388ff")),
+            "fill_opacity": options.get("fillOpacity", 0.2), "weight": options.get("weight", 3),
+            "label": label, "value": value,
+        })
+    view = _FOLIUM_VIEW.search(text)
+    center = [float(view.group(1)), float(view.group(2))] if view else mapviz.CENTER
+    zoom = int(view.group(3)) if view else 11
+    legend = [(color.strip(), label.strip()) for color, label in _FOLIUM_LEGEND.findall(text)]
+    return pd.DataFrame(rows, columns=["lat", "lon", "radius"] + STYLE_COLUMNS + ["label", "value"]), center, zoom, legend
+
+
+def download(assets_path):
+    os.makedirs(assets_path, exist_ok=True)
+    for name in ASSET_FILES:
+        path = os.path.join(assets_path, name)
+        with urllib.request.urlopen(LEAFLET_CDN + name, timeout=30) as response:
+            body = response.read()
+        with open(path + ".tmp", "wb") as file:
+            file.write(body)
+        os.replace(path + ".tmp", path)
+        print(f"{path}: {len(body) / 1024:.0f}KB")
+
+
+def main():
+    import config
+
+    parser = argparse.ArgumentParser(description="folium 지도 HTML 을 경량/오프라인 지도로 변환")
+    parser.add_argument("source", nargs="?", help="변환할 folium 지도 HTML")
+    parser.add_argument("-o", "--out", help="저장할 파일 (기본값: 원본이름_경량.html)")
+    parser.add_argument("--download", action="store_true", help="Leaflet js/css 를 [map] assets_path 에 받기")
+    args = parser.parse_args()
+    if not args.source and not args.download:
+        parser.error("변환할 HTML 파일이나 --download 를 지정하세요")
+
+    settings = config.load_config()["map"]
+    assets_path = settings.get("assets_path") or None
+    if args.download:
+        if not assets_path:
+            parser.error("[map] assets_path 가 비어 있습니다")
+        download(assets_path)
+    if not args.source:
+        return
+
+    with open(args.source, "r", encoding="utf-8") as file:
+        text = file.read()
+    markers, center, zoom, legend = parse_folium(text)
+    result = render(markers, center=center, zoom=zoom, legend=legend, tiles=settings.get("tiles") or TILES,
+                    assets_path=assets_path)
+    out = args.out or os.path.splitext(args.source)[0] + "_경량.html"
+    with open(out, "w", encoding="utf-8") as file:
+        file.write(result)
+
+    before = len(text.encode("utf-8"))
+    after = len(result.encode("utf-8"))
+    inlined = "<script src=" not in result
+    print(f"마커 {len(markers)}개: {before / 1024:.1f}KB -> {after / 1024:.1f}KB "
+          f"({'Leaflet 포함, 외부 요청 없음' if inlined else 'Leaflet 은 CDN, assets_path 에 받아 두면 HTML 에 넣는다'})")
+    print(out)
+
+
+if __name__ == "__main__":
+    main()
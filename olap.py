@@ -0,0 +1,327 @@
+# DuckDB 분석 백엔드 ([engine] backend = duckdb)
+# queries.py / aggregations.py 와 같은 이름과 결과 모양의 집계를 DuckDB(내장 컬럼형 엔진)로 계산한다
+# pandas groupby 는 한 코어에서 문자열(object) 컬럼을 다루지만, DuckDB 는 컬럼 단위로 여러 코어에서 집계한다
+#
+# 소스는 두 가지
+#   frame_source    : CSV 를 읽어 캐시해 둔 DataFrame 을 DuckDB 테이블로 옮겨 조회 (DJTC_dash.py)
+#   snapshot_source : 로컬 스냅샷의 월별 Parquet 파티션 중 구간에 걸친 파일만 직접 조회 (djtc.py, [data] source = snapshot)
+#
+# 사용법: python olap.py --csv 파일   # 월별로 pandas 집계와 결과가 같은지 비교하고 소요 시간을 출력
+#         python olap.py              # 로컬 스냅샷으로 비교
+import argparse
+import sys
+import threading
+import time
+
+import pandas as pd
+
+import instrument
+from queries import LOCATION_COLUMNS, MAP_COLUMNS, TRIP_COLUMNS
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+
+class Source:
+    # relation(connection, start, end): [start, end) 구간을 조회할 FROM 절 (데이터가 없으면 None)
+    # threads: DuckDB 가 쓰는 스레드 수 (0 이면 코어 수)
+    def __init__(self, relation, threads=0):
+        if duckdb is None:
+            raise ImportError("[engine] backend = duckdb 를 쓰려면 duckdb 패키지가 필요합니다 (pip install duckdb)")
+        self.connection = duckdb.connect()
+        if threads:
+            self.connection.execute(f"SET threads = {int(threads)}")
+        self._relation = relation
+        # 연결 하나를 여러 스레드가 함께 쓰지 않도록 조회는 한 번에 하나씩 (쿼리 하나는 DuckDB 가 여러 코어로 나눠 실행)
+        self._lock = threading.Lock()
+
+    # query 의 {rides} 를 구간의 FROM 절로 바꿔 실행하고 DataFrame 으로 돌려준다
+    def fetch(self, query, params, start=None, end=None):
+        with self._lock:
+            relation = self._relation(self.connection, start, end)
+            if relation is None:
+                return None
+            with instrument.stage("duckdb") as record:
+                df = self.connection.execute(query.format(rides=relation), params).df()
+                record["rows"] = len(df)
+        return df
+
+
+# DuckDB 테이블로 옮기는 컬럼 (파생 컬럼은 SQL 에서 계산한다)
+RIDE_COLUMNS = ["승차일시", "예약시간", "회원ID", "기사ID", *LOCATION_COLUMNS, *MAP_COLUMNS[2:]]
+
+
+# frame(): CSV 를 읽어 캐시해 둔 DataFrame (같은 객체가 돌아오면 다시 옮기지 않는다)
+# pandas DataFrame 을 그대로 조회하면 쿼리마다 문자열 컬럼을 변환하므로, 프레임이 바뀔 때 한 번 DuckDB 테이블로 옮긴다
+# 승차일시 순으로 정렬해 두면 구간 조회는 블록별 최소/최대값(zonemap)으로 필요 없는 블록을 건너뛴다
+def frame_source(frame, threads=0):
+    loaded = {"frame": None}
+
+    def relation(connection, start, end):
+        df = frame()
+        if df is not loaded["frame"]:
+            with instrument.stage("duckdb.load") as record:
+                connection.register("frame", df[[c for c in RIDE_COLUMNS if c in df.columns]])
+                connection.execute('CREATE OR REPLACE TABLE rides AS SELECT * FROM frame ORDER BY "승차일시"')
+                connection.unregister("frame")
+                record["rows"] = len(df)
+            loaded["frame"] = df
+        return "rides"
+    return Source(relation, threads)
+
+
+def _literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# 스냅샷 파티션 중 구간에 걸친 파일만 읽는다 (파일 목록은 조회할 때마다 다시 확인)
+def snapshot_source(local_snapshot, threads=0):
+    def relation(connection, start, end):
+        paths = local_snapshot.partition_paths(start, end)
+        if not paths:
+            return None
+        return f"read_parquet([{', '.join(_literal(path) for path in paths)}], union_by_name = true)"
+    return Source(relation, threads)
+
+
+def _timestamp(value):
+    return pd.Timestamp(value).to_pydatetime()
+
+
+# WHERE 절과 파라미터 (queries._where 와 같은 조건)
+def _where(start=None, end=None, require_coords=False):
+    conditions = ['"승차일시" IS NOT NULL']
+    params = []
+    if start is not None:
+        conditions.append('"승차일시" >= ?')
+        params.append(_timestamp(start))
+    if end is not None:
+        conditions.append('"승차일시" < ?')
+        params.append(_timestamp(end))
+    if require_coords:
+        conditions.append('"출발지_X좌표_수정" IS NOT NULL')
+        conditions.append('"출발지_Y좌표_수정" IS NOT NULL')
+    return " AND ".join(conditions), params
+
+
+def _fetch(source, query, params, start, end, columns):
+    df = source.fetch(query, params, start, end)
+    if df is None or df.empty:
+        return pd.DataFrame(columns=columns)
+    return df[columns]
+
+
+def daily_summary(source, start=None, end=None, require_coords=False):
+    where, params = _where(start, end, require_coords)
+    query = (
+        'SELECT CAST("승차일시" AS DATE) AS "date", '
+        'COUNT(*) AS "rides", '
+        'COUNT("회원ID") AS "usage", '
+        'COUNT(DISTINCT "회원ID") AS "users", '
+        'COUNT(DISTINCT "기사ID") AS "drivers" '
+        f'FROM {{rides}} WHERE {where} '
+        'GROUP BY 1 ORDER BY 1'
+    )
+    df = _fetch(source, query, params, start, end, ["date", "rides", "usage", "users", "drivers"])
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    return df.astype({"rides": int, "usage": int, "users": int, "drivers": int})
+
+
+def monthly_summary(source, start=None, end=None, require_coords=False):
+    where, params = _where(start, end, require_coords)
+    query = (
+        'SELECT strftime("승차일시", \'%Y-%m\') AS "year_month", '
+        'COUNT(*) AS "rides", '
+        'COUNT("회원ID") AS "usage", '
+        'COUNT(DISTINCT "회원ID") AS "users", '
+        'COUNT(DISTINCT "기사ID") AS "drivers" '
+        f'FROM {{rides}} WHERE {where} '
+        'GROUP BY 1 ORDER BY 1'
+    )
+    df = _fetch(source, query, params, start, end, ["year_month", "rides", "usage", "users", "drivers"])
+    return df.astype({"rides": int, "usage": int, "users": int, "drivers": int})
+
+
+# 구간 전체의 고유 이용자 수(users)와 기사 수(drivers)
+def distinct_counts(source, start=None, end=None, require_coords=False):
+    where, params = _where(start, end, require_coords)
+    query = f'SELECT COUNT(DISTINCT "회원ID") AS "users", COUNT(DISTINCT "기사ID") AS "drivers" FROM {{rides}} WHERE {where}'
+    df = _fetch(source, query, params, start, end, ["users", "drivers"])
+    if df.empty:
+        return {"users": 0, "drivers": 0}
+    return {"users": int(df.at[0, "users"]), "drivers": int(df.at[0, "drivers"])}
+
+
+def hourly_counts(source, start=None, end=None, require_coords=False):
+    where, params = _where(start, end, require_coords)
+    query = (
+        'SELECT hour("예약시간") AS "예약_시", '
+        'COUNT(DISTINCT "기사ID") AS "기사ID", '
+        'COUNT(DISTINCT "회원ID") AS "회원ID" '
+        f'FROM {{rides}} WHERE {where} AND "예약시간" IS NOT NULL '
+        'GROUP BY 1 ORDER BY 1'
+    )
+    return _fetch(source, query, params, start, end, ["예약_시", "기사ID", "회원ID"]).astype(int)
+
+
+# 일자 × 예약 시간대별 고유 기사 수와 고유 회원 수
+def date_hour_counts(source, start=None, end=None):
+    where, params = _where(start, end)
+    query = (
+        'SELECT CAST("승차일시" AS DATE) AS "date", hour("예약시간") AS "예약_시", '
+        'COUNT(DISTINCT "기사ID") AS "기사ID", '
+        'COUNT(DISTINCT "회원ID") AS "회원ID" '
+        f'FROM {{rides}} WHERE {where} AND "예약시간" IS NOT NULL '
+        'GROUP BY 1, 2 ORDER BY 1, 2'
+    )
+    df = _fetch(source, query, params, start, end, ["date", "예약_시", "기사ID", "회원ID"])
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    return df.astype({"예약_시": int, "기사ID": int, "회원ID": int})
+
+
+# value_counts().nlargest(limit) 와 같은 모양의 Series
+def top_locations(source, column, start=None, end=None, limit=10, require_coords=False):
+    if column not in LOCATION_COLUMNS:
+        raise ValueError(f"지원하지 않는 컬럼입니다: {column}")
+    where, params = _where(start, end, require_coords)
+    query = (
+        f'SELECT "{column}", COUNT(*) AS "count" '
+        f'FROM {{rides}} WHERE {where} AND "{column}" IS NOT NULL '
+        f'GROUP BY 1 ORDER BY 2 DESC, 1 LIMIT ?'
+    )
+    df = _fetch(source, query, params + [int(limit)], start, end, [column, "count"])
+    df[column] = df[column].astype(str)
+    return df.set_index(column)["count"].astype(int)
+
+
+def map_points(source, start=None, end=None):
+    where, params = _where(start, end, require_coords=True)
+    columns = ", ".join(f'"{c}"' for c in MAP_COLUMNS)
+    return _fetch(source, f"SELECT {columns} FROM {{rides}} WHERE {where}", params, start, end, list(MAP_COLUMNS))
+
+
+def trip_times(source, start=None, end=None):
+    where, params = _where(start, end)
+    columns = ", ".join(f'"{c}"' for c in TRIP_COLUMNS)
+    query = f'SELECT {columns} FROM {{rides}} WHERE {where} AND "기사ID" IS NOT NULL ORDER BY "기사ID", "승차일시"'
+    return _fetch(source, query, params, start, end, list(TRIP_COLUMNS))
+
+
+def watermark(source, start=None, end=None):
+    where, params = _where(start, end)
+    latest = _fetch(source, f'SELECT MAX("승차일시") AS "last" FROM {{rides}} WHERE {where}', params, start, end, ["last"])
+    if latest.empty or pd.isna(latest.at[0, "last"]):
+        return None
+    return pd.Timestamp(latest.at[0, "last"]).isoformat()
+
+
+def month_list(source, start=None, end=None):
+    where, params = _where(start, end)
+    query = f'SELECT DISTINCT strftime("승차일시", \'%Y-%m\') AS "year_month" FROM {{rides}} WHERE {where} ORDER BY 1'
+    return _fetch(source, query, params, start, end, ["year_month"])["year_month"].tolist()
+
+
+# ---- pandas 집계와 비교 ----
+
+# 상위 N개는 건수가 같은 항목의 순서가 정해져 있지 않으므로 건수 목록과, 마지막 건수보다 큰 항목만 비교
+def _same_top(expected, actual):
+    expected = {str(label): int(count) for label, count in expected.items()}
+    actual = {str(label): int(count) for label, count in actual.items()}
+    if sorted(expected.values()) != sorted(actual.values()):
+        return False
+    cutoff = min(expected.values(), default=0)
+    return {k: v for k, v in expected.items() if v > cutoff} == {k: v for k, v in actual.items() if v > cutoff}
+
+
+def _same(expected, actual):
+    if isinstance(expected, pd.Series):
+        return _same_top(expected, actual)
+    if isinstance(expected, pd.DataFrame):
+        if list(expected.columns) != list(actual.columns) or len(expected) != len(actual):
+            return False
+        # 지도 좌표는 행 순서가 다를 수 있으므로 정렬해서 비교
+        expected = sorted(map(tuple, expected.astype(str).to_numpy()))
+        actual = sorted(map(tuple, actual.astype(str).to_numpy()))
+        return expected == actual
+    return expected == actual
+
+
+# 월마다 같은 집계를 pandas(aggregations)와 DuckDB 로 계산해서 비교
+# 반환: [(집계 이름, 월, 같은지, pandas 초, duckdb 초), ...]
+def compare(load, source, months):
+    import aggregations
+    import queries
+
+    results = []
+
+    def check(name, month, pandas_call, duckdb_call):
+        started = time.perf_counter()
+        expected = pandas_call()
+        pandas_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        actual = duckdb_call()
+        duckdb_seconds = time.perf_counter() - started
+        results.append((name, month, _same(expected, actual), pandas_seconds, duckdb_seconds))
+
+    check("month_list", "-", lambda: aggregations.month_list(load), lambda: month_list(source))
+    check("date_hour_counts", "-", lambda: aggregations.date_hour_counts(load), lambda: date_hour_counts(source))
+    for month in months:
+        start, end = queries.month_range(month)
+        day = (pd.Timestamp(end) - pd.Timedelta(days=1)).date()
+        day_start, day_end = queries.day_range(day - pd.Timedelta(days=1), day)
+        calls = {
+            "daily_summary(전일~당일)": ("daily_summary", (day_start, day_end)),
+            "hourly_counts(당일)": ("hourly_counts", queries.day_range(day)),
+            "daily_summary": ("daily_summary", (start, end, True)),
+            "monthly_summary": ("monthly_summary", (start, end, True)),
+            "distinct_counts": ("distinct_counts", (start, end, True)),
+            "hourly_counts": ("hourly_counts", (start, end, True)),
+            "map_points": ("map_points", (start, end)),
+            "trip_times(당일)": ("trip_times", queries.day_range(day)),
+            "watermark": ("watermark", (start, end)),
+        }
+        for column in LOCATION_COLUMNS:
+            calls[f"top_locations({column})"] = ("top_locations", (column, start, end, 10, True))
+        for name, (function, args) in calls.items():
+            check(name, month,
+                  lambda: getattr(aggregations, function)(load, *args),
+                  lambda: globals()[function](source, *args))
+    return results
+
+
+def main():
+    import aggregations
+    import config
+    import ingest
+    import snapshot
+
+    parser = argparse.ArgumentParser(description="DuckDB 집계와 pandas 집계 결과 비교")
+    parser.add_argument("--csv", help="CSV 내보내기 파일 (없으면 로컬 스냅샷)")
+    args = parser.parse_args()
+
+    settings = config.load_config()
+    threads = settings["engine"].getint("threads")
+    if args.csv:
+        frame = aggregations.add_derived_columns(ingest.load_export(args.csv, settings["ingest"]))
+        load = aggregations.frame_loader(frame)
+        source = frame_source(lambda: frame, threads)
+    else:
+        local_snapshot = snapshot.open_snapshot(settings["snapshot"])
+        load = local_snapshot.load
+        source = snapshot_source(local_snapshot, threads)
+
+    results = compare(load, source, aggregations.month_list(load))
+    for name, month, same, pandas_seconds, duckdb_seconds in results:
+        mark = "OK  " if same else "다름"
+        print(f"{mark} {month} {name}: pandas {pandas_seconds:.3f}초 / duckdb {duckdb_seconds:.3f}초")
+    total_pandas = sum(r[3] for r in results)
+    total_duckdb = sum(r[4] for r in results)
+    print(f"합계: pandas {total_pandas:.2f}초 / duckdb {total_duckdb:.2f}초")
+    if not all(r[2] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+# 대시보드 집계용 SQL 모음
+# 전체 테이블을 가져와 pandas에서 groupby 하는 대신 MySQL에서 GROUP BY 한 작은 결과만 가져온다
+# 모든 함수는 fetch(query, params) 형태의 조회 함수를 받아 DataFrame을 돌려준다
+from datetime import datetime, time, timedelta
+
+import pandas as pd
+
+import instrument
+
+
+TABLE = "`A27P1Y_00_A27_02_전처리데이터_행정동수정_좌표기반_G1`"
+
+# 순위 집계에 사용할 수 있는 컬럼 (컬럼명은 파라미터로 바인딩할 수 없으므로 화이트리스트로 제한)
+LOCATION_COLUMNS = ("출발지_시군구", "출발지_읍면동")
+
+MAP_COLUMNS = ("출발지_시군구", "출발지_읍면동", "출발지_X좌표_수정", "출발지_Y좌표_수정")
+
+# 차량 가동률 계산에 쓰는 운행 시각 컬럼
+TRIP_COLUMNS = ("기사ID", "승차일시", "예약시간")
+
+
+# first ~ last 일자를 [시작, 끝) datetime 구간으로 변환
+def day_range(first, last=None):
+    last = first if last is None else last
+    start = datetime.combine(first, time.min)
+    end = datetime.combine(last + timedelta(days=1), time.min)
+    return start, end
+
+
+# 'YYYY-MM' 월을 [시작, 끝) datetime 구간으로 변환
+def month_range(year_month):
+    start = datetime.strptime(year_month + '-01', '%Y-%m-%d')
+    end = (start + timedelta(days=32)).replace(day=1)
+    return start, end
+
+
+# WHERE 절과 파라미터 생성
+# start 이상 end 미만 구간으로 승차일시를 자른다 (둘 다 None이면 전체 기간)
+def _where(start=None, end=None, require_coords=False):
+    conditions = ["`승차일시` IS NOT NULL"]
+    params = []
+    if start is not None:
+        conditions.append("`승차일시` >= %s")
+        params.append(start)
+    if end is not None:
+        conditions.append("`승차일시` < %s")
+        params.append(end)
+    if require_coords:
+        # 월별 분석은 좌표가 없는 행을 제외하고 집계한다
+        conditions.append("`출발지_X좌표_수정` IS NOT NULL")
+        conditions.append("`출발지_Y좌표_수정` IS NOT NULL")
+    return " AND ".join(conditions), params
+
+
+# fetch 결과(dict 리스트 또는 DataFrame)를 지정한 컬럼의 DataFrame으로 변환
+def _to_frame(rows, columns):
+    if rows is None or len(rows) == 0:
+        return pd.DataFrame(columns=columns)
+    with instrument.stage("to_frame") as record:
+        record["rows"] = len(rows)
+        return pd.DataFrame(rows, columns=columns)
+
+
+# 일별 이용 건수(rides), 회원ID 건수(usage), 이용자 수(users), 기사 수(drivers)
+def daily_summary_query(start=None, end=None, require_coords=False):
+    where, params = _where(start, end, require_coords)
+    query = (
+        "SELECT DATE(`승차일시`) AS `date`, "
+        "COUNT(*) AS `rides`, "
+        "COUNT(`회원ID`) AS `usage`, "
+        "COUNT(DISTINCT `회원ID`) AS `users`, "
+        "COUNT(DISTINCT `기사ID`) AS `drivers` "
+        f"FROM {TABLE} WHERE {where} "
+        "GROUP BY DATE(`승차일시`) ORDER BY `date`"
+    )
+    return query, params
+
+
+# 월별 이용 건수와 고유 이용자/기사 수
+def monthly_summary_query(start=None, end=None, require_coords=False):
+    where, params = _where(start, end, require_coords)
+    query = (
+        "SELECT DATE_FORMAT(`승차일시`, '%Y-%m') AS `year_month`, "
+        "COUNT(*) AS `rides`, "
+        "COUNT(`회원ID`) AS `usage`, "
+        "COUNT(DISTINCT `회원ID`) AS `users`, "
+        "COUNT(DISTINCT `기사ID`) AS `drivers` "
+        f"FROM {TABLE} WHERE {where} "
+        "GROUP BY `year_month` ORDER BY `year_month`"
+    )
+    return query, params
+
+
+# 구간 전체의 고유 이용자 수와 기사 수
+def distinct_counts_query(start=None, end=None, require_coords=False):
+    where, params = _where(start, end, require_coords)
+    query = (
+        "SELECT COUNT(DISTINCT `회원ID`) AS `users`, COUNT(DISTINCT `기사ID`) AS `drivers` "
+        f"FROM {TABLE} WHERE {where}"
+    )
+    return query, params
+
+
+# 예약 시간대(예약_시)별 고유 기사 수와 고유 회원 수
+def hourly_counts_query(start=None, end=None, require_coords=False):
+    where, params = _where(start, end, require_coords)
+    query = (
+        "SELECT HOUR(`예약시간`) AS `예약_시`, "
+        "COUNT(DISTINCT `기사ID`) AS `기사ID`, "
+        "COUNT(DISTINCT `회원ID`) AS `회원ID` "
+        f"FROM {TABLE} WHERE {where} AND `예약시간` IS NOT NULL "
+        "GROUP BY `예약_시` ORDER BY `예약_시`"
+    )
+    return query, params
+
+
+# 일자 × 예약 시간대별 고유 기사 수와 고유 회원 수 (전체 기간 히트맵용)
+def date_hour_counts_query(start=None, end=None):
+    where, params = _where(start, end)
+    query = (
+        "SELECT DATE(`승차일시`) AS `date`, HOUR(`예약시간`) AS `예약_시`, "
+        "COUNT(DISTINCT `기사ID`) AS `기사ID`, "
+        "COUNT(DISTINCT `회원ID`) AS `회원ID` "
+        f"FROM {TABLE} WHERE {where} AND `예약시간` IS NOT NULL "
+        "GROUP BY `date`, `예약_시` ORDER BY `date`, `예약_시`"
+    )
+    return query, params
+
+
+# 출발지 시군구/읍면동 상위 N개
+def top_locations_query(column, start=None, end=None, limit=10, require_coords=False):
+    if column not in LOCATION_COLUMNS:
+        raise ValueError(f"지원하지 않는 컬럼입니다: {column}")
+    where, params = _where(start, end, require_coords)
+    query = (
+        f"SELECT `{column}`, COUNT(*) AS `count` "
+        f"FROM {TABLE} WHERE {where} AND `{column}` IS NOT NULL "
+        f"GROUP BY `{column}` ORDER BY `count` DESC LIMIT %s"
+    )
+    return query, params + [int(limit)]
+
+
+# 지도에 찍을 원본 좌표 (지도에서만 행 단위 데이터가 필요하다)
+def map_points_query(start=None, end=None):
+    where, params = _where(start, end, require_coords=True)
+    columns = ", ".join(f"`{c}`" for c in MAP_COLUMNS)
+    query = f"SELECT {columns} FROM {TABLE} WHERE {where}"
+    return query, params
+
+
+# 기사ID 가 있는 운행의 기사/승차/예약 시각 (기사별, 승차일시 순)
+def trip_times_query(start=None, end=None):
+    where, params = _where(start, end)
+    columns = ", ".join(f"`{c}`" for c in TRIP_COLUMNS)
+    query = f"SELECT {columns} FROM {TABLE} WHERE {where} AND `기사ID` IS NOT NULL ORDER BY `기사ID`, `승차일시`"
+    return query, params
+
+
+# 구간 내 첫/마지막 승차일시 (승차일시 인덱스가 있으면 인덱스 양 끝만 읽는다)
+def month_bounds_query(start=None, end=None):
+    where, params = _where(start, end)
+    query = f"SELECT MIN(`승차일시`) AS `first`, MAX(`승차일시`) AS `last` FROM {TABLE} WHERE {where}"
+    return query, params
+
+
+# [start, end) 구간의 가장 최근 승차일시 (ISO 문자열, 없으면 None)
+# 지도 캐시처럼 새 행이 들어왔는지만 알면 되는 곳에서 쓴다 (승차일시 인덱스의 끝만 읽는다)
+def watermark(fetch, start=None, end=None):
+    bounds = _to_frame(fetch(*month_bounds_query(start, end)), ["first", "last"])
+    if bounds.empty or pd.isna(bounds.at[0, "last"]):
+        return None
+    return pd.Timestamp(bounds.at[0, "last"]).isoformat()
+
+
+# ranges [(월, 시작, 끝), ...] 중 행이 하나라도 있는 월
+# 월마다 EXISTS 로 인덱스에서 첫 행만 찾으므로 전체 행을 DATE_FORMAT 으로 훑지 않는다
+def month_probe_query(ranges):
+    parts = []
+    params = []
+    for year_month, start, end in ranges:
+        parts.append(
+            "SELECT %s AS `year_month` FROM DUAL WHERE EXISTS "
+            f"(SELECT 1 FROM {TABLE} WHERE `승차일시` >= %s AND `승차일시` < %s)"
+        )
+        params += [year_month, start, end]
+    return " UNION ALL ".join(parts) + " ORDER BY `year_month`", params
+
+
+# 구간 내 원본 행 (columns 가 None 이면 전체 컬럼, 로컬 스냅샷/롤업 적재용)
+def rows_query(start=None, end=None, columns=None):
+    where, params = _where(start, end)
+    selected = ", ".join(f"`{c}`" for c in columns) if columns else "*"
+    return f"SELECT {selected} FROM {TABLE} WHERE {where}", params
+
+
+def daily_summary(fetch, start=None, end=None, require_coords=False):
+    rows = fetch(*daily_summary_query(start, end, require_coords))
+    df = _to_frame(rows, ["date", "rides", "usage", "users", "drivers"])
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    return df
+
+
+def monthly_summary(fetch, start=None, end=None, require_coords=False):
+    rows = fetch(*monthly_summary_query(start, end, require_coords))
+    return _to_frame(rows, ["year_month", "rides", "usage", "users", "drivers"])
+
+
+def distinct_counts(fetch, start=None, end=None, require_coords=False):
+    df = _to_frame(fetch(*distinct_counts_query(start, end, require_coords)), ["users", "drivers"])
+    if df.empty:
+        return {"users": 0, "drivers": 0}
+    return {"users": int(df.at[0, "users"]), "drivers": int(df.at[0, "drivers"])}
+
+
+def hourly_counts(fetch, start=None, end=None, require_coords=False):
+    rows = fetch(*hourly_counts_query(start, end, require_coords))
+    df = _to_frame(rows, ["예약_시", "기사ID", "회원ID"])
+    return df.astype({"예약_시": int, "기사ID": int, "회원ID": int})
+
+
+def date_hour_counts(fetch, start=None, end=None):
+    rows = fetch(*date_hour_counts_query(start, end))
+    df = _to_frame(rows, ["date", "예약_시", "기사ID", "회원ID"])
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    return df.astype({"예약_시": int, "기사ID": int, "회원ID": int})
+
+
+# value_counts().nlargest(limit) 와 같은 모양의 Series를 돌려준다
+def top_locations(fetch, column, start=None, end=None, limit=10, require_coords=False):
+    rows = fetch(*top_locations_query(column, start, end, limit, require_coords))
+    df = _to_frame(rows, [column, "count"])
+    return df.set_index(column)["count"].astype(int)
+
+
+def map_points(fetch, start=None, end=None):
+    rows = fetch(*map_points_query(start, end))
+    return _to_frame(rows, list(MAP_COLUMNS))
+
+
+def trip_times(fetch, start=None, end=None):
+    df = _to_frame(fetch(*trip_times_query(start, end)), list(TRIP_COLUMNS))
+    for column in ("승차일시", "예약시간"):
+        df[column] = pd.to_datetime(df[column], errors="coerce")
+    return df
+
+
+# DB 조회 함수를 aggregations 모듈에서 쓰는 load(start, end, columns) 형태로 감싼다
+def loader(fetch):
+    def load(start=None, end=None, columns=None):
+        df = _to_frame(fetch(*rows_query(start, end, columns)), columns)
+        with instrument.stage("to_datetime"):
+            for column in ("승차일시", "예약시간"):
+                if column in df.columns:
+                    df[column] = pd.to_datetime(df[column], errors="coerce")
+        return df
+    return load
+
+
+# 데이터가 있는 월 목록
+# 첫/마지막 월은 범위 조회로 알 수 있으므로 그 사이 월만 존재 여부를 확인한다
+def month_list(fetch, start=None, end=None):
+    bounds = _to_frame(fetch(*month_bounds_query(start, end)), ["first", "last"])
+    if bounds.empty or pd.isna(bounds.at[0, "first"]):
+        return []
+    first = pd.Timestamp(bounds.at[0, "first"]).strftime("%Y-%m")
+    last = pd.Timestamp(bounds.at[0, "last"]).strftime("%Y-%m")
+    between = [str(period) for period in pd.period_range(first, last, freq="M")][1:-1]
+    if not between:
+        return sorted({first, last})
+    rows = fetch(*month_probe_query([(month, *month_range(month)) for month in between]))
+    return [first] + _to_frame(rows, ["year_month"])["year_month"].tolist() + [last]
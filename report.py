@@ -0,0 +1,199 @@
+# 일일 보고 표 / 월별 보고 표 일괄 생성
+# 화면(일별 분석)의 '일일 보고 형태 표'(총 건수, 이용자수, 이용자 이용횟수와 전일대비)를 모든 날짜에 대해,
+# 월별 분석의 총 건수/총 이용자 수(좌표가 있는 운행)를 모든 월에 대해 한 번에 만든다
+# 월마다 일별 요약과 월 요약을 프로세스 풀에서 나눠 계산하고, 전일/전월 비교는 전체를 한 번에 shift 로 계산한다
+#
+# 사용법: python report.py                         # [data] source 로 reports/ 에 일일보고.csv, 월별보고.csv 저장
+#         python report.py --csv 파일 --excel      # CSV 원본, 보고.xlsx 도 저장 (openpyxl 필요)
+#         python report.py --workers 4 --out 폴더
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import aggregations
+import queries
+
+DAILY_COLUMNS = ["전일 (A)", "당일 (B)", "전일대비(B-A)"]
+MONTHLY_COLUMNS = ["전월 (A)", "당월 (B)", "전월대비(B-A)"]
+
+
+# 기간별 rides/users/usage 를 (기간, 구분) 별 이전/현재/증감 표로
+# summary 는 빠진 기간 없이 기간 순으로 정렬되어 있어야 한다 (첫 기간의 이전 값은 0)
+def _comparison(summary, key, columns):
+    users = summary["users"].to_numpy(dtype=np.float64)
+    usage = summary["usage"].to_numpy(dtype=np.float64)
+    values = pd.DataFrame({
+        "총 건수": summary["rides"].to_numpy(),
+        "이용자수": summary["users"].to_numpy(),
+        # 이용자 1명당 이용 횟수 (이용자가 없으면 0)
+        "이용자 이용횟수": np.divide(usage, users, out=np.zeros_like(usage), where=users != 0),
+    }, index=pd.Index(summary[key], name=key))
+    previous = values.shift(1, fill_value=0)
+
+    current = values.stack()
+    previous = previous.stack()
+    table = pd.DataFrame({columns[0]: previous, columns[1]: current, columns[2]: current - previous})
+    table.index.names = [key, "구분"]
+    table = table.reset_index()
+    # 한 컬럼에 건수와 비율이 섞이므로 건수 행은 정수로 보이게 한다
+    counts = table["구분"] != "이용자 이용횟수"
+    table[columns] = table[columns].astype(object)
+    table.loc[counts, columns] = table.loc[counts, columns].astype(int)
+    return table
+
+
+# 일별 요약(daily_summary 결과)으로 first ~ last 날짜마다 일일 보고 표
+# 데이터가 없는 날짜는 0 으로 채운다
+def daily_report(summary, first=None, last=None):
+    if first is None or last is None:
+        if summary.empty:
+            return pd.DataFrame(columns=["date", "구분"] + DAILY_COLUMNS)
+        first = summary["date"].min() if first is None else first
+        last = summary["date"].max() if last is None else last
+    dates = pd.date_range(pd.Timestamp(first) - pd.Timedelta(days=1), last, freq="D").date
+    summary = summary.set_index("date")[["rides", "users", "usage"]].reindex(dates, fill_value=0)
+    summary.index.name = "date"
+    table = _comparison(summary.reset_index(), "date", DAILY_COLUMNS)
+    # 맨 앞 날짜는 첫 날의 전일 값을 위해서만 넣었다
+    return table[table["date"] != dates[0]].reset_index(drop=True)
+
+
+# 화면에 표시하는 한 날짜의 일일 보고 표 (구분, 전일 (A), 당일 (B), 전일대비(B-A))
+def daily_table(summary, day):
+    return daily_report(summary, day, day).drop(columns="date")
+
+
+# 월 요약(monthly_summary 결과, 월 단위 고유 이용자 수)으로 월마다 월별 보고 표
+# 데이터가 없는 월은 0 으로 채운다
+def monthly_report(summary):
+    if summary.empty:
+        return pd.DataFrame(columns=["year_month", "구분"] + MONTHLY_COLUMNS)
+    first = pd.Period(summary["year_month"].min(), freq="M")
+    months = pd.period_range(first - 1, summary["year_month"].max(), freq="M").strftime("%Y-%m")
+    summary = summary.set_index("year_month")[["rides", "users", "usage"]].reindex(months, fill_value=0)
+    summary.index.name = "year_month"
+    table = _comparison(summary.reset_index(), "year_month", MONTHLY_COLUMNS)
+    return table[table["year_month"] != months[0]].reset_index(drop=True)
+
+
+# ---- 월별 병렬 계산 ----
+
+# 작업 프로세스마다 한 번 여는 로드 함수 (CSV 는 부모 프로세스가 월별로 잘라서 넘기므로 쓰지 않는다)
+_worker_load = None
+
+
+def _open_worker_load():
+    global _worker_load
+    if _worker_load is None:
+        import config
+        import db
+        import snapshot
+
+        settings = config.load_config()
+        if settings["data"]["source"] == "snapshot":
+            _worker_load = snapshot.open_snapshot(settings["snapshot"]).load
+        else:
+            # 프로세스마다 커넥션 풀 하나 (프로세스가 끝날 때 연결도 닫힌다)
+            pool = db.create_pool(settings["database"])
+            batch_size = settings["database"].getint("fetch_batch_size")
+            _worker_load = queries.loader(lambda query, params: db.fetch_frame(pool, query, params, batch_size))
+    return _worker_load
+
+
+# 한 달의 일별 요약과 월 요약 (월 요약은 월별 분석 화면처럼 좌표가 있는 운행만)
+# frame 이 있으면 그 DataFrame 에서, 없으면 프로세스의 소스에서 읽는다
+def month_rows(month, frame=None):
+    load = aggregations.frame_loader(frame) if frame is not None else _open_worker_load()
+    start, end = queries.month_range(month)
+    return (
+        aggregations.daily_summary(load, start, end),
+        aggregations.monthly_summary(load, start, end, require_coords=True),
+    )
+
+
+# 월마다 month_rows 를 workers 개 프로세스에서 계산해 (일별 요약, 월 요약) 으로 합친다
+# frames 는 {월: DataFrame} (CSV 원본) 또는 None (작업 프로세스가 스냅샷/MySQL 을 직접 읽음)
+def collect(months, frames=None, workers=None):
+    frames = frames or {}
+    args = [(month, frames.get(month)) for month in months]
+    if workers == 1 or len(months) <= 1:
+        results = [month_rows(*arg) for arg in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(month_rows, *zip(*args)))
+    if not results:
+        return pd.DataFrame(columns=["date", "rides", "usage", "users", "drivers"]), pd.DataFrame(
+            columns=["year_month", "rides", "usage", "users", "drivers"])
+    daily = pd.concat([r[0] for r in results], ignore_index=True)
+    monthly = pd.concat([r[1] for r in results], ignore_index=True)
+    return daily, monthly
+
+
+# 보고 표에 필요한 컬럼
+REPORT_COLUMNS = ["승차일시", "회원ID", "기사ID"] + aggregations.COORD_COLUMNS
+
+
+# CSV 원본을 월별로 잘라 둔다 (작업 프로세스에는 자기 월의 필요한 컬럼만 넘어간다)
+def split_months(df):
+    df = df[REPORT_COLUMNS].dropna(subset=["승차일시"])
+    months = aggregations.year_month(df["승차일시"])
+    return {month: part for month, part in df.groupby(months, sort=True)}
+
+
+def write(daily, monthly, out, excel=False):
+    os.makedirs(out, exist_ok=True)
+    paths = [os.path.join(out, "일일보고.csv"), os.path.join(out, "월별보고.csv")]
+    # 엑셀에서 바로 열 수 있도록 BOM 이 있는 UTF-8
+    daily.to_csv(paths[0], index=False, encoding="utf-8-sig")
+    monthly.to_csv(paths[1], index=False, encoding="utf-8-sig")
+    if excel:
+        paths.append(os.path.join(out, "보고.xlsx"))
+        with pd.ExcelWriter(paths[-1]) as writer:
+            daily.to_excel(writer, sheet_name="일일보고", index=False)
+            monthly.to_excel(writer, sheet_name="월별보고", index=False)
+    return paths
+
+
+def main():
+    import config
+    import ingest
+    import sources
+
+    parser = argparse.ArgumentParser(description="모든 날짜/월의 일일·월별 보고 표 생성")
+    sources.add_source_arguments(parser)
+    parser.add_argument("--out", default="reports", help="저장할 폴더")
+    parser.add_argument("--excel", action="store_true", help="보고.xlsx 도 저장 (openpyxl 필요)")
+    parser.add_argument("--workers", type=int, help="작업 프로세스 수 (기본값: CPU 수, 1 이면 한 프로세스에서 계산)")
+    args = parser.parse_args()
+    if args.excel:
+        try:
+            import openpyxl
+        except ImportError:
+            parser.error("--excel 은 openpyxl 패키지가 필요합니다 (pip install openpyxl)")
+
+    settings = config.load_config()
+    started = time.perf_counter()
+    if args.csv:
+        frames = split_months(ingest.load_export(args.csv, settings["ingest"]))
+        months = list(frames)
+    else:
+        # 부모 프로세스는 월 목록만 확인하고 (--refresh 면 스냅샷 갱신) 읽기는 작업 프로세스가 한다
+        frames = None
+        with sources.open_loader(settings, refresh=args.refresh) as (_, months):
+            months = list(months)
+    daily, monthly = collect(months, frames, args.workers)
+    daily_table = daily_report(daily)
+    monthly_table = monthly_report(monthly)
+    paths = write(daily_table, monthly_table, args.out, args.excel)
+
+    print(f"{len(months)}개월, {daily_table['date'].nunique()}일: {time.perf_counter() - started:.1f}초")
+    for path in paths:
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
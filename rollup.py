@@ -0,0 +1,294 @@
+# 일별/시간대별 사전 집계(롤업) 저장소와 증분 ETL
+# 일일 보고 표, st.metric 증감, 시간대별 수요&공급 그래프, 상위 출발지 순위를 원본 대신 롤업에서 읽는다
+#
+# 롤업 테이블 (Parquet, [rollup] path 아래)
+#   daily            : date 별 rides, usage, users, drivers (전체 행)
+#   daily_geo        : 위와 같음 (출발지 좌표가 있는 행, 월별 분석용)
+#   hourly           : (date, 예약_시) 별 고유 기사 수(기사ID), 고유 회원 수(회원ID)
+#   hourly_month_geo : (year_month, 예약_시) 별 고유 기사 수, 고유 회원 수 (월별 분석용)
+#   region_month_geo : (year_month, 출발지_시군구, 출발지_읍면동) 별 건수
+#   daily_sketch     : (date, geo) 별 회원ID/기사ID HyperLogLog 스케치 (geo 는 좌표가 있는 행만인지 여부)
+#   hourly_sketch    : (date, 예약_시, geo) 별 회원ID/기사ID 스케치
+#   스케치를 합치면 임의 구간의 고유 이용자/기사 수를 원본 없이 추정할 수 있다 (sketch.py)
+#
+# 사용법: python rollup.py              # [data] source (snapshot/mysql) 에서 새 데이터만 롤업
+#         python rollup.py --refresh    # 스냅샷을 먼저 갱신한 뒤 롤업
+#         python rollup.py --csv 파일   # CSV 내보내기 파일로 롤업
+#         python rollup.py --full       # 처음부터 다시 계산
+import argparse
+import json
+import os
+
+import pandas as pd
+
+import aggregations
+import queries
+import sketch
+from aggregations import COORD_COLUMNS, LOCATION_COLUMNS
+
+STATE_FILE = "_state.json"
+
+SOURCE_COLUMNS = ["승차일시", "예약시간", "회원ID", "기사ID", "출발지_시군구", "출발지_읍면동"] + COORD_COLUMNS
+
+# 테이블별 기간 키 (증분 갱신 시 이 키 기준으로 교체한다)
+TABLE_KEYS = {
+    "daily": "date",
+    "daily_geo": "date",
+    "hourly": "date",
+    "hourly_month_geo": "year_month",
+    "region_month_geo": "year_month",
+    "daily_sketch": "date",
+    "hourly_sketch": "date",
+}
+
+ID_COLUMNS = ["회원ID", "기사ID"]
+
+
+class RollupStore:
+    def __init__(self, path):
+        self.path = path
+
+    def _table_path(self, name):
+        return os.path.join(self.path, f"{name}.parquet")
+
+    def exists(self):
+        return all(os.path.exists(self._table_path(name)) for name in TABLE_KEYS)
+
+    def state(self):
+        state_path = os.path.join(self.path, STATE_FILE)
+        if not os.path.exists(state_path):
+            return {"watermark": None}
+        with open(state_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _write_state(self, state):
+        state_path = os.path.join(self.path, STATE_FILE)
+        with open(state_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False, indent=2)
+        os.replace(state_path + ".tmp", state_path)
+
+    def read(self, name):
+        path = self._table_path(name)
+        if not os.path.exists(path):
+            return None
+        table = pd.read_parquet(path)
+        if TABLE_KEYS[name] == "date":
+            table["date"] = pd.to_datetime(table["date"]).dt.date
+        return table
+
+    def write(self, name, table):
+        path = self._table_path(name)
+        table.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+
+# keys 별 회원ID/기사ID 스케치 테이블 (스케치는 bytes 로 저장)
+def _sketch_table(df, keys, geo, precision):
+    if df.empty:
+        return pd.DataFrame(columns=[k.name for k in keys] + ["geo"] + ID_COLUMNS)
+    grouped = df.groupby(keys, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    groups = grouped.size().index
+    table = groups.to_frame(index=False)
+    table["geo"] = geo
+    for column in ID_COLUMNS:
+        registers = sketch.build_grouped(codes, df[column].to_numpy(), len(groups), precision)
+        table[column] = [sketch.to_bytes(r) for r in registers]
+    return table
+
+
+def _sketch_tables(df, geo, precision):
+    source = df.dropna(subset=COORD_COLUMNS) if geo else df
+    daily = _sketch_table(source, [source["승차일시"].dt.date.rename("date")], geo, precision)
+    booked = source.dropna(subset=["예약시간"])
+    hourly = _sketch_table(booked, [
+        booked["승차일시"].dt.date.rename("date"),
+        booked["예약시간"].dt.hour.rename("예약_시"),
+    ], geo, precision)
+    return daily, hourly
+
+
+# 원본 행으로 롤업 테이블 계산
+def build_tables(df, precision=sketch.PRECISION):
+    df = df.dropna(subset=["승차일시"])
+    load = aggregations.frame_loader(df)
+    tables = {
+        "daily": aggregations.daily_summary(load),
+        "daily_geo": aggregations.daily_summary(load, require_coords=True),
+    }
+
+    tables["hourly"] = aggregations.date_hour_counts(load)
+
+    geo = df.dropna(subset=COORD_COLUMNS)
+    geo_booked = geo.dropna(subset=["예약시간"])
+    hourly_month = geo_booked.groupby([
+        aggregations.year_month(geo_booked["승차일시"]).rename("year_month"),
+        geo_booked["예약시간"].dt.hour.rename("예약_시"),
+    ])
+    tables["hourly_month_geo"] = hourly_month.agg(기사ID=("기사ID", "nunique"), 회원ID=("회원ID", "nunique")).reset_index()
+
+    regions = geo.groupby([aggregations.year_month(geo["승차일시"]).rename("year_month")] + list(LOCATION_COLUMNS), observed=True)
+    tables["region_month_geo"] = regions.size().rename("count").reset_index()
+
+    daily_all, hourly_all = _sketch_tables(df, False, precision)
+    daily_geo, hourly_geo = _sketch_tables(df, True, precision)
+    tables["daily_sketch"] = pd.concat([daily_all, daily_geo], ignore_index=True)
+    tables["hourly_sketch"] = pd.concat([hourly_all, hourly_geo], ignore_index=True)
+    return tables
+
+
+# 워터마크가 속한 월부터 다시 계산해서 해당 기간 행만 교체 (여러 번 실행해도 결과가 같다)
+# load: load(start, end, columns) 로드 함수, months: 원본에 있는 월 목록
+def update(store, load, months, full=False, precision=sketch.PRECISION):
+    os.makedirs(store.path, exist_ok=True)
+    state = store.state()
+    watermark = None if full or not store.exists() else state["watermark"]
+    first_month = pd.Timestamp(watermark).strftime("%Y-%m") if watermark else None
+    months = [m for m in months if first_month is None or m >= first_month]
+
+    # 한 달씩 계산해서 메모리 사용량을 월 단위로 제한
+    parts = {name: [] for name in TABLE_KEYS}
+    latest = pd.Timestamp(watermark) if watermark else None
+    for month in months:
+        start, end = queries.month_range(month)
+        df = load(start, end, columns=SOURCE_COLUMNS)
+        df = df[(df["승차일시"] >= start) & (df["승차일시"] < end)]
+        if df.empty:
+            continue
+        for name, table in build_tables(df, precision).items():
+            parts[name].append(table)
+        month_latest = df["승차일시"].max()
+        latest = month_latest if latest is None else max(latest, month_latest)
+
+    if not any(parts.values()):
+        return []
+
+    start, _ = queries.month_range(first_month) if first_month else (None, None)
+    for name, key in TABLE_KEYS.items():
+        existing = None if full else store.read(name)
+        frames = []
+        if existing is not None and start is not None:
+            boundary = start.date() if key == "date" else first_month
+            frames.append(existing[existing[key] < boundary])
+        frames.extend(parts[name])
+        table = pd.concat(frames, ignore_index=True).sort_values(key, kind="stable")
+        store.write(name, table.reset_index(drop=True))
+
+    state["watermark"] = latest.isoformat()
+    store._write_state(state)
+    return months
+
+
+# ---- 대시보드용 조회 함수 (queries / aggregations 와 같은 이름과 결과 모양) ----
+
+def _between(table, key, start, end):
+    if key == "date":
+        lower = pd.Timestamp(start).date() if start is not None else None
+        upper = pd.Timestamp(end).date() if end is not None else None
+    else:
+        lower = pd.Timestamp(start).strftime("%Y-%m") if start is not None else None
+        upper = pd.Timestamp(end).strftime("%Y-%m") if end is not None else None
+    if lower is not None:
+        table = table[table[key] >= lower]
+    if upper is not None:
+        table = table[table[key] < upper]
+    return table
+
+
+def _is_whole_month(start, end):
+    if start is None or end is None:
+        return False
+    month = pd.Timestamp(start).strftime("%Y-%m")
+    return (pd.Timestamp(start).to_pydatetime(), pd.Timestamp(end).to_pydatetime()) == queries.month_range(month)
+
+
+def daily_summary(store, start=None, end=None, require_coords=False):
+    table = store.read("daily_geo" if require_coords else "daily")
+    return _between(table, "date", start, end).reset_index(drop=True)
+
+
+# 스케치 테이블에서 geo 여부와 [start, end) 일자 구간에 맞는 행 (구간은 일 단위여야 한다)
+def _sketch_rows(store, name, start, end, require_coords):
+    for bound in (start, end):
+        if bound is not None and pd.Timestamp(bound) != pd.Timestamp(bound).normalize():
+            raise ValueError("스케치는 일 단위 구간만 합칠 수 있습니다")
+    table = store.read(name)
+    return _between(table[table["geo"] == require_coords], "date", start, end)
+
+
+def _merged_estimate(sketches):
+    return sketch.estimate(sketch.merge([sketch.from_bytes(s) for s in sketches]))
+
+
+# [start, end) 구간의 고유 이용자 수(users)와 기사 수(drivers) 추정 (일별 스케치를 합친다)
+def distinct_counts(store, start=None, end=None, require_coords=False):
+    table = _sketch_rows(store, "daily_sketch", start, end, require_coords)
+    return {
+        "users": _merged_estimate(table["회원ID"]),
+        "drivers": _merged_estimate(table["기사ID"]),
+    }
+
+
+# 롤업의 정확한 시간대별 집계는 하루(전체 행) 또는 한 달(좌표가 있는 행) 단위만 있고
+# 다른 구간은 시간대별 스케치를 합쳐서 추정한다
+def hourly_counts(store, start=None, end=None, require_coords=False):
+    if require_coords and _is_whole_month(start, end):
+        table = store.read("hourly_month_geo")
+        table = table[table["year_month"] == pd.Timestamp(start).strftime("%Y-%m")]
+    elif not require_coords and start is not None and end is not None and pd.Timestamp(end) - pd.Timestamp(start) == pd.Timedelta(days=1):
+        table = store.read("hourly")
+        table = table[table["date"] == pd.Timestamp(start).date()]
+    else:
+        sketches = _sketch_rows(store, "hourly_sketch", start, end, require_coords)
+        grouped = sketches.groupby("예약_시")
+        table = pd.DataFrame({
+            "기사ID": grouped["기사ID"].agg(_merged_estimate),
+            "회원ID": grouped["회원ID"].agg(_merged_estimate),
+        }).reset_index()
+    return table[["예약_시", "기사ID", "회원ID"]].reset_index(drop=True).astype(int)
+
+
+# 일자 × 예약 시간대별 고유 기사/회원 수는 hourly 테이블 그대로 (정확한 값)
+def date_hour_counts(store, start=None, end=None):
+    table = _between(store.read("hourly"), "date", start, end)
+    return table[["date", "예약_시", "기사ID", "회원ID"]].reset_index(drop=True).astype({"예약_시": int, "기사ID": int, "회원ID": int})
+
+
+# 롤업의 출발지 집계는 월 단위 (좌표가 있는 행) 이므로 구간에 포함된 월을 합친다
+def top_locations(store, column, start=None, end=None, limit=10, require_coords=True):
+    if column not in LOCATION_COLUMNS:
+        raise ValueError(f"지원하지 않는 컬럼입니다: {column}")
+    table = _between(store.read("region_month_geo"), "year_month", start, end)
+    counts = table.groupby(column, observed=True)["count"].sum().nlargest(limit)
+    return counts.astype(int)
+
+
+def month_list(store, start=None, end=None):
+    table = _between(store.read("daily"), "date", start, end)
+    return sorted(pd.to_datetime(table["date"]).dt.strftime("%Y-%m").unique().tolist())
+
+
+# config 의 [rollup] 섹션으로 저장소 생성
+def open_store(settings):
+    return RollupStore(settings.get("path"))
+
+
+def main():
+    import config
+    import sources
+
+    parser = argparse.ArgumentParser(description="일별/시간대별 롤업 증분 갱신")
+    sources.add_source_arguments(parser)
+    parser.add_argument("--full", action="store_true", help="처음부터 다시 계산")
+    args = parser.parse_args()
+
+    settings = config.load_config()
+    store = open_store(settings["rollup"])
+    with sources.open_loader(settings, args.csv, args.refresh) as (load, months):
+        updated = update(store, load, months, full=args.full, precision=settings["rollup"].getint("sketch_precision"))
+    print(f"다시 계산한 월: {', '.join(updated) if updated else '없음'}")
+    print(f"워터마크: {store.state()['watermark']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+# 운행 테이블 인덱스 관리
+# 대시보드 쿼리는 모두 승차일시 구간([시작, 끝))으로 자르므로 승차일시로 시작하는 인덱스가 있어야 필요한 행만 읽는다
+# 인덱스 뒤쪽 컬럼은 쿼리가 읽는 컬럼을 덮어서(covering) 테이블 행을 다시 읽지 않게 한다
+#
+# 사용법: python schema.py           # 인덱스 상태와 대시보드 쿼리의 EXPLAIN 확인
+#         python schema.py --apply   # 없는 인덱스를 만들고 다시 확인
+import argparse
+import sys
+from datetime import timedelta
+
+import pandas as pd
+
+import queries
+
+TABLE_NAME = queries.TABLE.strip("`")
+
+# 인덱스 이름 -> 컬럼 (같은 컬럼으로 시작하는 인덱스가 이미 있으면 만들지 않는다)
+INDEXES = {
+    # 일별/월별 요약, 고유 이용자/기사 수, 시간대별 집계 (예약시간 포함)
+    "ix_boarded_booked": ("승차일시", "예약시간", "회원ID", "기사ID"),
+    # 상위 출발지, 지도 좌표, 좌표가 있는 행만 고르는 월별 분석
+    "ix_boarded_origin": ("승차일시", "출발지_시군구", "출발지_읍면동", "출발지_X좌표_수정", "출발지_Y좌표_수정"),
+}
+
+# 문자열 컬럼은 앞부분만 인덱스에 넣는다 (TEXT 컬럼은 길이 없이 인덱스를 만들 수 없다)
+TEXT_TYPES = {"text", "tinytext", "mediumtext", "longtext", "blob", "varchar", "char"}
+PREFIX_LENGTH = 32
+
+
+# fetch 결과를 지정한 컬럼의 DataFrame 으로 (결과가 없어도 컬럼은 있다)
+def _frame(fetch, query, params, columns):
+    rows = fetch(query, params)
+    if rows is None or len(rows) == 0:
+        return pd.DataFrame(columns=columns)
+    return pd.DataFrame(rows, columns=columns)
+
+
+# 테이블의 인덱스 {이름: (컬럼, ...)}
+def existing_indexes(fetch):
+    rows = _frame(
+        fetch,
+        "SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY INDEX_NAME, SEQ_IN_INDEX",
+        [TABLE_NAME], ["INDEX_NAME", "COLUMN_NAME"],
+    )
+    return {name: tuple(group["COLUMN_NAME"]) for name, group in rows.groupby("INDEX_NAME", sort=False)}
+
+
+# INDEXES 중 같은 컬럼으로 시작하는 인덱스가 없는 것
+def missing_indexes(fetch):
+    existing = existing_indexes(fetch).values()
+    return {
+        name: columns for name, columns in INDEXES.items()
+        if not any(found[:len(columns)] == columns for found in existing)
+    }
+
+
+def _column_types(fetch):
+    rows = _frame(
+        fetch,
+        "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        [TABLE_NAME], ["COLUMN_NAME", "DATA_TYPE"],
+    )
+    return dict(zip(rows["COLUMN_NAME"], rows["DATA_TYPE"].str.lower()))
+
+
+def create_index_query(name, columns, column_types):
+    parts = []
+    for column in columns:
+        if column_types.get(column) in TEXT_TYPES:
+            parts.append(f"`{column}`({PREFIX_LENGTH})")
+        else:
+            parts.append(f"`{column}`")
+    # 대시보드가 계속 조회할 수 있도록 테이블을 잠그지 않고 만든다
+    return f"ALTER TABLE {queries.TABLE} ADD INDEX `{name}` ({', '.join(parts)}), ALGORITHM=INPLACE, LOCK=NONE"
+
+
+# 없는 인덱스 생성 (execute(query) 는 결과 없는 문장 실행 함수), 만든 인덱스 이름 목록을 돌려준다
+def apply(fetch, execute):
+    column_types = _column_types(fetch)
+    created = []
+    for name, columns in missing_indexes(fetch).items():
+        execute(create_index_query(name, columns, column_types))
+        created.append(name)
+    return created
+
+
+# 대시보드가 실제로 보내는 쿼리 (가장 최근 월과 그 마지막 날 기준)
+def dashboard_queries(fetch):
+    months = queries.month_list(fetch)
+    if not months:
+        return {}
+    month = months[-1]
+    start, end = queries.month_range(month)
+    previous_start, _ = queries.month_range((start - timedelta(days=1)).strftime("%Y-%m"))
+    last_day = (end - timedelta(days=1)).date()
+    day_start, day_end = queries.day_range(last_day)
+    return {
+        "일별 요약(전일~당일)": queries.daily_summary_query(*queries.day_range(last_day - timedelta(days=1), last_day)),
+        "일별 시간대별": queries.hourly_counts_query(day_start, day_end),
+        "월별 일별 요약(전월~당월)": queries.daily_summary_query(previous_start, end, True),
+        "월별 고유 수": queries.distinct_counts_query(start, end, True),
+        "월별 상위 시군구": queries.top_locations_query("출발지_시군구", start, end, 10, True),
+        "월별 상위 읍면동": queries.top_locations_query("출발지_읍면동", start, end, 10, True),
+        "월별 시간대별": queries.hourly_counts_query(start, end, True),
+        "월별 지도 좌표": queries.map_points_query(start, end),
+        "전체 일자×시간대": queries.date_hour_counts_query(),
+        "월 목록(범위)": queries.month_bounds_query(),
+        "월 목록(존재 확인)": queries.month_probe_query([(month, start, end)]),
+    }
+
+
+# 쿼리마다 EXPLAIN 결과에서 운행 테이블을 읽는 방식 확인
+# 전체 스캔(type = ALL)이거나 인덱스를 쓰지 않으면 ok = False
+def explain(fetch):
+    results = []
+    for label, (query, params) in dashboard_queries(fetch).items():
+        plan = _frame(fetch, "EXPLAIN " + query, params, ["table", "type", "key", "rows", "Extra"])
+        scans = plan[plan["table"] == TABLE_NAME]
+        ok = bool(scans.empty or ((scans["type"] != "ALL") & scans["key"].notna()).all())
+        results.append({
+            "query": label,
+            "ok": ok,
+            "type": ", ".join(map(str, scans["type"])) or "-",
+            "key": ", ".join(map(str, scans["key"])) or "-",
+            "rows": int(pd.to_numeric(scans["rows"]).sum()) if not scans.empty else 0,
+            "extra": "; ".join(str(extra) for extra in plan["Extra"] if pd.notna(extra)),
+        })
+    return results
+
+
+def main():
+    import config
+    import db
+
+    parser = argparse.ArgumentParser(description="운행 테이블 인덱스 확인/생성과 대시보드 쿼리 EXPLAIN")
+    parser.add_argument("--apply", action="store_true", help="없는 인덱스를 만든다")
+    args = parser.parse_args()
+
+    settings = config.load_config()
+    pool = db.create_pool(settings["database"])
+    batch_size = settings["database"].getint("fetch_batch_size")
+    fetch = lambda query, params=None: db.fetch_frame(pool, query, params, batch_size)
+
+    def execute(query):
+        print(query)
+        with pool.connection() as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(query)
+            finally:
+                cursor.close()
+
+    try:
+        if args.apply:
+            created = apply(fetch, execute)
+            print(f"만든 인덱스: {', '.join(created) if created else '없음'}")
+        for name, columns in existing_indexes(fetch).items():
+            print(f"{name}: {', '.join(columns)}")
+        for name, columns in missing_indexes(fetch).items():
+            print(f"{name}: 없음 ({', '.join(columns)}) - python schema.py --apply 로 생성")
+
+        results = explain(fetch)
+    finally:
+        pool.close()
+
+    for result in results:
+        mark = "OK  " if result["ok"] else "스캔"
+        print(f"{mark} {result['query']}: type={result['type']} key={result['key']} rows≈{result['rows']:,} {result['extra']}")
+    if not all(result["ok"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# 운행 테이블의 로컬 스냅샷 (승차일시 월별 Parquet 파티션)
+# 갱신할 때는 저장된 워터마크(max 승차일시) 이후의 행만 DB에서 가져와 해당 월 파티션만 다시 쓴다
+# 대시보드는 선택한 날짜/월에 필요한 파티션만 읽는다
+# 파티션에는 파생 컬럼(date, year_month, 예약_시)을 함께 저장해서 읽을 때마다 다시 계산하지 않는다
+# 저장할 때 자료형을 줄인다 (compact.py)
+#
+# 사용법: python snapshot.py            # djtc.ini 의 [snapshot] path 에 갱신
+#         python snapshot.py --full     # 워터마크를 무시하고 전체를 다시 받음
+import argparse
+import json
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import aggregations
+import compact
+import ingest
+import queries
+
+STATE_FILE = "_watermark.json"
+
+DATETIME_COLUMNS = ["승차일시", "예약시간"]
+
+
+class Snapshot:
+    # key_column: 중복 제거에 쓸 기본키 컬럼 (없으면 전체 컬럼이 같은 행을 중복으로 본다)
+    def __init__(self, path, key_column=None):
+        self.path = path
+        self.key_column = key_column or None
+
+    def _partition_path(self, month):
+        return os.path.join(self.path, f"month={month}.parquet")
+
+    def _state_path(self):
+        return os.path.join(self.path, STATE_FILE)
+
+    def state(self):
+        if not os.path.exists(self._state_path()):
+            return {"watermark": None, "partitions": {}}
+        with open(self._state_path(), "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _write_state(self, state):
+        tmp_path = self._state_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._state_path())
+
+    def watermark(self):
+        watermark = self.state()["watermark"]
+        return pd.Timestamp(watermark).to_pydatetime() if watermark else None
+
+    # 저장된 월 목록 ('YYYY-MM')
+    def months(self):
+        return sorted(self.state()["partitions"])
+
+    # [start, end) 구간에 걸친 월 목록
+    def months_between(self, start=None, end=None):
+        months = self.months()
+        if start is not None:
+            months = [m for m in months if m >= pd.Timestamp(start).strftime("%Y-%m")]
+        if end is not None:
+            # end 는 미포함이므로 end 직전 시각이 속한 월까지 읽는다
+            last = (pd.Timestamp(end) - pd.Timedelta(microseconds=1)).strftime("%Y-%m")
+            months = [m for m in months if m <= last]
+        return months
+
+    # [start, end) 구간에 걸친 파티션 파일 경로
+    def partition_paths(self, start=None, end=None):
+        return [self._partition_path(m) for m in self.months_between(start, end)]
+
+    # [start, end) 구간에 걸친 월 파티션만 읽는다 (구간 경계 필터링은 호출한 쪽에서 한다)
+    def load(self, start=None, end=None, columns=None):
+        months = self.months_between(start, end)
+        frames = [pd.read_parquet(self._partition_path(m), columns=self._columns(m, columns)) for m in months]
+        return ingest.concat_frames(frames, columns)
+
+    # 요청한 컬럼과 파티션에 저장된 파생 컬럼
+    def _columns(self, month, columns):
+        if columns is None:
+            return None
+        stored = pq.read_schema(self._partition_path(month)).names
+        return list(columns) + [c for c in aggregations.DERIVED_COLUMNS if c in stored and c not in columns]
+
+    @staticmethod
+    def _normalize(df):
+        for column in DATETIME_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_datetime(df[column], errors="coerce")
+        return df
+
+    # 한 달 치 새 행을 기존 파티션과 합쳐 다시 쓴다
+    def _merge_partition(self, month, new_rows):
+        path = self._partition_path(month)
+        if os.path.exists(path):
+            # 파생 컬럼은 중복 제거 뒤에 다시 계산한다
+            existing = pd.read_parquet(path)
+            existing = existing.drop(columns=[c for c in aggregations.DERIVED_COLUMNS if c in existing.columns])
+            # 새 행도 저장된 행과 같은 자료형(float32 좌표 등)으로 맞춰야 중복이 같은 값으로 비교된다
+            new_rows, _ = compact.compact(new_rows, columns=None)
+            merged = ingest.concat_frames([existing, new_rows])
+        else:
+            merged = new_rows
+        subset = [self.key_column] if self.key_column else None
+        merged = merged.drop_duplicates(subset=subset, keep="last")
+        merged = merged.sort_values("승차일시", kind="stable").reset_index(drop=True)
+        merged = aggregations.add_derived_columns(merged)
+        # ID/지역은 범주형, 좌표는 float32 로 저장해서 읽을 때도 줄어든 자료형으로 올라온다
+        merged, _ = compact.compact(merged, columns=None)
+
+        tmp_path = path + ".tmp"
+        merged.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        return len(merged)
+
+    # fetch(query, params) 로 워터마크 이후 행을 받아 해당 월 파티션만 갱신
+    # 워터마크와 같은 시각의 행도 다시 받아 중복 제거로 처리한다 (같은 초에 늦게 들어온 행 누락 방지)
+    def refresh(self, fetch, full=False):
+        os.makedirs(self.path, exist_ok=True)
+        state = {"watermark": None, "partitions": {}} if full else self.state()
+        watermark = None if full else self.watermark()
+
+        updated = []
+        # 한 번에 한 달씩 받아서 메모리 사용량을 월 단위로 제한
+        for month in queries.month_list(fetch, start=watermark):
+            start, end = queries.month_range(month)
+            if watermark is not None and watermark > start:
+                start = watermark
+            # fetch 는 조회에 실패하면 예외를 올리므로 그 월에서 멈추고, 워터마크와 상태는 이미 끝낸 월까지만 저장되어 있다
+            # (실패한 월을 건너뛰고 다음 월로 워터마크를 넘기면 그 월의 행은 다시 받지 않게 된다)
+            rows = fetch(*queries.rows_query(start, end))
+            if full and os.path.exists(self._partition_path(month)):
+                os.remove(self._partition_path(month))
+            if len(rows) == 0:
+                continue
+            new_rows = self._normalize(pd.DataFrame(rows))
+            state["partitions"][month] = self._merge_partition(month, new_rows)
+
+            latest = new_rows["승차일시"].max()
+            if pd.notna(latest) and (state["watermark"] is None or latest > pd.Timestamp(state["watermark"])):
+                state["watermark"] = latest.isoformat()
+            # 파티션마다 상태를 저장해서 중간에 끊겨도 이어서 갱신할 수 있게 한다
+            self._write_state(state)
+            updated.append(month)
+        return updated
+
+
+# config 의 [snapshot] 섹션으로 스냅샷 생성
+def open_snapshot(settings):
+    return Snapshot(settings.get("path"), settings.get("key_column"))
+
+
+def main():
+    import config
+    import db
+
+    parser = argparse.ArgumentParser(description="운행 테이블 로컬 스냅샷 갱신")
+    parser.add_argument("--full", action="store_true", help="워터마크를 무시하고 전체를 다시 받음")
+    args = parser.parse_args()
+
+    settings = config.load_config()
+    pool = db.create_pool(settings["database"])
+    snapshot = open_snapshot(settings["snapshot"])
+    try:
+        batch_size = settings["database"].getint("fetch_batch_size")
+        updated = snapshot.refresh(lambda query, params: db.fetch_frame(pool, query, params, batch_size), full=args.full)
+    finally:
+        pool.close()
+    print(f"갱신된 파티션: {', '.join(updated) if updated else '없음'}")
+    print(f"워터마크: {snapshot.state()['watermark']}")
+
+
+if __name__ == "__main__":
+    main()
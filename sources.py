@@ -0,0 +1,41 @@
+# 명령줄 작업(롤업, 격자 인덱스 등)에서 쓰는 원본 데이터 소스
+# CSV 내보내기 파일, 로컬 스냅샷, MySQL 중 하나를 load(start, end, columns) 로드 함수와 월 목록으로 열어준다
+from contextlib import contextmanager
+
+import aggregations
+import db
+import ingest
+import queries
+import snapshot
+
+
+# 명령줄 작업 공통 옵션
+def add_source_arguments(parser):
+    parser.add_argument("--csv", help="CSV 내보내기 파일을 원본으로 사용")
+    parser.add_argument("--refresh", action="store_true", help="로컬 스냅샷을 먼저 갱신 ([data] source = snapshot 일 때)")
+
+
+# (load, months) 를 돌려준다. DB 연결이 필요하면 with 블록이 끝날 때 풀을 닫는다
+# columns: CSV 를 청크 모드로 읽을 때 남길 컬럼 (None 이면 대시보드에서 쓰는 컬럼)
+@contextmanager
+def open_loader(settings, csv_path=None, refresh=False, columns=None):
+    pool = None
+    batch_size = settings["database"].getint("fetch_batch_size")
+    try:
+        if csv_path:
+            load = aggregations.frame_loader(ingest.load_export(csv_path, settings["ingest"], columns or ingest.USE_COLUMNS))
+            months = aggregations.month_list(load)
+        elif settings["data"]["source"] == "snapshot":
+            local_snapshot = snapshot.open_snapshot(settings["snapshot"])
+            if refresh:
+                pool = db.create_pool(settings["database"])
+                local_snapshot.refresh(lambda query, params: db.fetch_frame(pool, query, params, batch_size))
+            load, months = local_snapshot.load, local_snapshot.months()
+        else:
+            pool = db.create_pool(settings["database"])
+            fetch = lambda query, params: db.fetch_frame(pool, query, params, batch_size)
+            load, months = queries.loader(fetch), queries.month_list(fetch)
+        yield load, months
+    finally:
+        if pool is not None:
+            pool.close()
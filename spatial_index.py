@@ -0,0 +1,182 @@
+# 출발지 수요 격자 인덱스 (여러 해상도의 사각 격자 피라미드)
+# 월별로 (승차 시각의 시, 레벨, 격자 x, 격자 y) 별 운행 건수를 미리 계산해 둔다
+# 지도/히트맵은 원본 운행 대신 화면 범위(bbox)와 줌에 맞는 레벨의 격자만 읽는다
+#
+# 저장 형식: [grid] path 아래 월별 Parquet (month=YYYY-MM.parquet)
+#   hour(int8), level(int8), ix(int32), iy(int32), count(int32)
+#   격자 (ix, iy) 는 경도/위도를 레벨의 격자 크기(도)로 나눈 내림값
+#
+# 사용법: python spatial_index.py              # 새 월만 추가/갱신
+#         python spatial_index.py --csv 파일   # CSV 내보내기 파일로 생성
+#         python spatial_index.py --full       # 처음부터 다시 생성
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import instrument
+import queries
+
+X_COLUMN = "출발지_X좌표_수정"
+Y_COLUMN = "출발지_Y좌표_수정"
+
+# 레벨별 격자 크기(도), 0 이 가장 거칠다 (대전 위도에서 0.01도 ≈ 경도 0.9km, 위도 1.1km)
+CELL_SIZES = [0.04, 0.02, 0.01, 0.005, 0.0025]
+
+STATE_FILE = "_state.json"
+
+
+# 줌 레벨에서 격자 하나가 대략 32px 이 되는 레벨
+def level_for_zoom(zoom):
+    # 줌 z 에서 256px 타일 하나의 경도 폭은 360 / 2^z 도
+    target = 360 / 2 ** zoom / 8
+    return int(np.argmin(np.abs(np.log(np.array(CELL_SIZES) / target))))
+
+
+# 한 달 치 좌표를 모든 레벨의 격자 건수로 집계
+def build_month(df):
+    df = df.dropna(subset=["승차일시", X_COLUMN, Y_COLUMN])
+    x = df[X_COLUMN].to_numpy(dtype=np.float64)
+    y = df[Y_COLUMN].to_numpy(dtype=np.float64)
+    hour = df["승차일시"].dt.hour.to_numpy(dtype=np.int64)
+
+    tables = []
+    for level, size in enumerate(CELL_SIZES):
+        ix = np.floor(x / size).astype(np.int64)
+        iy = np.floor(y / size).astype(np.int64)
+        # (hour, ix, iy) 를 정수 하나로 묶어서 np.unique 로 한 번에 센다
+        ix0, iy0 = ix.min(initial=0), iy.min(initial=0)
+        width, height = ix.max(initial=0) - ix0 + 1, iy.max(initial=0) - iy0 + 1
+        keys = (hour * width + (ix - ix0)) * height + (iy - iy0)
+        unique, counts = np.unique(keys, return_counts=True)
+        tables.append(pd.DataFrame({
+            "hour": (unique // (width * height)).astype(np.int8),
+            "level": np.full(len(unique), level, dtype=np.int8),
+            "ix": (unique // height % width + ix0).astype(np.int32),
+            "iy": (unique % height + iy0).astype(np.int32),
+            "count": counts.astype(np.int32),
+        }))
+    return pd.concat(tables, ignore_index=True)
+
+
+class GridIndex:
+    def __init__(self, path):
+        self.path = path
+
+    def _month_path(self, month):
+        return os.path.join(self.path, f"month={month}.parquet")
+
+    # 월 파티션 파일 (월마다 다시 쓴 경우에만 바뀐다, 지도 캐시 버전에 쓴다)
+    def month_path(self, month):
+        return self._month_path(month)
+
+    def state(self):
+        state_path = os.path.join(self.path, STATE_FILE)
+        if not os.path.exists(state_path):
+            return {"watermark": None, "months": []}
+        with open(state_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def _write_state(self, state):
+        state_path = os.path.join(self.path, STATE_FILE)
+        with open(state_path + ".tmp", "w", encoding="utf-8") as file:
+            json.dump(state, file, ensure_ascii=False, indent=2)
+        os.replace(state_path + ".tmp", state_path)
+
+    def months(self):
+        return self.state()["months"]
+
+    # 워터마크가 속한 월부터 다시 집계 (새 월이 들어오면 그 월만 추가된다)
+    def update(self, load, months, full=False):
+        os.makedirs(self.path, exist_ok=True)
+        state = {"watermark": None, "months": []} if full else self.state()
+        watermark = state["watermark"]
+        first_month = pd.Timestamp(watermark).strftime("%Y-%m") if watermark else None
+
+        updated = []
+        for month in months:
+            if first_month is not None and month < first_month:
+                continue
+            start, end = queries.month_range(month)
+            df = load(start, end, columns=["승차일시", X_COLUMN, Y_COLUMN])
+            df = df[(df["승차일시"] >= start) & (df["승차일시"] < end)]
+            if df.empty:
+                continue
+            table = build_month(df)
+            path = self._month_path(month)
+            table.to_parquet(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+
+            latest = df["승차일시"].max()
+            if state["watermark"] is None or latest > pd.Timestamp(state["watermark"]):
+                state["watermark"] = latest.isoformat()
+            state["months"] = sorted(set(state["months"]) | {month})
+            self._write_state(state)
+            updated.append(month)
+        return updated
+
+    # 월(들)과 시간대, 화면 범위(bbox = (서, 남, 동, 북))에 해당하는 격자 건수
+    # max_cells 를 넘으면 한 단계씩 거친 레벨로 올려서 돌려주는 격자 수를 제한한다
+    @instrument.timed("grid_index.query")
+    def query(self, months, zoom=11, bbox=None, hours=None, max_cells=2000):
+        level = level_for_zoom(zoom)
+        while True:
+            cells = self._read_level(months, level, bbox, hours)
+            if len(cells) <= max_cells or level == 0:
+                return cells
+            level -= 1
+
+    def _read_level(self, months, level, bbox, hours):
+        size = CELL_SIZES[level]
+        filters = [("level", "==", level)]
+        if hours is not None:
+            filters.append(("hour", "in", list(hours)))
+        if bbox is not None:
+            west, south, east, north = bbox
+            filters += [
+                ("ix", ">=", int(np.floor(west / size))), ("ix", "<=", int(np.floor(east / size))),
+                ("iy", ">=", int(np.floor(south / size))), ("iy", "<=", int(np.floor(north / size))),
+            ]
+        frames = [
+            pd.read_parquet(self._month_path(month), columns=["ix", "iy", "count"], filters=filters)
+            for month in months if os.path.exists(self._month_path(month))
+        ]
+        if not frames:
+            return pd.DataFrame(columns=["level", "lon", "lat", "size", "count"])
+        cells = pd.concat(frames, ignore_index=True).groupby(["ix", "iy"], as_index=False)["count"].sum()
+        return pd.DataFrame({
+            "level": level,
+            # 격자 중심 좌표
+            "lon": (cells["ix"] + 0.5) * size,
+            "lat": (cells["iy"] + 0.5) * size,
+            "size": size,
+            "count": cells["count"].astype(np.int64),
+        })
+
+
+# config 의 [grid] 섹션으로 인덱스 생성
+def open_index(settings):
+    return GridIndex(settings.get("path"))
+
+
+def main():
+    import config
+    import sources
+
+    parser = argparse.ArgumentParser(description="출발지 수요 격자 인덱스 증분 갱신")
+    sources.add_source_arguments(parser)
+    parser.add_argument("--full", action="store_true", help="처음부터 다시 생성")
+    args = parser.parse_args()
+
+    settings = config.load_config()
+    index = open_index(settings["grid"])
+    with sources.open_loader(settings, args.csv, args.refresh) as (load, months):
+        updated = index.update(load, months, full=args.full)
+    print(f"갱신한 월: {', '.join(updated) if updated else '없음'}")
+    print(f"워터마크: {index.state()['watermark']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# 벤치마크용 합성 운행 데이터 생성
+# 운행 테이블(A27P1Y_00_A27_02_전처리데이터_행정동수정_좌표기반_G1)에서 대시보드가 쓰는 컬럼과 같은 모양의 행을 만든다
+#   승차일시 : 평일/주말, 시간대별 이용 비율을 반영 (출퇴근·병원 시간대에 많음)
+#   예약시간 : 승차 5분~2일 전 (로그정규분포), 일부는 결측
+#   출발지   : 대전 5개 구 주요 읍면동 중심 좌표 주변, 일부는 좌표 결측
+#   회원ID/기사ID : 행 수에 비례하는 고유 수, 일부 회원이 자주 이용하도록 치우친 분포
+#   도착지   : 병원이 많은 읍면동(둔산동, 대흥동 등)으로 몰리고 일부는 같은 읍면동 안에서 이동 (OD 행렬용)
+#
+# 사용법: python synthetic.py --rows 1000000 --out bench/rides_1000000.csv
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# (시군구, 읍면동, 위도, 경도, 비중)
+DONGS = [
+    ("동구", "가양동", 36.3380, 127.4520, 3), ("동구", "용전동", 36.3570, 127.4370, 3),
+    ("동구", "판암동", 36.3180, 127.4580, 2), ("동구", "대동", 36.3290, 127.4410, 2),
+    ("중구", "은행동", 36.3290, 127.4270, 2), ("중구", "대흥동", 36.3250, 127.4220, 2),
+    ("중구", "태평동", 36.3210, 127.3960, 3), ("중구", "문화동", 36.3160, 127.4080, 3),
+    ("서구", "둔산동", 36.3510, 127.3850, 5), ("서구", "갈마동", 36.3490, 127.3720, 4),
+    ("서구", "월평동", 36.3560, 127.3640, 4), ("서구", "관저동", 36.3000, 127.3380, 4),
+    ("서구", "도마동", 36.3150, 127.3770, 3), ("유성구", "봉명동", 36.3550, 127.3430, 3),
+    ("유성구", "노은동", 36.3720, 127.3190, 4), ("유성구", "전민동", 36.3990, 127.4030, 2),
+    ("유성구", "온천동", 36.3580, 127.3500, 3), ("유성구", "관평동", 36.4250, 127.3940, 2),
+    ("대덕구", "송촌동", 36.3640, 127.4430, 3), ("대덕구", "법동", 36.3720, 127.4300, 2),
+    ("대덕구", "신탄진동", 36.4510, 127.4310, 2), ("대덕구", "오정동", 36.3570, 127.4140, 2),
+]
+
+# 시간대(0~23시)별 승차 비중
+HOUR_WEIGHTS = np.array([
+    1, 0.5, 0.3, 0.3, 0.5, 2, 5, 9, 12, 13, 12, 10,
+    8, 10, 11, 11, 10, 9, 7, 5, 4, 3, 2, 1.5,
+])
+
+# 월~일 요일별 비중
+WEEKDAY_WEIGHTS = np.array([1.0, 1.0, 1.0, 1.0, 1.0, 0.6, 0.5])
+
+# 도착지 읍면동별 비중 (DONGS 순서, 병원·복지관이 있는 읍면동에 몰린다)
+DESTINATION_WEIGHTS = np.array([2, 2, 1, 1, 3, 5, 2, 4, 8, 3, 3, 2, 2, 4, 2, 1, 3, 1, 3, 2, 1, 2], dtype=np.float64)
+
+# 같은 읍면동 안에서 이동하는 비율
+LOCAL_TRIPS = 0.15
+
+MISSING_COORDS = 0.02
+MISSING_BOOKING = 0.03
+
+
+# 회원 rank 별 이용 비중 (소수 회원이 많이 이용)
+def _skewed(count, exponent=0.4):
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+# rows 행 생성 (같은 seed 면 같은 결과)
+def generate(rows, start="2024-01-01", months=12, seed=0, users=None, drivers=None):
+    rng = np.random.default_rng(seed)
+    users = users or max(100, rows // 20)
+    drivers = drivers or max(20, min(800, rows // 2000))
+
+    days = pd.date_range(start, pd.Timestamp(start) + pd.DateOffset(months=months), freq="D", inclusive="left")
+    day_weights = WEEKDAY_WEIGHTS[days.dayofweek]
+    day = rng.choice(len(days), rows, p=day_weights / day_weights.sum())
+    hour = rng.choice(24, rows, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    seconds = hour * 3600 + rng.integers(0, 3600, rows)
+    boarded = days.values[day] + seconds.astype("timedelta64[s]")
+
+    lead_minutes = np.clip(rng.lognormal(np.log(60), 1.0, rows), 5, 2880).astype(np.int64)
+    booked = boarded - lead_minutes.astype("timedelta64[m]")
+    booked = np.where(rng.random(rows) < MISSING_BOOKING, np.datetime64("NaT"), booked)
+
+    dong_weights = np.array([d[4] for d in DONGS], dtype=np.float64)
+    dong = rng.choice(len(DONGS), rows, p=dong_weights / dong_weights.sum())
+    lat = np.array([d[2] for d in DONGS])[dong] + rng.normal(0, 0.006, rows)
+    lon = np.array([d[3] for d in DONGS])[dong] + rng.normal(0, 0.007, rows)
+    missing = rng.random(rows) < MISSING_COORDS
+    lat[missing] = np.nan
+    lon[missing] = np.nan
+
+    # 회원 번호는 섞어서 자주 이용하는 회원이 앞 번호에 몰리지 않게 한다
+    member = rng.permutation(users)[rng.choice(users, rows, p=_skewed(users))] + 100000
+    driver = rng.integers(0, drivers, rows) + 1000
+
+    # 도착지는 다른 컬럼을 만든 뒤에 뽑아서 같은 seed 의 기존 컬럼 값은 그대로 둔다
+    destination = rng.choice(len(DONGS), rows, p=DESTINATION_WEIGHTS / DESTINATION_WEIGHTS.sum())
+    destination = np.where(rng.random(rows) < LOCAL_TRIPS, dong, destination)
+    destination_lat = np.array([d[2] for d in DONGS])[destination] + rng.normal(0, 0.006, rows)
+    destination_lon = np.array([d[3] for d in DONGS])[destination] + rng.normal(0, 0.007, rows)
+    missing = rng.random(rows) < MISSING_COORDS
+    destination_lat[missing] = np.nan
+    destination_lon[missing] = np.nan
+
+    frame = pd.DataFrame({
+        "승차일시": boarded,
+        "예약시간": booked,
+        "회원ID": member,
+        "기사ID": driver,
+        "출발지_시군구": np.array([d[0] for d in DONGS])[dong],
+        "출발지_읍면동": np.array([d[1] for d in DONGS])[dong],
+        "출발지_X좌표_수정": lon.round(7),
+        "출발지_Y좌표_수정": lat.round(7),
+        "도착지_시군구": np.array([d[0] for d in DONGS])[destination],
+        "도착지_읍면동": np.array([d[1] for d in DONGS])[destination],
+        "도착지_X좌표_수정": destination_lon.round(7),
+        "도착지_Y좌표_수정": destination_lat.round(7),
+    })
+    return frame.sort_values("승차일시", kind="stable").reset_index(drop=True)
+
+
+# rows 행을 chunk_rows 씩 나눠 만들어 CSV(CP949)로 저장 (1천만 행도 메모리에 한 번에 올리지 않는다)
+# 청크마다 같은 기간 전체에 흩어지므로 파일 전체는 승차일시 순서가 아니다 (원본 내보내기 파일과 같다)
+def write_csv(path, rows, chunk_rows=1_000_000, encoding="CP949", seed=0, **options):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    users = options.pop("users", None) or max(100, rows // 20)
+    drivers = options.pop("drivers", None) or max(20, min(800, rows // 2000))
+    tmp_path = path + ".tmp"
+    written = 0
+    for index, first in enumerate(range(0, rows, chunk_rows)):
+        count = min(chunk_rows, rows - first)
+        chunk = generate(count, seed=seed + index, users=users, drivers=drivers, **options)
+        chunk.to_csv(tmp_path, mode="w" if index == 0 else "a", header=index == 0,
+                     index=False, encoding=encoding, date_format="%Y-%m-%d %H:%M:%S")
+        written += count
+    os.replace(tmp_path, path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="벤치마크용 합성 운행 데이터 CSV 생성")
+    parser.add_argument("--rows", type=int, default=100_000, help="행 수")
+    parser.add_argument("--out", help="저장할 CSV 파일 (기본값: bench/rides_<행 수>.csv)")
+    parser.add_argument("--start", default="2024-01-01", help="시작 일자")
+    parser.add_argument("--months", type=int, default=12, help="기간(개월)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    path = args.out or os.path.join("bench", f"rides_{args.rows}.csv")
+    written = write_csv(path, args.rows, start=args.start, months=args.months, seed=args.seed)
+    print(f"{path}: {written:,}행")
+
+
+if __name__ == "__main__":
+    main()
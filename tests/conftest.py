@@ -0,0 +1,5 @@
+# 테스트에서 저장소 루트의 모듈(utilization, olap, db ...)을 바로 import 할 수 있도록
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
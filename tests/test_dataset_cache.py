@@ -0,0 +1,37 @@
+import os
+
+import pandas as pd
+
+import dataset_cache
+
+
+def test_peek_does_not_load_or_count(tmp_path):
+    path = tmp_path / "rides.csv"
+    path.write_text("a\n1\n")
+    cache = dataset_cache.DatasetCache()
+    loads = []
+
+    def loader(file_path):
+        loads.append(file_path)
+        return pd.read_csv(file_path)
+
+    assert cache.peek(str(path)) is None
+    frame = cache.get(str(path), loader)
+    assert cache.peek(str(path)) is frame
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (0, 1)
+
+    # 파일이 바뀌면 예전 항목을 돌려주지 않고, 다시 읽지도 않는다
+    path.write_text("a\n1\n2\n")
+    os.utime(path, ns=(1, 1))
+    assert cache.peek(str(path)) is None
+    assert cache.peek(str(tmp_path / "missing.csv")) is None
+    assert len(loads) == 1
+
+
+def test_peek_ignores_expired_entry(tmp_path):
+    path = tmp_path / "rides.csv"
+    path.write_text("a\n1\n")
+    cache = dataset_cache.DatasetCache(ttl=1e-9)
+    cache.get(str(path), pd.read_csv)
+    assert cache.peek(str(path)) is None
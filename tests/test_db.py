@@ -0,0 +1,211 @@
+import threading
+
+import pytest
+from mysql.connector import Error, FieldType
+from mysql.connector.errors import PoolError
+
+import db
+
+
+class FakeCursor:
+    def __init__(self, connection, rows):
+        self.connection = connection
+        self.rows = list(rows)
+        self.description = [("id", FieldType.LONG, None, None, None, None, 1, 0)]
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.connection.queries.append(query)
+        if self.connection.error is not None:
+            raise self.connection.error
+
+    def fetchmany(self, size):
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+    def fetchall(self):
+        return self.fetchmany(len(self.rows))
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, number, rows):
+        self.number = number
+        self.rows = rows
+        self.alive = True
+        self.closed = False
+        self.queries = []
+        # execute 에서 올릴 예외
+        self.error = None
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise Error("MySQL server has gone away")
+
+    def is_connected(self):
+        return self.alive and not self.closed
+
+    def cursor(self, dictionary=False, buffered=None):
+        return FakeCursor(self, self.rows)
+
+    def close(self):
+        self.closed = True
+
+
+# 만든 연결을 차례로 기록하는 연결 생성 함수
+class FakeConnect:
+    def __init__(self, rows=()):
+        self.rows = [(value,) for value in rows]
+        self.connections = []
+
+    def __call__(self, **connect_args):
+        connection = FakeConnection(len(self.connections), self.rows)
+        self.connections.append(connection)
+        return connection
+
+
+def _pool(size=2, timeout=1, health_check_interval=30, rows=()):
+    connect = FakeConnect(rows)
+    return db.ConnectionPool(size=size, timeout=timeout, health_check_interval=health_check_interval,
+                             connect=connect), connect
+
+
+def test_most_recently_released_connection_is_reused_first():
+    pool, connect = _pool(size=3)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert pool.acquire() is second
+    assert pool.acquire() is first
+    assert len(connect.connections) == 2
+
+
+def test_exhausted_pool_times_out():
+    pool, _ = _pool(size=1, timeout=0.05)
+    pool.acquire()
+    with pytest.raises(PoolError):
+        pool.acquire()
+    stats = pool.stats()
+    assert stats["timeouts"] == 1
+    assert stats["open"] == 1
+    assert stats["checkouts"] == 1
+
+
+def test_waits_for_released_connection():
+    pool, _ = _pool(size=1, timeout=5)
+    connection = pool.acquire()
+    timer = threading.Timer(0.05, pool.release, args=(connection,))
+    timer.start()
+    assert pool.acquire() is connection
+    timer.join()
+    stats = pool.stats()
+    assert stats["waits"] == 1
+    assert stats["wait_time_max"] > 0
+
+
+def test_stale_connection_is_replaced_after_failed_ping():
+    pool, _ = _pool(size=1, health_check_interval=0)
+    stale = pool.acquire()
+    pool.release(stale)
+    stale.alive = False
+    fresh = pool.acquire()
+    assert fresh is not stale
+    assert stale.closed
+    stats = pool.stats()
+    assert stats["reconnects"] == 1
+    assert stats["created"] == 2
+    assert stats["open"] == 1
+
+
+def test_healthy_idle_connection_is_kept():
+    pool, _ = _pool(size=1, health_check_interval=0)
+    connection = pool.acquire()
+    pool.release(connection)
+    assert pool.acquire() is connection
+    assert pool.stats()["reconnects"] == 0
+
+
+def test_iter_batches_returns_connection_after_reading_everything():
+    pool, connect = _pool(rows=range(5))
+    batches = list(db.iter_batches(pool, "SELECT id FROM rides", batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0]["id"].dtype == "int64"
+    stats = pool.stats()
+    assert stats["idle"] == 1
+    assert stats["discarded"] == 0
+    assert not connect.connections[0].closed
+
+
+def test_iter_batches_discards_connection_when_stopped_early():
+    pool, connect = _pool(rows=range(5))
+    batches = db.iter_batches(pool, "SELECT id FROM rides", batch_size=2)
+    next(batches)
+    batches.close()
+    stats = pool.stats()
+    assert connect.connections[0].closed
+    assert stats["discarded"] == 1
+    assert stats["open"] == 0
+    assert stats["idle"] == 0
+    # 버린 연결 대신 새 연결을 만든다
+    assert pool.acquire() is connect.connections[1]
+
+
+def test_iter_batches_keeps_healthy_connection_after_query_error():
+    pool, _ = _pool(rows=range(5))
+    connection = pool.acquire()
+    connection.error = Error("You have an error in your SQL syntax")
+    pool.release(connection)
+    with pytest.raises(Error):
+        list(db.iter_batches(pool, "SELECT id FROM", batch_size=2))
+    stats = pool.stats()
+    assert not connection.closed
+    assert stats["discarded"] == 0
+    assert stats["idle"] == 1
+    assert pool.acquire() is connection
+
+
+def test_iter_batches_discards_connection_lost_during_query():
+    pool, _ = _pool(rows=range(5))
+    connection = pool.acquire()
+    connection.error = Error("Lost connection to MySQL server during query")
+    connection.alive = False
+    pool.release(connection)
+    with pytest.raises(Error):
+        list(db.iter_batches(pool, "SELECT id FROM rides", batch_size=2))
+    stats = pool.stats()
+    assert connection.closed
+    assert stats["discarded"] == 1
+    assert stats["open"] == 0
+
+
+def test_stats_counters():
+    pool, connect = _pool(size=2)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    stats = pool.stats()
+    assert stats["size"] == 2
+    assert stats["created"] == 2
+    assert stats["checkouts"] == 2
+    assert stats["open"] == 2
+    assert stats["idle"] == 1
+    assert stats["in_use"] == 1
+    assert stats["waits"] == 0
+    assert stats["wait_time_avg"] == stats["wait_time_total"] / 2
+
+    pool.release(second, discard=True)
+    pool.close()
+    stats = pool.stats()
+    assert stats["discarded"] == 1
+    assert stats["open"] == 0
+    assert all(connection.closed for connection in connect.connections)
+    with pytest.raises(PoolError):
+        pool.acquire()
+
+
+def test_fetch_frame_concatenates_batches():
+    pool, _ = _pool(rows=range(5))
+    frame = db.fetch_frame(pool, "SELECT id FROM rides", batch_size=2)
+    assert frame["id"].tolist() == [0, 1, 2, 3, 4]
+    assert pool.stats()["in_use"] == 0
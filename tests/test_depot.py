@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import depot
+
+
+# 두 동네에 모인 수요 지점 (격자, 지점마다 가중치가 다르다)
+def _demand():
+    rows = []
+    for x0, y0 in [(127.30, 36.30), (127.50, 36.40)]:
+        for i in range(5):
+            for j in range(5):
+                rows.append({"x": x0 + 0.002 * i, "y": y0 + 0.002 * j, "weight": 1 + i + 2 * j, "label": f"{x0}-{i}-{j}"})
+    return pd.DataFrame(rows)
+
+
+# k-means++ 대신 고정된 초기 중심 (두 동네의 첫 지점, extra 면 수요가 전혀 없는 먼 곳 하나를 더한다)
+def _fixed_centers(extra):
+    def initial(points, weights, k, rng):
+        centers = [points[0], points[25]]
+        if extra:
+            centers.append(points.min(axis=0) - 1000.0)
+        return np.array(centers)
+    return initial
+
+
+@pytest.mark.parametrize("method", ["kmeans", "pmedian"])
+def test_empty_cluster_is_reseeded(monkeypatch, method):
+    demand = _demand()
+    monkeypatch.setattr(depot, "_initial_centers", _fixed_centers(extra=False))
+    two = depot.solve(demand, 2, method=method)
+
+    # 세 번째 중심은 처음부터 배정된 수요가 없다
+    monkeypatch.setattr(depot, "_initial_centers", _fixed_centers(extra=True))
+    three = depot.solve(demand, 3, method=method)
+    assert len(three["depots"]) == 3
+    assert all(d["demand"] > 0 for d in three["depots"])
+    assert sum(d["demand"] for d in three["depots"]) == demand["weight"].sum()
+    # 옮긴 차고지가 수요를 나눠 받으므로 차고지 두 개일 때보다 거리 합이 늘지 않는다
+    assert three["objective_km"] <= two["objective_km"]
+
+    # 고정된 초기 중심이면 결과도 같다
+    again = depot.solve(demand, 3, method=method)
+    assert again["objective_km"] == three["objective_km"]
+    assert again["depots"] == three["depots"]
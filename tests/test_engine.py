@@ -0,0 +1,167 @@
+import threading
+import time
+
+import pytest
+
+import aggregations
+import engine
+
+
+def _engine(**options):
+    options.setdefault("workers", 2)
+    options.setdefault("prefetch_workers", 1)
+    return engine.Engine(aggregations, None, **options)
+
+
+# 미리 계산 스레드가 할 일을 모두 끝낼 때까지 기다린다
+def _drain(memo):
+    memo._prefetch_pool.shutdown(wait=True)
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("시간 안에 조건을 만족하지 않았습니다")
+        time.sleep(0.005)
+
+
+def test_hit_miss_and_prefetch_stats():
+    memo = _engine()
+    assert memo.cached("a", lambda x: x * 2, 1) == 2
+    assert memo.cached("a", lambda x: x * 2, 1) == 2
+    memo.prefetch(lambda: memo.cached("b", lambda x: x * 3, 2))
+    _drain(memo)
+    assert memo.cached("b", lambda x: x * 3, 2) == 6
+    stats = memo.stats()
+    assert (stats["hits"], stats["misses"], stats["prefetched"]) == (2, 1, 1)
+    assert stats["entries"] == 2
+    assert stats["hit_rate"] == 2 / 3
+
+
+def test_version_change_recomputes():
+    version = {"value": 1}
+    memo = _engine(version=lambda: version["value"])
+    calls = []
+    compute = lambda x: calls.append(x) or len(calls)
+    assert memo.cached("a", compute, 1) == 1
+    version["value"] = 2
+    assert memo.cached("a", compute, 1) == 2
+
+
+def test_failed_compute_is_not_cached():
+    memo = _engine()
+    calls = []
+
+    def fail(x):
+        calls.append(x)
+        raise RuntimeError("db down")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            memo.cached("a", fail, 1)
+    assert len(calls) == 2
+    stats = memo.stats()
+    assert stats["entries"] == 0
+    assert stats["pending"] == 0
+
+
+def test_concurrent_same_key_computes_once():
+    memo = _engine()
+    release = threading.Event()
+    calls = []
+
+    def slow(x):
+        calls.append(x)
+        release.wait(5)
+        return x + 1
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(memo.cached("a", slow, 1))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    _wait_until(lambda: memo.stats()["waits"] == 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert calls == [1]
+    assert results == [2] * 5
+
+
+def test_prefetch_skips_key_already_being_computed():
+    memo = _engine()
+    release = threading.Event()
+    user = threading.Thread(target=lambda: memo.cached("a", lambda x: release.wait(5) and x, 1))
+    user.start()
+    _wait_until(lambda: memo.stats()["pending"] == 1)
+    prefetched = []
+    memo.prefetch(lambda: memo.cached("a", lambda x: prefetched.append(x), 1))
+    _drain(memo)
+    release.set()
+    user.join(5)
+    assert prefetched == []
+    assert memo.cached("a", lambda x: None, 1) == 1
+
+
+# 미리 계산하는 복합 집계(월별 합계처럼 다른 집계를 조회해서 만드는 값)가 사용자 요청이 계산 중인 집계를 만나면
+# None 을 받지 않고 끝까지 기다려야 하고, 같은 복합 집계를 기다리던 사용자 요청은 올바른 결과를 받아야 한다
+def test_prefetched_composite_waits_for_nested_key():
+    memo = _engine()
+    release = threading.Event()
+    entered = threading.Event()
+    results = {}
+
+    def part(x):
+        release.wait(5)
+        return {"rides": x}
+
+    def total(x):
+        entered.set()
+        return memo.cached("part", part, x)["rides"] * 10
+
+    user_part = threading.Thread(target=lambda: results.setdefault("part", memo.cached("part", part, 1)))
+    user_part.start()
+    _wait_until(lambda: memo.stats()["pending"] == 1)
+    memo.prefetch(lambda: memo.cached("total", total, 1))
+    assert entered.wait(5)
+    user_total = threading.Thread(target=lambda: results.setdefault("total", memo.cached("total", total, 1)))
+    user_total.start()
+    _wait_until(lambda: memo.stats()["waits"] == 1)
+    release.set()
+    user_part.join(5)
+    user_total.join(5)
+    _drain(memo)
+    assert results == {"part": {"rides": 1}, "total": 10}
+    assert memo.stats()["prefetched"] == 1
+
+
+def test_prefetch_failure_is_recomputed_by_waiter():
+    memo = _engine()
+    release = threading.Event()
+    entered = threading.Event()
+    calls = []
+
+    def flaky(x):
+        calls.append(x)
+        if len(calls) == 1:
+            entered.set()
+            release.wait(5)
+            raise RuntimeError("prefetch failed")
+        return x * 2
+
+    memo.prefetch(lambda: memo.cached("a", flaky, 4))
+    assert entered.wait(5)
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(memo.cached("a", flaky, 4)))
+    waiter.start()
+    _wait_until(lambda: memo.stats()["waits"] == 1)
+    release.set()
+    waiter.join(5)
+    _drain(memo)
+    assert results == [8]
+    assert len(calls) == 2
+
+
+def test_gather_returns_results_in_order():
+    memo = _engine()
+    assert memo.gather(lambda: memo.cached("a", lambda: 1), lambda: 2, lambda: 3) == [1, 2, 3]
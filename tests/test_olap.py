@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip("duckdb")
+
+import aggregations
+import olap
+import queries
+import synthetic
+
+MONTHS = ["2024-01", "2024-02", "2024-03"]
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return aggregations.add_derived_columns(synthetic.generate(20_000, start="2024-01-01", months=3, seed=1))
+
+
+@pytest.fixture(scope="module")
+def sources(frame):
+    return aggregations.frame_loader(frame), olap.frame_source(lambda: frame, threads=2)
+
+
+@pytest.fixture(scope="module")
+def results(sources):
+    load, source = sources
+    return olap.compare(load, source, MONTHS)
+
+
+def test_compare_covers_every_query(results):
+    names = {name for name, *_ in results}
+    assert {"month_list", "date_hour_counts", "daily_summary", "monthly_summary", "distinct_counts",
+            "hourly_counts", "map_points", "trip_times(당일)"} <= names
+    assert {month for _, month, *_ in results} == {"-", *MONTHS}
+
+
+@pytest.mark.parametrize("month", ["-", *MONTHS])
+def test_duckdb_matches_pandas(results, month):
+    different = [name for name, result_month, same, *_ in results if result_month == month and not same]
+    assert different == []
+
+
+def test_partial_range_matches_pandas(sources):
+    load, source = sources
+    # 월 경계에 걸친 구간 (1/10 ~ 2/20)
+    start, end = queries.day_range(date(2024, 1, 10), date(2024, 2, 20))
+    for function, args in [
+        ("daily_summary", (start, end)),
+        ("daily_summary", (start, end, True)),
+        ("distinct_counts", (start, end)),
+        ("hourly_counts", (start, end)),
+        ("date_hour_counts", (start, end)),
+        ("top_locations", ("출발지_읍면동", start, end, 5)),
+        ("trip_times", (start, end)),
+    ]:
+        expected = getattr(aggregations, function)(load, *args)
+        actual = getattr(olap, function)(source, *args)
+        assert olap._same(expected, actual), function
+
+
+def test_empty_range_matches_pandas(sources):
+    load, source = sources
+    start, end = queries.month_range("2025-06")
+    assert olap._same(aggregations.daily_summary(load, start, end), olap.daily_summary(source, start, end))
+    assert olap._same(aggregations.distinct_counts(load, start, end), olap.distinct_counts(source, start, end))
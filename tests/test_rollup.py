@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+import aggregations
+import engine
+import rollup
+import synthetic
+
+MONTHS = ["2024-01", "2024-02", "2024-03"]
+
+
+@pytest.fixture
+def frame():
+    return aggregations.add_derived_columns(synthetic.generate(6_000, start="2024-01-01", months=3, seed=4))
+
+
+# load 를 감싸서 읽은 월을 기록한다
+def _recording(load, loaded):
+    def recorded(start, end, columns=None):
+        loaded.append(pd.Timestamp(start).strftime("%Y-%m"))
+        return load(start, end, columns)
+    return recorded
+
+
+def _tables(store):
+    return {name: store.read(name) for name in rollup.TABLE_KEYS}
+
+
+def _assert_same_tables(actual, expected):
+    for name in rollup.TABLE_KEYS:
+        pd.testing.assert_frame_equal(actual[name], expected[name], check_dtype=False, obj=name)
+
+
+def test_update_recomputes_only_watermark_month(frame, tmp_path):
+    store = rollup.RollupStore(str(tmp_path / "incremental"))
+    # 3월 중순까지만 있을 때 한 번 롤업하고 나머지가 들어온 뒤 다시 롤업
+    cutoff = pd.Timestamp("2024-03-15")
+    loaded = []
+    rollup.update(store, _recording(aggregations.frame_loader(frame[frame["승차일시"] < cutoff]), loaded), MONTHS)
+    assert loaded == MONTHS
+    assert pd.Timestamp(store.state()["watermark"]) < cutoff
+
+    loaded.clear()
+    assert rollup.update(store, _recording(aggregations.frame_loader(frame), loaded), MONTHS) == ["2024-03"]
+    assert loaded == ["2024-03"]
+
+    full = rollup.RollupStore(str(tmp_path / "full"))
+    rollup.update(full, aggregations.frame_loader(frame), MONTHS, full=True)
+    _assert_same_tables(_tables(store), _tables(full))
+    assert store.state() == full.state()
+
+
+def test_update_rerun_is_idempotent(frame, tmp_path):
+    store = rollup.RollupStore(str(tmp_path))
+    load = aggregations.frame_loader(frame)
+    rollup.update(store, load, MONTHS)
+    before, state = _tables(store), store.state()
+
+    loaded = []
+    rollup.update(store, _recording(load, loaded), MONTHS)
+    assert loaded == ["2024-03"]
+    _assert_same_tables(_tables(store), before)
+    assert store.state() == state
+
+
+def test_engine_falls_back_until_rollup_exists(frame, tmp_path):
+    store = rollup.RollupStore(str(tmp_path))
+    load = aggregations.frame_loader(frame)
+    summaries = engine.Engine(aggregations, load, rollup, store, version=lambda: store.state()["watermark"],
+                              workers=1, prefetch_workers=1, summary_ready=store.exists)
+    expected = aggregations.daily_summary(load)
+
+    # 롤업을 아직 만들지 않았으면 원본에서 집계한다
+    assert summaries.summary_missing()
+    pd.testing.assert_frame_equal(summaries.daily_summary(), expected)
+    assert summaries.distinct_counts() == aggregations.distinct_counts(load)
+
+    # 만들고 나면 버전이 바뀌어 롤업을 읽는다
+    rollup.update(store, load, MONTHS)
+    assert not summaries.summary_missing()
+    pd.testing.assert_frame_equal(summaries.daily_summary(), rollup.daily_summary(store))
+    pd.testing.assert_frame_equal(summaries.daily_summary(), expected, check_dtype=False)
+    assert summaries.distinct_counts() == rollup.distinct_counts(store)
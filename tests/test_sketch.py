@@ -0,0 +1,76 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import aggregations
+import queries
+import rollup
+import sketch
+import synthetic
+
+MONTHS = ["2024-01", "2024-02", "2024-03"]
+
+# 상대 오차 약 1.04 / sqrt(2^precision) 의 3배
+TOLERANCE = 3 * 1.04 / np.sqrt(1 << sketch.PRECISION)
+
+
+def _close(estimated, exact):
+    return abs(estimated - exact) <= TOLERANCE * exact
+
+
+@pytest.fixture(scope="module")
+def frame():
+    return aggregations.add_derived_columns(synthetic.generate(60_000, start="2024-01-01", months=3, seed=3))
+
+
+@pytest.fixture(scope="module")
+def store(frame, tmp_path_factory):
+    store = rollup.RollupStore(str(tmp_path_factory.mktemp("rollup")))
+    rollup.update(store, aggregations.frame_loader(frame), MONTHS)
+    return store
+
+
+def test_estimate_within_error():
+    values = np.arange(50_000)
+    assert _close(sketch.estimate(sketch.build(values)), len(values))
+
+
+def test_small_counts_use_linear_counting():
+    assert sketch.estimate(sketch.build([])) == 0
+    assert sketch.estimate(sketch.build([1, 2, 2, 3, None])) == 3
+
+
+def test_merge_across_months_matches_nunique(frame):
+    months = aggregations.year_month(frame["승차일시"])
+    sketches = [sketch.build(frame.loc[months == month, "회원ID"]) for month in MONTHS]
+    merged = sketch.merge(sketch.from_bytes(sketch.to_bytes(s)) for s in sketches)
+    assert _close(sketch.estimate(merged), frame["회원ID"].nunique())
+    # 합친 스케치는 전체 값으로 한 번에 만든 스케치와 같다
+    assert np.array_equal(merged, sketch.build(frame["회원ID"]))
+
+
+def test_merge_is_idempotent():
+    registers = sketch.build(np.arange(1_000))
+    assert np.array_equal(sketch.merge([registers, registers]), registers)
+    assert sketch.merge([]) is None
+
+
+def test_integer_ids_hash_the_same_with_missing_values():
+    assert np.array_equal(sketch.build([1.0, 2.0, np.nan]), sketch.build([1, 2]))
+
+
+@pytest.mark.parametrize("require_coords", [False, True])
+def test_rollup_distinct_counts_across_months(frame, store, require_coords):
+    load = aggregations.frame_loader(frame)
+    # 월 경계에 걸친 구간과 전체 기간
+    for start, end in [queries.day_range(date(2024, 1, 10), date(2024, 2, 20)), (None, None)]:
+        estimated = rollup.distinct_counts(store, start, end, require_coords)
+        exact = aggregations.distinct_counts(load, start, end, require_coords)
+        assert _close(estimated["users"], exact["users"]), (start, end)
+        assert _close(estimated["drivers"], exact["drivers"]), (start, end)
+
+
+def test_rollup_sketch_needs_whole_days(store):
+    with pytest.raises(ValueError):
+        rollup.distinct_counts(store, "2024-01-10 12:00", "2024-01-11")
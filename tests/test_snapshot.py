@@ -0,0 +1,103 @@
+import pandas as pd
+import pytest
+from mysql.connector import Error
+
+import snapshot
+
+
+# queries 의 조회를 DataFrame 으로 흉내 내는 운행 테이블 (fail_month 의 원본 행 조회는 실패한다)
+class FakeTable:
+    def __init__(self, rows):
+        self.rows = rows
+        self.fail_month = None
+
+    def _between(self, query, params):
+        params = list(params)
+        start = params.pop(0) if "`승차일시` >= %s" in query else None
+        end = params.pop(0) if "`승차일시` < %s" in query else None
+        rows = self.rows
+        if start is not None:
+            rows = rows[rows["승차일시"] >= pd.Timestamp(start)]
+        if end is not None:
+            rows = rows[rows["승차일시"] < pd.Timestamp(end)]
+        return rows, start
+
+    def __call__(self, query, params):
+        if "EXISTS" in query:
+            months = [params[i] for i in range(0, len(params), 3)
+                      if len(self._between("`승차일시` >= %s AND `승차일시` < %s", params[i + 1:i + 3])[0])]
+            return pd.DataFrame({"year_month": months})
+        rows, start = self._between(query, params)
+        if "MIN(" in query:
+            return pd.DataFrame({"first": [rows["승차일시"].min()], "last": [rows["승차일시"].max()]})
+        if self.fail_month and start is not None and pd.Timestamp(start).strftime("%Y-%m") == self.fail_month:
+            raise Error("Lost connection to MySQL server during query")
+        return rows.reset_index(drop=True)
+
+
+def _rides(*rows):
+    return pd.DataFrame({
+        "id": [ride_id for ride_id, _ in rows],
+        "승차일시": pd.to_datetime([boarded for _, boarded in rows]),
+        "예약시간": pd.to_datetime([boarded for _, boarded in rows]) - pd.Timedelta(hours=1),
+        "회원ID": [100 + ride_id for ride_id, _ in rows],
+        "기사ID": [7] * len(rows),
+    })
+
+
+@pytest.fixture
+def table():
+    return FakeTable(_rides(
+        (1, "2024-01-05 09:00"), (2, "2024-01-20 10:00"),
+        (3, "2024-02-03 11:00"), (4, "2024-02-10 12:00"),
+    ))
+
+
+def test_first_refresh_writes_every_month(tmp_path, table):
+    local = snapshot.Snapshot(str(tmp_path), key_column="id")
+    assert local.refresh(table) == ["2024-01", "2024-02"]
+    assert local.state() == {"watermark": "2024-02-10T12:00:00", "partitions": {"2024-01": 2, "2024-02": 2}}
+    assert sorted(local.load()["id"]) == [1, 2, 3, 4]
+
+
+def test_refresh_advances_watermark_and_deduplicates(tmp_path, table):
+    local = snapshot.Snapshot(str(tmp_path), key_column="id")
+    local.refresh(table)
+    # 워터마크와 같은 시각에 늦게 들어온 행, 다음 달 행, 워터마크 행의 수정본
+    table.rows = pd.concat([table.rows, _rides((5, "2024-02-10 12:00"), (6, "2024-03-01 08:00"))], ignore_index=True)
+    table.rows.loc[table.rows["id"] == 4, "회원ID"] = 999
+
+    assert local.refresh(table) == ["2024-02", "2024-03"]
+    assert local.state() == {"watermark": "2024-03-01T08:00:00",
+                             "partitions": {"2024-01": 2, "2024-02": 3, "2024-03": 1}}
+    loaded = local.load()
+    assert sorted(loaded["id"]) == [1, 2, 3, 4, 5, 6]
+    assert loaded.loc[loaded["id"] == 4, "회원ID"].astype(int).tolist() == [999]
+
+    # 새 행이 없으면 워터마크가 속한 월만 다시 받고 결과는 그대로
+    assert local.refresh(table) == ["2024-03"]
+    assert local.state()["partitions"] == {"2024-01": 2, "2024-02": 3, "2024-03": 1}
+
+
+def test_failed_month_keeps_previous_watermark(tmp_path, table):
+    local = snapshot.Snapshot(str(tmp_path), key_column="id")
+    table.rows = pd.concat([table.rows, _rides((5, "2024-03-02 08:00"))], ignore_index=True)
+    table.fail_month = "2024-02"
+    with pytest.raises(Error):
+        local.refresh(table)
+    # 실패한 2월 뒤의 3월로 워터마크를 넘기지 않는다
+    assert local.state() == {"watermark": "2024-01-20T10:00:00", "partitions": {"2024-01": 2}}
+
+    table.fail_month = None
+    assert local.refresh(table) == ["2024-01", "2024-02", "2024-03"]
+    assert local.state()["watermark"] == "2024-03-02T08:00:00"
+    assert sorted(local.load()["id"]) == [1, 2, 3, 4, 5]
+
+
+def test_full_refresh_keeps_partition_when_fetch_fails(tmp_path, table):
+    local = snapshot.Snapshot(str(tmp_path), key_column="id")
+    local.refresh(table)
+    table.fail_month = "2024-01"
+    with pytest.raises(Error):
+        local.refresh(table, full=True)
+    assert sorted(local.load()["id"]) == [1, 2, 3, 4]
@@ -0,0 +1,71 @@
+import pandas as pd
+
+import utilization
+
+
+def _trips(rows):
+    return pd.DataFrame({
+        "기사ID": [driver for driver, _, _ in rows],
+        "승차일시": pd.to_datetime([board for _, board, _ in rows]),
+        "예약시간": pd.to_datetime([booked for _, _, booked in rows]),
+    })
+
+
+def test_day_without_rides():
+    trips = _trips([(1, "2024-03-06 10:00", "2024-03-06 09:00")])
+    usage = utilization.utilization(trips, "2024-03-07", "2024-03-08")
+    assert usage["drivers"].empty
+    assert list(usage["drivers"].columns) == ["기사ID", "운행", "근무 시작", "근무 끝", "운행(분)", "근무(분)", "가동률"]
+    assert len(usage["vehicles"]) == 24 * 60
+    assert usage["peak"] == 0
+    assert usage["peak_time"] is None
+    assert usage["busy_ratio"] == 0.0
+
+
+def test_no_trips_at_all():
+    usage = utilization.utilization(_trips([]), "2024-03-07", "2024-03-08")
+    assert usage["drivers"].empty
+    assert usage["peak"] == 0
+
+
+def test_overlapping_trips_of_same_driver_counted_once():
+    trips = _trips([
+        (1, "2024-03-07 10:00", "2024-03-07 08:00"),
+        # 앞 운행 (09:45 ~ 10:40) 이 끝나기 전에 승차: 10:40 ~ 11:00 으로 잘린다
+        (1, "2024-03-07 10:20", "2024-03-07 08:00"),
+        (2, "2024-03-07 10:30", "2024-03-07 08:00"),
+    ])
+    usage = utilization.utilization(trips, "2024-03-07", "2024-03-08", approach_minutes=15, service_minutes=40)
+    assert usage["peak"] == 2
+    assert usage["peak_time"] == pd.Timestamp("2024-03-07 10:15")
+
+    drivers = usage["drivers"].set_index("기사ID")
+    assert drivers.loc[1, "운행"] == 2
+    assert drivers.loc[1, "근무 시작"] == pd.Timestamp("2024-03-07 09:45")
+    assert drivers.loc[1, "근무 끝"] == pd.Timestamp("2024-03-07 11:00")
+    assert drivers.loc[1, "운행(분)"] == 75
+    assert drivers.loc[1, "근무(분)"] == 75
+    assert drivers.loc[1, "가동률"] == 1.0
+    vehicles = usage["vehicles"].set_index("time")["vehicles"]
+    assert vehicles[pd.Timestamp("2024-03-07 10:39")] == 2
+    assert vehicles[pd.Timestamp("2024-03-07 11:05")] == 1
+
+
+def test_booking_later_than_approach_window():
+    # 승차 5분 전에 잡은 예약은 예약 시각부터 운행 구간이 시작된다
+    trips = _trips([(1, "2024-03-07 10:00", "2024-03-07 09:55")])
+    drivers = utilization.utilization(trips, "2024-03-07", "2024-03-08")["drivers"]
+    assert drivers.loc[0, "근무 시작"] == pd.Timestamp("2024-03-07 09:55")
+    assert drivers.loc[0, "운행(분)"] == 45
+
+
+def test_month_days_skips_days_without_rides():
+    trips = _trips([
+        (1, "2024-03-05 10:00", "2024-03-05 09:00"),
+        (2, "2024-03-05 10:10", "2024-03-05 09:00"),
+        (1, "2024-03-09 12:00", "2024-03-09 11:00"),
+    ])
+    table = utilization.month_days(trips, "2024-03")
+    assert list(table["date"].astype(str)) == ["2024-03-05", "2024-03-09"]
+    assert list(table["최대 동시 운행"]) == [2, 1]
+    assert list(table["운행"]) == [2, 1]
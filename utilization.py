@@ -0,0 +1,215 @@
+# 차량 동시 운행 대수와 기사별 가동률
+# 시간대별 그래프는 예약 시(時)별 고유 기사 수라서 실제로 몇 대가 동시에 운행 중인지, 기사마다 얼마나 바쁜지는 알 수 없다
+# 운행마다 차량이 묶여 있는 구간을 다시 만들고 분 단위 스윕 라인으로 동시 운행 대수를 센다
+#
+# 운행 구간: [승차 - approach_minutes, 승차 + service_minutes)
+#   예약시간이 그보다 늦으면(급하게 잡은 예약) 예약시간부터 (예약 전에는 배차될 수 없다)
+#   기사별 승차일시 순으로 정렬한 뒤 같은 기사의 겹치는 구간은 앞 구간이 끝난 뒤부터로 잘라서, 기사 한 명은 한 번만 센다
+# 동시 운행 대수: 구간 시작 분에 +1, 끝 분에 -1 을 bincount 로 쌓고 누적합 (운행 수와 관계없이 분 수 크기 배열 하나)
+# 기사별 가동률: 운행 구간 합 / 첫 구간 시작 ~ 마지막 구간 끝
+#
+# 사용법: python utilization.py                          # [data] source 의 모든 날짜별 최대 동시 운행, 평균 가동률
+#         python utilization.py --csv 파일 --out 파일.csv
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import instrument
+
+
+# 1970-01-01 부터의 분 -> datetime64[ns]
+def _timestamps(minutes):
+    return np.asarray(minutes, dtype=np.int64).astype("datetime64[m]").astype("datetime64[ns]")
+
+
+# 운행 표(기사ID, 승차일시, 예약시간)로 기사별 운행 구간 (분 단위 정수, 1970-01-01 부터의 분)
+# 반환: 기사ID(범주형), board(승차 분), start, end 컬럼, 기사별 승차 순 (겹쳐서 잘린 구간은 start == end)
+@instrument.timed("utilization.intervals")
+def intervals(trips, approach_minutes=15, service_minutes=40):
+    trips = trips.dropna(subset=["기사ID", "승차일시"])
+    codes, drivers = pd.factorize(trips["기사ID"])
+    board = trips["승차일시"].to_numpy(dtype="datetime64[ns]").astype("datetime64[m]").astype(np.int64)
+    booked = trips["예약시간"].to_numpy(dtype="datetime64[ns]").astype("datetime64[m]")
+    booked = np.where(np.isnat(booked), np.iinfo(np.int64).min, booked.astype(np.int64))
+
+    order = np.lexsort((board, codes))
+    codes, board, booked = codes[order], board[order], booked[order]
+    start = np.maximum(board - approach_minutes, booked)
+    # 예약시간이 승차보다 늦게 기록된 행은 승차 시각부터
+    start = np.minimum(start, board)
+    end = board + service_minutes
+
+    # 같은 기사의 앞 구간들 중 가장 늦은 끝보다 먼저 시작하지 않도록 (기사별 누적 최대값)
+    latest = pd.Series(end).groupby(codes).cummax().to_numpy()
+    same = np.zeros(len(codes), dtype=bool)
+    same[1:] = codes[1:] == codes[:-1]
+    previous = np.empty_like(latest)
+    previous[1:] = latest[:-1]
+    start = np.where(same, np.maximum(start, previous), start)
+    start = np.minimum(start, end)
+
+    return pd.DataFrame({
+        # 범주형 기사ID 를 factorize 하면 고유 값도 범주형이므로 값 배열로 바꿔서 범주로 쓴다
+        "기사ID": pd.Categorical.from_codes(codes, pd.Index(np.asarray(drivers))),
+        "board": board,
+        "start": start,
+        "end": end,
+    })
+
+
+def _minutes(timestamp):
+    return int(np.datetime64(pd.Timestamp(timestamp), "m").astype(np.int64))
+
+
+# [first, last) 구간의 분별 동시 운행 대수
+def concurrency(spans, first, last):
+    first, last = _minutes(first), _minutes(last)
+    size = last - first
+    start = np.clip(spans["start"].to_numpy(), first, last) - first
+    end = np.clip(spans["end"].to_numpy(), first, last) - first
+    # 구간마다 시작 분 +1, 끝 분 -1 (구간 밖이거나 잘린 구간은 start == end 라서 서로 지워진다)
+    delta = np.bincount(start, minlength=size + 1) - np.bincount(end, minlength=size + 1)
+    vehicles = np.cumsum(delta[:size])
+    return pd.DataFrame({
+        "time": _timestamps(np.arange(first, last)),
+        "vehicles": vehicles.astype(np.int32),
+    })
+
+
+# [first, last) 구간의 기사별 운행 수, 근무 시작/끝, 운행/근무 시간(분), 가동률 (가동률이 높은 순)
+def driver_utilization(spans, first, last):
+    first, last = _minutes(first), _minutes(last)
+    start = np.clip(spans["start"].to_numpy(), first, last)
+    end = np.clip(spans["end"].to_numpy(), first, last)
+    codes = spans["기사ID"].cat.codes.to_numpy()
+    board = spans["board"].to_numpy()
+    categories = spans["기사ID"].cat.categories
+    trips = np.bincount(codes[(board >= first) & (board < last)].astype(np.int64), minlength=len(categories))
+
+    # 구간은 기사별 시작 순이고 같은 기사의 구간끼리 겹치지 않으므로
+    # 기사마다 첫 구간의 시작이 근무 시작, 마지막 구간의 끝이 근무 끝이고 운행 시간은 구간 길이의 합이다
+    busy = end > start
+    codes, start, end = codes[busy], start[busy], end[busy]
+    # 구간 안에 운행이 하나도 없는 날 (데이터가 빠진 날, 아직 오지 않은 날)
+    if not len(codes):
+        return pd.DataFrame({
+            "기사ID": categories[:0],
+            "운행": np.zeros(0, dtype=np.int64),
+            "근무 시작": _timestamps([]),
+            "근무 끝": _timestamps([]),
+            "운행(분)": np.zeros(0, dtype=np.int64),
+            "근무(분)": np.zeros(0, dtype=np.int64),
+            "가동률": np.zeros(0),
+        })
+    index, first_rows = np.unique(codes, return_index=True)
+    last_rows = np.append(first_rows[1:], len(codes)) - 1
+    busy_minutes = np.add.reduceat(end - start, first_rows)
+    worked = end[last_rows] - start[first_rows]
+    result = pd.DataFrame({
+        "기사ID": categories[index],
+        "운행": trips[index],
+        "근무 시작": _timestamps(start[first_rows]),
+        "근무 끝": _timestamps(end[last_rows]),
+        "운행(분)": busy_minutes,
+        "근무(분)": worked,
+        "가동률": np.divide(busy_minutes, worked, out=np.zeros(len(index)), where=worked > 0),
+    })
+    return result.sort_values("가동률", ascending=False, kind="stable").reset_index(drop=True)
+
+
+# 하루 구간을 계산하려면 읽어야 하는 승차일시 구간 (전날 늦게 탄 운행과 다음날 일찍 탈 운행의 구간이 걸친다)
+def load_range(first, last, approach_minutes=15, service_minutes=40):
+    return (pd.Timestamp(first) - pd.Timedelta(minutes=service_minutes)).to_pydatetime(), \
+        (pd.Timestamp(last) + pd.Timedelta(minutes=approach_minutes)).to_pydatetime()
+
+
+# [first, last) 구간의 분별 동시 운행 대수, 기사별 가동률과 요약
+# trips 는 load_range(first, last) 구간의 운행
+def utilization(trips, first, last, approach_minutes=15, service_minutes=40):
+    spans = intervals(trips, approach_minutes, service_minutes)
+    vehicles = concurrency(spans, first, last)
+    drivers = driver_utilization(spans, first, last)
+    peak = int(vehicles["vehicles"].max()) if len(vehicles) else 0
+    worked = int(drivers["근무(분)"].sum())
+    return {
+        "vehicles": vehicles,
+        "drivers": drivers,
+        "peak": peak,
+        "peak_time": vehicles["time"].iloc[int(vehicles["vehicles"].argmax())] if peak else None,
+        "busy_ratio": float(drivers["운행(분)"].sum() / worked) if worked else 0.0,
+    }
+
+
+# config 의 [utilization] 섹션으로 하루 치 계산 (trip_times(start, end) 는 엔진 또는 소스의 운행 조회)
+def day_utilization(trip_times, day, settings):
+    approach = settings.getint("approach_minutes")
+    service = settings.getint("service_minutes")
+    first = pd.Timestamp(day)
+    last = first + pd.Timedelta(days=1)
+    return utilization(trip_times(*load_range(first, last, approach, service)), first, last, approach, service)
+
+
+DAY_COLUMNS = ["date", "최대 동시 운행", "최대 시각", "운행 기사", "운행", "평균 가동률"]
+
+
+# 월 하나의 날짜별 요약 (월 전체 운행으로 구간을 한 번 만들고 날짜별로 자른다)
+def month_days(trips, month, approach_minutes=15, service_minutes=40):
+    first = pd.Timestamp(month + "-01")
+    last = first + pd.DateOffset(months=1)
+    spans = intervals(trips, approach_minutes, service_minutes)
+    vehicles = concurrency(spans, first, last)
+    rows = []
+    for day, group in vehicles.groupby(vehicles["time"].dt.normalize(), sort=True):
+        drivers = driver_utilization(spans, day, day + pd.Timedelta(days=1))
+        if drivers.empty:
+            continue
+        peak = int(group["vehicles"].max())
+        rows.append({
+            "date": day.date(),
+            "최대 동시 운행": peak,
+            "최대 시각": group["time"].iloc[int(group["vehicles"].argmax())].strftime("%H:%M"),
+            "운행 기사": len(drivers),
+            "운행": int(drivers["운행"].sum()),
+            "평균 가동률": float(drivers["운행(분)"].sum() / max(drivers["근무(분)"].sum(), 1)),
+        })
+    return pd.DataFrame(rows, columns=DAY_COLUMNS)
+
+
+def main():
+    import aggregations
+    import config
+    import sources
+
+    parser = argparse.ArgumentParser(description="날짜별 최대 동시 운행 대수와 기사 가동률")
+    sources.add_source_arguments(parser)
+    parser.add_argument("--out", help="날짜별 요약을 저장할 CSV 파일")
+    args = parser.parse_args()
+
+    settings = config.load_config()
+    approach = settings["utilization"].getint("approach_minutes")
+    service = settings["utilization"].getint("service_minutes")
+    started = time.perf_counter()
+    tables = []
+    rides = 0
+    with sources.open_loader(settings, args.csv, args.refresh) as (load, months):
+        for month in months:
+            first = pd.Timestamp(month + "-01")
+            trips = aggregations.trip_times(load, *load_range(first, first + pd.DateOffset(months=1), approach, service))
+            rides += len(trips)
+            tables.append(month_days(trips, month, approach, service))
+    table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=DAY_COLUMNS)
+
+    print(f"{len(table)}일, 운행 {rides:,}건: {time.perf_counter() - started:.1f}초")
+    if len(table):
+        busiest = table.loc[table["최대 동시 운행"].idxmax()]
+        print(f"최대 동시 운행 {busiest['최대 동시 운행']}대 ({busiest['date']} {busiest['최대 시각']}), "
+              f"평균 가동률 {table['평균 가동률'].mean():.0%}")
+    if args.out:
+        table.to_csv(args.out, index=False, encoding="utf-8-sig")
+        print(args.out)
+
+
+if __name__ == "__main__":
+    main()
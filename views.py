@@ -0,0 +1,564 @@
+# 대시보드 화면 (djtc.py, DJTC_dash.py 공통)
+# 탭마다 engine.Engine 에서 집계 결과를 받아 표, 지표, 그래프, 지도를 그린다
+# 탭은 fragment 로 그려서 날짜/월 위젯을 바꾸면 탭만 다시 실행되고,
+# 그래프와 지도도 엔진 캐시에 넣어 자기 입력(날짜/월)이 바뀔 때만 다시 만든다
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from datetime import datetime, timedelta
+from streamlit.components.v1 import html
+from mysql.connector import Error
+import plotly.graph_objects as go
+import numpy as np
+import os
+import depot
+import instrument
+import map_cache
+import mapviz
+import od
+import offline_map
+import queries
+import report
+import spatial_index
+import utilization
+from engine import file_version
+
+TABS = ["일별 분석", "월별 분석", "수요·공급 히트맵", "출발지-도착지 이동", "최적 차고지 결과"]
+
+# 히트맵에 표시할 값 (부족 = 회원 수 - 기사 수, 양수면 기사가 부족한 시간대)
+HEATMAP_VALUES = {"부족(회원-기사)": "부족", "회원 수": "회원ID", "기사 수": "기사ID"}
+
+
+# 시간대별 기사 수와 회원 수 라인 플롯
+def hourly_figure(hourly_counts, label):
+    driver_count = hourly_counts[['예약_시', '기사ID']]
+    user_count = hourly_counts[['예약_시', '회원ID']]
+
+    # 라인 플롯 생성
+    fig3 = go.Figure()
+
+    # 첫 번째 라인 플롯 추가 (시간대별 운전자수)
+    fig3.add_trace(go.Scatter(
+        x=driver_count["예약_시"],
+        y=driver_count["기사ID"],
+        mode='lines+markers',
+        line=dict(color='darkblue', width=3),
+        marker=dict(size=6, color='red', line=dict(width=2, color='white')),
+        name='시간대별 운전자수'
+    ))
+
+    # 두 번째 라인 플롯 추가 (시간대별 이용자수)
+    fig3.add_trace(go.Scatter(
+        x=user_count["예약_시"],
+        y=user_count["회원ID"],
+        mode='lines+markers',
+        line=dict(color='darkgreen', width=3),
+        marker=dict(size=6, color='orange', line=dict(width=2, color='white')),
+        name='시간대별 이용자수'
+    ))
+
+    # 레이아웃 업데이트 및 버튼 추가
+    fig3.update_layout(
+        title={
+            'text': f"<b>{label} 시간대별 수요 & 공급 </b>",
+            'font': {
+                'family': "fantasy",  # 제목 폰트 패밀리 변경
+                'size': 20,  # 제목 폰트 크기
+                'color': "black"  # 제목 폰트 색상
+            }
+        },
+        xaxis_title={
+            'text': "시간대",
+            'font': {
+                'family': "Courier New, monospace",  # x축 제목 폰트 패밀리 변경
+                'size': 15,  # x축 제목 폰트 크기
+                'color': "black"  # x축 제목 폰트 색상
+            }
+        },
+        yaxis_title={
+            'text': "수 {단위 : 명}",
+            'font': {
+                'family': "Courier New, monospace",  # y축 제목 폰트 패밀리 변경
+                'size': 15,  # y축 제목 폰트 크기
+                'color': "black"  # y축 제목 폰트 색상
+            }
+        }
+    )
+    fig3.update_xaxes(tickmode='array', tickvals=np.arange(0, 24), tickformat="d")
+    fig3.update_yaxes(tickformat="d")
+    return fig3
+
+
+# 분 단위 동시 운행 대수 그래프
+def vehicles_figure(vehicles, label):
+    fig = px.line(vehicles, x="time", y="vehicles", labels={"time": "시각", "vehicles": "운행 중인 차량"},
+                  title=f"{label} 동시 운행 차량 수")
+    fig.update_yaxes(tickformat="d")
+    return fig
+
+
+# 상위 10개 출발지 바 그래프
+def location_figure(location_counts, column, title):
+    return px.bar(
+        location_counts.reset_index(name='count').rename(columns={'index': column}),
+        x=column,
+        y='count',
+        labels={column: column, 'count': '건수'},
+        title=title,
+        color='count',
+        color_continuous_scale='greens',  # 초록색 그라데이션
+        range_color=[0, location_counts.max()]  # 색상 범위
+    )
+
+
+# 일자 × 시간대 행렬 (행: 전체 기간의 모든 날짜, 열: 0~23시, 행이 없는 칸은 0)
+def date_hour_matrix(counts, column):
+    dates = pd.date_range(min(counts["date"]), max(counts["date"]), freq="D").date
+    matrix = np.zeros((len(dates), 24), dtype=np.int64)
+    rows = (pd.to_datetime(counts["date"]) - pd.Timestamp(dates[0])).dt.days.to_numpy()
+    values = counts["회원ID"] - counts["기사ID"] if column == "부족" else counts[column]
+    matrix[rows, counts["예약_시"].to_numpy()] = values.to_numpy()
+    return pd.DataFrame(matrix, index=dates, columns=range(24))
+
+
+# 일자 × 시간대 히트맵
+def heatmap_figure(matrix, label):
+    shortage = label == "부족(회원-기사)"
+    limit = max(int(np.abs(matrix.to_numpy()).max()), 1)
+    fig = go.Figure(go.Heatmap(
+        z=matrix.to_numpy(),
+        x=[f"{hour}시" for hour in matrix.columns],
+        y=matrix.index,
+        colorscale="RdBu_r" if shortage else "Greens",
+        zmin=-limit if shortage else 0,
+        zmax=limit,
+        colorbar={"title": label},
+        hovertemplate="%{y} %{x}<br>" + label + ": %{z}<extra></extra>",
+    ))
+    fig.update_layout(
+        title=f"일자 × 예약 시간대별 {label}",
+        xaxis_title="예약 시간대",
+        yaxis={"title": "날짜", "autorange": "reversed"},
+        height=max(500, min(1500, 3 * len(matrix))),
+    )
+    return fig
+
+
+# 시간대별 만성 부족 정도 (날짜 평균과 부족한 날 비율), 부족이 큰 순서
+def shortage_table(users, drivers):
+    gap = users - drivers
+    table = pd.DataFrame({
+        "예약 시간대": [f"{hour}시" for hour in users.columns],
+        "평균 회원 수": users.mean().round(1).to_numpy(),
+        "평균 기사 수": drivers.mean().round(1).to_numpy(),
+        "평균 부족": gap.mean().round(1).to_numpy(),
+        "부족한 날 비율": (gap > 0).mean().to_numpy(),
+    })
+    return table.sort_values("평균 부족", ascending=False).reset_index(drop=True)
+
+
+# 선택한 날짜의 시간대별 그래프
+def daily_figure(engine, day):
+    return hourly_figure(engine.hourly_counts(*queries.day_range(day)), day)
+
+
+# 선택한 월의 상위 출발지 시군구/읍면동 바 그래프와 시간대별 그래프
+def monthly_figures(engine, month):
+    start, end = queries.month_range(month)
+    return (
+        location_figure(engine.top_locations('출발지_시군구', start, end, 10, require_coords=True), '출발지_시군구', "Top 10 출발지 시군구"),
+        location_figure(engine.top_locations('출발지_읍면동', start, end, 10, require_coords=True), '출발지_읍면동', "Top 10 출발지 읍면동"),
+        hourly_figure(engine.hourly_counts(start, end, require_coords=True), month),
+    )
+
+
+# 선택한 월의 출발지 지도 HTML
+def monthly_map(engine, settings, month):
+    if settings["map"]["mode"] == "index":
+        # 격자 인덱스에서 화면 범위와 줌에 맞는 격자 건수만 읽는다
+        cells = spatial_index.open_index(settings["grid"]).query(
+            [month], zoom=settings["map"].getint("zoom"), bbox=mapviz.configured_bbox(settings["map"])
+        )
+        m = mapviz.build_cell_map(cells, zoom=settings["map"].getint("zoom"))
+    else:
+        # 지도에는 원본 좌표가 필요하므로 선택한 월의 출발지 컬럼만 가져온다
+        # 운행 건마다 마커를 만들지 않고 읍면동/격자 단위로 묶어서 그룹마다 마커 하나만 그린다
+        points = engine.map_points(*queries.month_range(month))
+        if offline_map.use_compact(settings["map"]):
+            # 경량 지도: 그룹 마커를 정수 배열 하나로 넣고 Leaflet 만 쓴다
+            map_settings = settings["map"]
+            markers = mapviz.marker_groups(points, map_settings.get("mode"), map_settings.getfloat("cell_size"),
+                                           map_settings.getint("max_markers"))
+            return offline_map.render_configured(markers, map_settings)
+        m = mapviz.build_configured_map(points, settings["map"])
+    return mapviz.render_html(m)
+
+
+# 월 지도의 캐시 버전 (그 월의 원본 데이터 기준과 지도 설정, index 모드는 그 월의 격자 인덱스 파일)
+# 새 행이 들어온 월의 지도만 다시 만들고 다른 월의 지도는 그대로 쓴다
+def map_version(engine, settings, month):
+    map_settings = {key: value for key, value in settings["map"].items() if not key.startswith("cache_")}
+    if settings["map"]["mode"] == "index":
+        data = file_version(spatial_index.open_index(settings["grid"]).month_path(month))
+    else:
+        data = engine.watermark(*queries.month_range(month))
+    return map_cache.version_key(data, map_settings)
+
+
+# 선택한 월의 지도 HTML 과 최신 여부
+# 지도 캐시(maps)가 있으면 디스크에 저장해 둔 HTML 을 쓰고, 없으면 엔진 캐시에 넣어 둔다
+def monthly_map_html(engine, settings, month, maps=None):
+    if maps is None:
+        return engine.cached("monthly_map", lambda month: monthly_map(engine, settings, month), month), True
+    return maps.get(month, map_version(engine, settings, month), lambda month: monthly_map(engine, settings, month))
+
+
+# 선택한 날짜의 동시 운행 대수와 기사별 가동률 (날짜별로 엔진에 캐시)
+def day_utilization(engine, settings, day):
+    return engine.cached(
+        "utilization", lambda day: utilization.day_utilization(engine.trip_times, day, settings["utilization"]), day
+    )
+
+
+# 일별 분석에 필요한 집계 (전일~당일 일별 요약, 당일 시간대별 그래프, 당일 동시 운행/가동률)
+def daily_calls(engine, settings, day):
+    previous = day - timedelta(days=1)
+    return [
+        lambda: engine.daily_summary(*queries.day_range(previous, day)),
+        lambda: engine.cached("daily_figure", lambda day: daily_figure(engine, day), day),
+        lambda: day_utilization(engine, settings, day),
+    ]
+
+
+# 월별 분석에 필요한 집계 (총 이용자/건수, 상위 출발지, 시간대별 집계, 지도)
+# 그래프는 집계가 끝난 뒤 캐시된 집계로 한 번에 만든다
+def monthly_calls(engine, month, settings, maps=None):
+    start, end = queries.month_range(month)
+    return [
+        lambda: engine.month_totals(month, require_coords=True),
+        lambda: engine.top_locations('출발지_시군구', start, end, 10, require_coords=True),
+        lambda: engine.top_locations('출발지_읍면동', start, end, 10, require_coords=True),
+        lambda: engine.hourly_counts(start, end, require_coords=True),
+        lambda: monthly_map_html(engine, settings, month, maps),
+    ]
+
+
+# 일별 분석 페이지
+def daily_page(engine, settings):
+    st.header("일별 분석")
+
+    # 날짜 선택
+    selected_date = st.date_input("날짜를 선택하세요.", datetime.now().date())
+    previous_date = selected_date - timedelta(days=1)
+
+    # 전일~당일 구간 일별 요약과 당일 시간대별 그래프를 동시에 가져오기
+    daily_summary, fig_hourly, usage = engine.gather(*daily_calls(engine, settings, selected_date))
+
+    # 선택한 날짜의 데이터 필터링
+    selected_day = daily_summary[daily_summary['date'] == selected_date]
+    previous_day = daily_summary[daily_summary['date'] == previous_date]
+
+    if not selected_day.empty:
+        users_today = selected_day.iloc[0]['users']
+        rides_today = selected_day.iloc[0]['rides']
+        usage_today = selected_day.iloc[0]['usage']
+    else:
+        users_today = 0
+        rides_today = 0
+        usage_today = 0
+
+    if not previous_day.empty:
+        users_yesterday = previous_day.iloc[0]['users']
+        rides_yesterday = previous_day.iloc[0]['rides']
+        usage_yesterday = previous_day.iloc[0]['usage']
+    else:
+        users_yesterday = 0
+        rides_yesterday = 0
+        usage_yesterday = 0
+
+    # 전일 대비 증감 계산
+    users_change = int(users_today - users_yesterday)  # int로 변환
+    rides_change = int(rides_today - rides_yesterday)  # int로 변환
+
+    # 일일 보고 형태 표 생성 (python report.py 로 모든 날짜를 한 번에 만드는 표와 같은 계산)
+    summary_df = report.daily_table(daily_summary, selected_date)
+    st.write("일일 보고 형태 표")
+    st.table(summary_df)
+
+    # 일별 현황 표시
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("일일 이용자 수", users_today, users_change)
+    with col2:
+        st.metric("일일 이용 건수", rides_today, rides_change)
+
+    # 수요 공급 시각화
+    # 선택한 날짜의 시간대별 기사 수와 회원 수 ('예약시간'의 시 단위로 집계)
+    with instrument.stage("figure"):
+        st.plotly_chart(fig_hourly)
+
+    # 실제로 동시에 운행 중인 차량 수 (운행 구간: 승차 전 approach_minutes ~ 승차 후 service_minutes)와 기사별 가동률
+    if usage["peak"]:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("최대 동시 운행", f"{usage['peak']}대 ({usage['peak_time']:%H:%M})")
+        with col2:
+            st.metric("기사 평균 가동률", f"{usage['busy_ratio']:.0%}")
+        with instrument.stage("figure"):
+            st.plotly_chart(engine.cached("vehicles_figure", lambda day: vehicles_figure(usage["vehicles"], day),
+                                          selected_date), use_container_width=True)
+        st.write("기사별 가동률 (운행 시간 / 첫 운행 시작 ~ 마지막 운행 끝)")
+        st.dataframe(usage["drivers"].style.format({"가동률": "{:.0%}"}), hide_index=True)
+
+    # 보통 하루씩 넘겨 보므로 다음 날과 전날 집계를 백그라운드에서 미리 계산해 둔다
+    engine.prefetch(*daily_calls(engine, settings, selected_date + timedelta(days=1)),
+                    *daily_calls(engine, settings, previous_date))
+
+
+# 월별 분석 페이지
+def monthly_page(engine, settings, maps=None):
+    st.header("월별 분석")
+
+    # 월 목록은 월 단위로 집계한 결과만 가져온다
+    month_options = engine.month_list()
+
+    if not month_options:
+        st.write("데이터가 없습니다.")
+        return
+
+    selected_month = st.selectbox("월을 선택하세요", month_options)
+
+    # 선택된 월과 전월의 총 이용자 수와 총 이용 건수(전월~당월 일별 집계 한 번으로 계산),
+    # 상위 출발지, 시간대별 집계, 지도를 동시에 가져오기
+    totals, *_, (map_html, map_fresh) = engine.gather(*monthly_calls(engine, selected_month, settings, maps))
+    fig_si_gun_gu, fig_eup_myun_dong, fig_hourly = engine.cached(
+        "monthly_figures", lambda month: monthly_figures(engine, month), selected_month
+    )
+
+    # 월별 현황 표시
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("월별 총 이용자 수", totals["users"], totals["users"] - totals["previous_users"])
+    with col2:
+        st.metric("월별 총 이용 건수", totals["rides"], totals["rides"] - totals["previous_rides"])
+
+    with instrument.stage("map.render"):
+        if not map_fresh:
+            st.caption("새 데이터로 지도를 다시 만드는 중입니다. 이전 지도를 표시합니다.")
+        html(map_html, width=700, height=510)
+
+    with instrument.stage("figure"):
+        # 상위 10개 출발지 시군구 바 그래프
+        st.plotly_chart(fig_si_gun_gu, use_container_width=True)
+
+        # 상위 10개 출발지 읍면동 바 그래프
+        st.plotly_chart(fig_eup_myun_dong, use_container_width=True)
+
+        # 시간대별 기사 수와 회원 수 그래프 ('예약시간'의 시 단위로 집계)
+        st.plotly_chart(fig_hourly)
+
+    # 이전/다음 월 집계를 백그라운드에서 미리 계산해 둔다
+    index = month_options.index(selected_month)
+    for neighbour in month_options[max(index - 1, 0):index + 2]:
+        if neighbour != selected_month:
+            engine.prefetch(*monthly_calls(engine, neighbour, settings, maps))
+
+    # 새 데이터가 들어왔으면 지도 캐시에 있는 다른 월의 지도도 백그라운드에서 다시 만든다
+    if maps is not None:
+        maps.refresh(month_options, lambda month: map_version(engine, settings, month), lambda month: monthly_map(engine, settings, month))
+
+
+# 수요·공급 히트맵 페이지 (전체 기간)
+def heatmap_page(engine):
+    st.header("수요·공급 히트맵")
+
+    # 전체 기간의 일자 × 시간대 집계 (데이터 버전이 같으면 다시 계산하지 않는다)
+    counts = engine.date_hour_counts()
+    if counts.empty:
+        st.write("데이터가 없습니다.")
+        return
+
+    label = st.radio("표시할 값", list(HEATMAP_VALUES), horizontal=True)
+    fig = engine.cached(
+        "heatmap_figure", lambda label: heatmap_figure(date_hour_matrix(counts, HEATMAP_VALUES[label]), label), label
+    )
+    with instrument.stage("figure"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    # 여러 날에 걸쳐 기사가 부족한 시간대
+    table = engine.cached("shortage_table", lambda: shortage_table(
+        date_hour_matrix(counts, "회원ID"), date_hour_matrix(counts, "기사ID")
+    ))
+    st.write("시간대별 만성 부족 (날짜 평균)")
+    st.dataframe(table.style.format({"부족한 날 비율": "{:.0%}"}), hide_index=True)
+
+
+# 구역별 순유입 바 그래프 (양수면 도착이 많은 구역)
+def balance_figure(balances, limit=20):
+    top = pd.concat([balances.head(limit // 2), balances.tail(limit // 2)]).drop_duplicates("구역")
+    return px.bar(top, x="구역", y="순유입", title="구역별 순유입 (유입 - 유출)",
+                  color="순유입", color_continuous_scale="RdBu")
+
+
+# 출발지-도착지 이동 페이지
+# python od.py 로 미리 만든 월별 OD 행렬만 읽고 원본 운행은 읽지 않는다
+def od_page(engine, settings):
+    st.header("출발지-도착지 이동")
+
+    matrix = od.open_matrix(settings["od"])
+    month_options = matrix.months()
+    if not month_options:
+        st.write("OD 행렬이 없습니다. python od.py 로 만드세요.")
+        return
+
+    option_col1, option_col2, option_col3 = st.columns(3)
+    with option_col1:
+        selected_month = st.selectbox("월 선택", month_options)
+    with option_col2:
+        first_hour, last_hour = st.slider("승차 시간대", 0, 23, (0, 23))
+    with option_col3:
+        top_n = st.slider("상위 이동 수", 5, 50, 10)
+
+    # OD 행렬을 다시 만들면 상태 파일 버전이 바뀌어서 다시 읽는다
+    version = file_version(os.path.join(settings["od"]["path"], od.STATE_FILE))
+    hours = None if (first_hour, last_hour) == (0, 23) else tuple(range(first_hour, last_hour + 1))
+    flows = engine.cached("od_flows", lambda month, hours, n, _: matrix.top_flows([month], n, hours),
+                          selected_month, hours, top_n, version)
+    balances = engine.cached("od_balances", lambda month, hours, _: matrix.balances([month], hours),
+                             selected_month, hours, version)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write(f"상위 {top_n}개 이동 (같은 구역 안의 이동 제외)")
+        st.dataframe(flows, hide_index=True)
+    with col2:
+        st.write("구역별 유입/유출")
+        st.dataframe(balances, hide_index=True)
+    with instrument.stage("figure"):
+        st.plotly_chart(balance_figure(balances), use_container_width=True)
+
+
+# 최적 차고지 결과 페이지
+def depot_page(engine, settings):
+    st.markdown("<h2 style='font-size:24px;'>최적 차고지 결과 대시보드</h2>", unsafe_allow_html=True)
+
+    month_options = engine.month_list()
+    option_col1, option_col2 = st.columns(2)
+    with option_col1:
+        selected_month = st.selectbox("월 선택", month_options)
+    with option_col2:
+        depot_count = st.slider("차고지 수", 1, 30, settings["depot"].getint("k"))
+
+    def optimize(month, k):
+        return depot.optimize_configured(engine.map_points(*queries.month_range(month)), month, k, settings["depot"])
+
+    result = None
+    if month_options:
+        # 선택한 월의 출발지 수요로 차고지 계산 ((월, 차고지 수) 별로 저장된 결과가 있으면 그대로 쓴다)
+        result = engine.cached("depot", optimize, selected_month, depot_count)
+
+    if result is None:
+        st.write("데이터가 없습니다.")
+        return
+
+    depots = pd.DataFrame(result["depots"])
+    col1, col2 = st.columns([3, 1])
+
+    # 지도 시각화
+    with col1:
+        depot_map = engine.cached("depot_map", lambda *args: offline_map.depot_html(depots, settings["map"]),
+                                  selected_month, depot_count)
+        with instrument.stage("map.render"):
+            html(depot_map, height=600)
+        st.caption(
+            f"수요 지점 {result['points']:,}개 / 운행 {result['rides']:,}건, "
+            f"평균 이동 거리 {result['mean_km']:.2f}km (목적함수 {result['objective_km']:,.1f}km), "
+            f"계산 {result['seconds']:.2f}초{' (저장된 결과)' if result['cached'] else ''}"
+        )
+
+    # 차고지별 배정 수요 상위 10위
+    with col2:
+        st.markdown("<h3 style='font-size:17px;'>출발지 수요 TOP 10</h3>", unsafe_allow_html=True)
+        top10_dong = pd.DataFrame({
+            '동이름': depots['label'],
+            '수요': depots['demand'],
+            '평균거리(km)': depots['mean_km'],
+        }).head(10)
+        styled_table = top10_dong.style.set_table_styles(
+            [{
+                'selector': 'thead th',
+                'props': [('background-color', '#4CAF50'), ('color', 'white'), ('font-weight', 'bold')]
+            }, {
+                'selector': 'tbody tr:nth-child(even)',
+                'props': [('background-color', '#f2f2f2')]
+            }, {
+                'selector': 'tbody tr:hover',
+                'props': [('background-color', '#ddd')]
+            }]
+        ).set_properties(**{
+            'text-align': 'center',
+            'font-size': '13px',
+            'border': '1px solid black'
+        })
+        st.dataframe(styled_table)
+
+
+# 선택한 탭 그리기
+# fragment 라서 탭 안의 위젯을 바꾸면 이 함수만 다시 실행된다 (커넥션 풀, 데이터 소스, 사이드바는 다시 실행하지 않음)
+# measure 가 True 면 실행(전체 또는 fragment)마다 단계별 측정을 새로 시작해 탭 아래에 표시한다
+@st.fragment
+def render(selected_tab, engine, settings, measure=False, maps=None):
+    instrument.begin_run(measure, label=selected_tab)
+    if engine.summary_missing():
+        st.warning("롤업이 아직 없어서 원본에서 집계합니다. python rollup.py 를 먼저 실행하세요.")
+    # 집계는 엔진의 작업 스레드에서 실행되므로 DB 오류는 여기(스크립트 스레드)까지 올라온 뒤 표시한다
+    # 실패한 집계는 엔진 캐시에 남지 않아서 다음 실행에서 다시 조회한다
+    try:
+        if selected_tab == "일별 분석":
+            daily_page(engine, settings)
+        elif selected_tab == "월별 분석":
+            monthly_page(engine, settings, maps)
+        elif selected_tab == "수요·공급 히트맵":
+            heatmap_page(engine)
+        elif selected_tab == "출발지-도착지 이동":
+            od_page(engine, settings)
+        elif selected_tab == "최적 차고지 결과":
+            depot_page(engine, settings)
+    except Error as e:
+        st.error(f"The error '{e}' occurred")
+    debug_panel(settings)
+
+
+# 분석 엔진 캐시 상태
+def engine_panel(engine, maps=None):
+    with st.sidebar.expander("분석 캐시"):
+        engine_stats = engine.stats()
+        st.write(f"적중 {engine_stats['hits']} / 미적중 {engine_stats['misses']} (적중률 {engine_stats['hit_rate']:.0%}), 항목 {engine_stats['entries']}개")
+        st.write(f"미리 계산 {engine_stats['prefetched']}건, 계산 중 결과 대기 {engine_stats['waits']}회 (계산 중 {engine_stats['pending']}건)")
+        if maps is not None:
+            map_stats = maps.stats()
+            st.write(f"지도 파일 {map_stats['files']}개, {map_stats['bytes'] / 1024 ** 2:.1f}MB "
+                     f"(적중 {map_stats['hits']}, 이전 지도 {map_stats['stale']}, 생성 {map_stats['builds']}, 백그라운드 {map_stats['background']})")
+        if st.button("분석 캐시 비우기"):
+            engine.clear()
+
+
+# 단계별 시간/메모리 측정 결과 (사이드바에서 켠 실행만)
+# fragment 안에서는 사이드바에 그릴 수 없으므로 탭 아래에 표시한다
+def debug_panel(settings):
+    stages = instrument.records()
+    if not stages:
+        return
+    with st.expander("성능 측정", expanded=True):
+        table = pd.DataFrame({
+            "단계": ["· " * record["depth"] + record["stage"] for record in stages],
+            "초": [round(record.get("seconds", 0.0), 3) for record in stages],
+            "행": [record.get("rows") for record in stages],
+            "RSS(MB)": [None if record.get("rss_delta_mb") is None else round(record["rss_delta_mb"], 1) for record in stages],
+        })
+        st.dataframe(table, hide_index=True)
+        st.write(f"합계 {sum(record.get('seconds', 0.0) for record in stages if record['depth'] == 0):.3f}초")
+        export_path = settings["debug"].get("export_path")
+        if export_path:
+            instrument.export(export_path)
+            st.caption(f"{export_path} 에 추가했습니다.")